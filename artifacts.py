@@ -0,0 +1,43 @@
+import json
+import math
+import os
+import time
+
+# ✅ Fitted strategy artifacts (hedge ratio, rolling window, estimator sums) kept as small JSON files
+ARTIFACT_DIR = os.getenv("ARTIFACT_DIR", "artifacts")
+
+
+def _path(name):
+    return os.path.join(ARTIFACT_DIR, f"{name}.json")
+
+
+def _clean(value):
+    # NaN is not valid JSON; store it as null
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    if isinstance(value, dict):
+        return {k: _clean(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_clean(v) for v in value]
+    return value
+
+
+def save_artifacts(name, payload):
+    os.makedirs(ARTIFACT_DIR, exist_ok=True)
+    tmp = _path(name) + '.tmp'
+    with open(tmp, 'w') as file:
+        json.dump(_clean(dict(payload, saved_at=time.time())), file)
+    os.replace(tmp, _path(name))
+
+
+# ✅ Returns None when missing, unreadable, or fitted with different settings than `expect`
+def load_artifacts(name, expect=None):
+    try:
+        with open(_path(name)) as file:
+            payload = json.load(file)
+    except (OSError, ValueError):
+        return None
+    for key, value in (expect or {}).items():
+        if payload.get(key) != value:
+            return None
+    return payload
@@ -0,0 +1,178 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from hedge import hedge_spread
+from signals import CLOSE, ENTRY_Z, EXIT_Z, position_states, signal_codes
+
+LIMIT_OFFSET = 0.001  # place_trade prices entries 0.1% through the last trade
+TP_PERCENT = 2
+SL_PERCENT = 1
+LOT_SIZE = 10
+
+EXIT_REASONS = np.array(['signal', 'tp', 'sl', 'open'], dtype=object)
+
+
+# ✅ Load a pair from local files only: a CSV/Parquet with both close columns, or the bar cache
+def load_pair(pair1, pair2, path=None, timeframe='1Day'):
+    if path:
+        prices = pd.read_parquet(path) if path.endswith('.parquet') else pd.read_csv(path, index_col=0, parse_dates=True)
+        return prices[[pair1, pair2]].dropna()
+
+    from bar_cache import load_bars
+
+    legs = []
+    for symbol in (pair1, pair2):
+        bars, _ = load_bars(symbol, timeframe)
+        if bars is None:
+            raise FileNotFoundError(f"No cached {timeframe} bars for {symbol}, run the bot or scanner once to fill the cache")
+        legs.append(bars[['close']].rename(columns={'close': symbol}))
+    return pd.merge(legs[0], legs[1], left_index=True, right_index=True)
+
+
+# ✅ Spread, rolling Z-Score and per-bar hedge ratio, same definitions as bott.py
+def prepare(prices, pair1, pair2, window=30, hedge_mode='ols'):
+    df = prices[[pair1, pair2]].astype(np.float64)
+    spread, betas, _ = hedge_spread(df, pair1, pair2, mode=hedge_mode)
+    mean = spread.rolling(window=window).mean()
+    std = spread.rolling(window=window).std()
+    return df[pair1].to_numpy(), df[pair2].to_numpy(), ((spread - mean) / std).to_numpy(), betas.to_numpy()
+
+
+def _forward_fill(values, starts, n):
+    out = np.zeros(n)
+    marks = np.full(n, -1)
+    marks[starts] = np.arange(len(starts))
+    marks = np.maximum.accumulate(marks)
+    valid = marks >= 0
+    out[valid] = values[marks[valid]]
+    return out
+
+
+# ✅ One leg of every trade: limit entry, TP/SL bracket, exit on the spread signal
+# side/qty are per trade, entries are entry bars, closes are the spread exit bars (n-1 if still open).
+def _simulate_leg(price, side, qty, entries, closes, still_open, tp_percent, sl_percent):
+    n = len(price)
+    entry_px = price[entries] * (1 + side * LIMIT_OFFSET)
+    tp_px = entry_px * (1 + side * tp_percent / 100)
+    sl_px = entry_px * (1 - side * sl_percent / 100)
+
+    # Bracket levels and side forward-filled over each trade so hits are found with array compares
+    in_trade = np.zeros(n + 1, dtype=np.int64)
+    np.add.at(in_trade, entries + 1, 1)
+    np.add.at(in_trade, closes + 1, -1)
+    in_trade = np.cumsum(in_trade)[:n] > 0  # bars entry+1 .. close
+    side_t = _forward_fill(side.astype(np.float64), entries, n)
+    tp_t = _forward_fill(tp_px, entries, n)
+    sl_t = _forward_fill(sl_px, entries, n)
+    tp_hit = in_trade & (side_t * (price - tp_t) >= 0)
+    sl_hit = in_trade & (side_t * (price - sl_t) <= 0)
+
+    # First hit inside each trade via reduceat over [entry+1, close+1) windows
+    candidates = np.append(np.where(tp_hit | sl_hit, np.arange(n), n), n)
+    bounds = np.column_stack([entries + 1, closes + 1]).ravel()
+    first_hit = np.minimum.reduceat(candidates, np.minimum(bounds, n))[::2]
+    first_hit[entries + 1 > closes] = n  # trade closed on the bar after entry with no room for a hit
+
+    hit = first_hit <= closes
+    exit_bar = np.where(hit, first_hit, closes)
+    reason = np.where(hit, np.where(tp_hit[np.minimum(first_hit, n - 1)], 1, 2), np.where(still_open, 3, 0))
+    exit_px = np.select(
+        [reason == 1, reason == 2, reason == 0],
+        [tp_px, price[exit_bar], price[exit_bar] * (1 - side * LIMIT_OFFSET)],
+        price[exit_bar])
+    pnl = side * qty * (exit_px - entry_px)
+
+    # Mark-to-market: unrealized while held, realized from the exit bar on
+    held = np.zeros(n + 1, dtype=np.int64)
+    np.add.at(held, entries, 1)
+    np.add.at(held, exit_bar, -1)
+    held = np.cumsum(held)[:n] > 0
+    coef = _forward_fill(side * qty, entries, n)
+    basis = _forward_fill(entry_px, entries, n)
+    unrealized = np.where(held, coef * (price - basis), 0.0)
+    realized = np.zeros(n)
+    np.add.at(realized, exit_bar, pnl)
+    return entry_px, exit_px, exit_bar, reason, pnl, unrealized + np.cumsum(realized)
+
+
+# ✅ Replay the strategy over arrays; returns (equity curve, trade list, stats)
+def run_backtest(price1, price2, z, betas, index=None, entry_z=ENTRY_Z, exit_z=EXIT_Z,
+                 tp_percent=TP_PERCENT, sl_percent=SL_PERCENT, lot_size=LOT_SIZE,
+                 capital=100_000.0, periods_per_year=252):
+    n = len(price1)
+    index = index if index is not None else np.arange(n)
+    _, action = position_states(signal_codes(z, entry_z, exit_z))
+
+    entries = np.flatnonzero((action != 0) & (action != CLOSE))
+    closes_at = np.flatnonzero(action == CLOSE)
+    # Each entry is closed by the next CLOSE action after it, or still open at the last bar
+    pos = np.searchsorted(closes_at, entries, side='right')
+    still_open = pos >= len(closes_at)
+    closes = np.full(len(entries), n - 1)
+    closes[~still_open] = closes_at[pos[~still_open]]
+
+    direction = action[entries].astype(np.float64)
+    qty1 = np.full(len(entries), float(lot_size))
+    # int(lot_size * hedge_ratio) as in execute_trades; place_trade rejects non-positive quantities
+    qty2 = np.maximum(np.trunc(lot_size * np.nan_to_num(betas[entries])), 0.0)
+
+    legs = [_simulate_leg(price1, direction, qty1, entries, closes, still_open, tp_percent, sl_percent),
+            _simulate_leg(price2, -direction, qty2, entries, closes, still_open, tp_percent, sl_percent)]
+
+    equity = pd.Series(capital + legs[0][5] + legs[1][5], index=index, name='equity')
+    trades = pd.DataFrame({
+        'entry_time': index[entries],
+        'direction': np.where(direction > 0, 'Long', 'Short'),
+        'qty1': qty1, 'entry1': legs[0][0], 'exit1': legs[0][1],
+        'exit_time1': index[legs[0][2]], 'reason1': EXIT_REASONS[legs[0][3]],
+        'qty2': qty2, 'entry2': legs[1][0], 'exit2': legs[1][1],
+        'exit_time2': index[legs[1][2]], 'reason2': EXIT_REASONS[legs[1][3]],
+        'pnl': legs[0][4] + legs[1][4],
+    })
+    return equity, trades, backtest_stats(equity, trades, periods_per_year)
+
+
+def backtest_stats(equity, trades, periods_per_year=252):
+    values = equity.to_numpy()
+    returns = np.diff(values) / values[:-1] if len(values) > 1 else np.zeros(0)
+    drawdown = values / np.maximum.accumulate(values) - 1 if len(values) else np.zeros(0)
+    pnl = trades['pnl'].to_numpy()
+    std = returns.std()
+    return {
+        'trades': len(trades),
+        'total_pnl': float(values[-1] - values[0]) if len(values) else 0.0,
+        'win_rate': float((pnl > 0).mean()) if len(pnl) else 0.0,
+        'avg_trade': float(pnl.mean()) if len(pnl) else 0.0,
+        'max_drawdown': float(drawdown.min()) if len(drawdown) else 0.0,
+        'sharpe': float(returns.mean() / std * np.sqrt(periods_per_year)) if std > 0 else 0.0,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline backtest of the z-score pairs strategy")
+    parser.add_argument('pair1')
+    parser.add_argument('pair2')
+    parser.add_argument('--data', help="CSV/Parquet with a column per symbol (default: bar cache)")
+    parser.add_argument('--timeframe', default='1Day')
+    parser.add_argument('--window', type=int, default=30)
+    parser.add_argument('--entry-z', type=float, default=ENTRY_Z)
+    parser.add_argument('--exit-z', type=float, default=EXIT_Z)
+    parser.add_argument('--tp', type=float, default=TP_PERCENT)
+    parser.add_argument('--sl', type=float, default=SL_PERCENT)
+    parser.add_argument('--hedge-mode', default='ols')
+    parser.add_argument('--periods-per-year', type=int, default=252)
+    args = parser.parse_args()
+
+    prices = load_pair(args.pair1, args.pair2, args.data, args.timeframe)
+    start = time.perf_counter()
+    p1, p2, z, betas = prepare(prices, args.pair1, args.pair2, args.window, args.hedge_mode)
+    equity, trades, stats = run_backtest(p1, p2, z, betas, prices.index, args.entry_z, args.exit_z,
+                                         args.tp, args.sl, periods_per_year=args.periods_per_year)
+    elapsed = time.perf_counter() - start
+    print(trades.tail(10))
+    for key, value in stats.items():
+        print(f"{key}: {value}")
+    print(f"Backtested {len(prices)} bars in {elapsed:.3f}s")
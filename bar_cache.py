@@ -0,0 +1,150 @@
+import json
+import os
+import re
+import uuid
+
+import numpy as np
+import pandas as pd
+
+# ✅ On-disk bar store: one directory per (timeframe, symbol), one .npy file per column
+CACHE_DIR = os.getenv("BAR_CACHE_DIR", "bar_cache")
+COLUMNS = ['open', 'high', 'low', 'close', 'volume']
+
+# hits: fully served from disk, partial: only edge gaps fetched, misses: nothing cached yet
+cache_stats = {'hits': 0, 'partial': 0, 'misses': 0, 'fetched_bars': 0}
+
+
+def get_cache_stats():
+    return dict(cache_stats)
+
+
+def _to_utc(value):
+    ts = pd.Timestamp(value)
+    if ts.tzinfo is None:
+        ts = ts.tz_localize('UTC')
+    return ts.tz_convert('UTC')
+
+
+def _cache_path(symbol, timeframe):
+    return os.path.join(CACHE_DIR, str(timeframe), symbol.replace('/', '_'))
+
+
+def _read_meta(path):
+    try:
+        with open(os.path.join(path, 'meta.json')) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def _column_file(path, name, version):
+    return os.path.join(path, f'{name}.{version}.npy')
+
+
+# ✅ Read cached bars (memory-mapped) and the date range they cover
+# meta.json names the version of the column files, so a load never mixes columns from two saves
+def load_bars(symbol, timeframe):
+    path = _cache_path(symbol, timeframe)
+    for attempt in range(2):
+        meta = _read_meta(path)
+        if meta is None or 'version' not in meta:
+            return None, None
+        try:
+            index = np.load(_column_file(path, 'timestamp', meta['version']), mmap_mode='r')
+            data = {col: np.load(_column_file(path, col, meta['version']), mmap_mode='r') for col in COLUMNS}
+            df = pd.DataFrame(data, index=pd.DatetimeIndex(np.asarray(index).view('datetime64[ns]'), tz='UTC'))
+            df.index.name = 'timestamp'
+            return df, (_to_utc(meta['start']), _to_utc(meta['end']))
+        except FileNotFoundError:
+            continue  # a save swapped meta.json and removed this version in between, read the new one
+        except Exception as e:
+            print(f"Error reading bar cache for {symbol}: {e}")
+            return None, None
+    return None, None
+
+
+# ✅ Write bars atomically so a crash mid-write never leaves a torn cache
+# Columns go to new files under a fresh version, then one meta.json replace switches every column at once.
+# The previous version is removed only after the switch (readers that already mapped it keep their copy).
+def save_bars(symbol, timeframe, df, covered):
+    path = _cache_path(symbol, timeframe)
+    os.makedirs(path, exist_ok=True)
+    previous = _read_meta(path)
+    version = uuid.uuid4().hex
+    df = df[~df.index.duplicated(keep='last')].sort_index()
+    arrays = {'timestamp': df.index.tz_convert('UTC').as_unit('ns').asi8}
+    for col in COLUMNS:
+        arrays[col] = df[col].to_numpy(dtype=np.float64) if col in df else np.full(len(df), np.nan)
+    for name, values in arrays.items():
+        np.save(_column_file(path, name, version), values)
+    tmp = os.path.join(path, f'meta.json.{version}.tmp')
+    with open(tmp, 'w') as file:
+        json.dump({'start': covered[0].isoformat(), 'end': covered[1].isoformat(), 'version': version}, file)
+    os.replace(tmp, os.path.join(path, 'meta.json'))
+
+    if previous is not None and 'version' in previous:
+        old = [_column_file(path, name, previous['version']) for name in arrays]
+    else:
+        old = [os.path.join(path, f'{name}.npy') for name in arrays]  # unversioned files of an older cache
+    for file in old:
+        try:
+            os.remove(file)
+        except FileNotFoundError:
+            pass
+
+
+# Start of the bar still forming at `now` for a timeframe like TimeFrame.Day / '1Day' / '15Min'
+def _forming_bar_start(now, timeframe):
+    match = re.match(r'(\d*)\s*(Min|T|Hour|H|Day|D|Week|W|Month|M)', str(timeframe))
+    amount, unit = (int(match.group(1) or 1), match.group(2)) if match else (1, 'Day')
+    if unit in ('Min', 'T'):
+        return now.floor(f'{amount}min')
+    if unit in ('Hour', 'H'):
+        return now.floor(f'{amount}h')
+    if unit in ('Week', 'W'):
+        return now.normalize() - pd.Timedelta(days=now.weekday())
+    if unit in ('Month', 'M'):
+        return now.normalize().replace(day=1)
+    return now.normalize()
+
+
+def _fetch(api, symbol, timeframe, start, end):
+    bars = api.get_bars(symbol, timeframe, start=start.isoformat(), end=end.isoformat()).df
+    cache_stats['fetched_bars'] += len(bars)
+    return bars[[col for col in COLUMNS if col in bars]]
+
+
+# ✅ Serve bars from disk and only download the missing edges of the requested range
+def get_bars_cached(api, symbol, timeframe, start_date, end_date):
+    start = _to_utc(start_date)
+    now = pd.Timestamp.now(tz='UTC')
+    end = min(_to_utc(end_date), now)
+    # Coverage stops before the bar still forming (today's daily bar), so the next call fetches it again
+    final = min(end, _forming_bar_start(now, timeframe) - pd.Timedelta(1, 'ns'))
+
+    cached, covered = load_bars(symbol, timeframe)
+    if cached is None:
+        cache_stats['misses'] += 1
+        bars = _fetch(api, symbol, timeframe, start, end)
+        if bars.empty or final < start:
+            return bars  # nothing final to keep (weekend, holiday, before listing, only the forming bar)
+        save_bars(symbol, timeframe, bars, (start, final))
+        return bars
+
+    pieces = [cached]
+    if start < covered[0]:
+        pieces.insert(0, _fetch(api, symbol, timeframe, start, covered[0]))
+    if end > covered[1]:
+        pieces.append(_fetch(api, symbol, timeframe, covered[1], end))
+
+    if len(pieces) == 1:
+        cache_stats['hits'] += 1
+        merged = cached
+    else:
+        cache_stats['partial'] += 1
+        # An empty edge (no bars in it) still extends the coverage, it just adds nothing
+        merged = pd.concat([piece for piece in pieces if not piece.empty])
+        merged = merged[~merged.index.duplicated(keep='last')].sort_index()
+        save_bars(symbol, timeframe, merged, (min(start, covered[0]), max(final, covered[1])))
+
+    return merged.loc[(merged.index >= start) & (merged.index <= end)]
@@ -0,0 +1,309 @@
+import argparse
+import itertools
+import json
+import operator
+import os
+
+import numpy as np
+import pandas as pd
+
+# ✅ Append-only columnar bar store for long intraday histories
+# bar_store/<timeframe>/<symbol>/<column>.bin holds raw little-endian values, meta.json the row count and
+# covered ranges. Pages are appended as they arrive, so peak memory is one page whatever the history length.
+STORE_DIR = os.getenv("BAR_STORE_DIR", "bar_store")
+PAGE_SIZE = 10_000  # Alpaca's max bars per page
+DTYPES = {'timestamp': '<i8', 'open': '<f4', 'high': '<f4', 'low': '<f4', 'close': '<f4', 'volume': '<i8',
+          'trade_count': '<i8', 'vwap': '<f4'}
+RAW_KEYS = {'open': 'o', 'high': 'h', 'low': 'l', 'close': 'c', 'volume': 'v', 'trade_count': 'n', 'vwap': 'vw'}
+
+store_stats = {'pages': 0, 'rows': 0}
+
+
+def _to_utc(value):
+    ts = pd.Timestamp(value)
+    if ts.tzinfo is None:
+        ts = ts.tz_localize('UTC')
+    return ts.tz_convert('UTC')
+
+
+def _store_path(symbol, timeframe, directory=STORE_DIR):
+    return os.path.join(directory, str(timeframe), symbol.replace('/', '_'))
+
+
+def _read_meta(path):
+    try:
+        with open(os.path.join(path, 'meta.json')) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_meta(path, meta):
+    tmp = os.path.join(path, 'meta.json.tmp')
+    with open(tmp, 'w') as file:
+        json.dump(meta, file)
+    os.replace(tmp, os.path.join(path, 'meta.json'))
+
+
+# ✅ Covered ranges: the time spans actually fetched, merged ([[start, end], ...] ISO strings in meta.json)
+def _ranges(meta):
+    return [(_to_utc(start), _to_utc(end)) for start, end in meta.get('ranges', [])]
+
+
+def _merge_ranges(ranges):
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+# Pieces of [start, end] no fetch has covered yet
+def _missing(ranges, start, end):
+    pieces = []
+    cursor = start
+    for lo, hi in ranges:
+        if hi < cursor:
+            continue
+        if lo > end:
+            break
+        if lo > cursor:
+            pieces.append((cursor, lo))
+        cursor = max(cursor, hi)
+    if cursor < end:
+        pieces.append((cursor, end))
+    return pieces
+
+
+# ✅ Column files opened for append; rows only count once meta.json says so (torn tails are cut on open)
+class BarWriter:
+    def __init__(self, path, reset=False):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        meta = None if reset else _read_meta(path)
+        self.meta = meta or {'rows': 0, 'start': None, 'end': None, 'ranges': [], 'dtypes': DTYPES}
+        if meta is None:
+            # Before the column files are truncated, or an interrupted reset leaves a meta.json counting rows
+            # that are gone
+            _write_meta(path, self.meta)
+        self.ranges = _ranges(self.meta)
+        self.files = {}
+        for column in DTYPES:
+            file = open(os.path.join(path, f'{column}.bin'), 'r+b' if meta else 'w+b')
+            file.truncate(self.meta['rows'] * np.dtype(DTYPES[column]).itemsize)
+            file.seek(0, os.SEEK_END)
+            self.files[column] = file
+
+    @property
+    def last_timestamp(self):
+        if not self.meta['rows']:
+            return None
+        file = self.files['timestamp']
+        file.seek(-8, os.SEEK_END)
+        return int(np.frombuffer(file.read(8), dtype=DTYPES['timestamp'])[0])
+
+    def append(self, columns):
+        rows = len(columns['timestamp'])
+        if not rows:
+            return 0
+        for column, file in self.files.items():
+            file.seek(0, os.SEEK_END)
+            file.write(np.ascontiguousarray(columns[column], dtype=DTYPES[column]).tobytes())
+        self.meta['rows'] += rows
+        return rows
+
+    def commit(self, start, end):
+        for file in self.files.values():
+            file.flush()
+            os.fsync(file.fileno())
+        self.ranges = _merge_ranges(self.ranges + [(start, end)])
+        self.meta['ranges'] = [[lo.isoformat(), hi.isoformat()] for lo, hi in self.ranges]
+        self.meta['start'] = self.meta['ranges'][0][0]
+        self.meta['end'] = self.meta['ranges'][-1][1]
+        _write_meta(self.path, self.meta)
+
+    def close(self):
+        for file in self.files.values():
+            file.close()
+
+
+# ✅ One page of raw bar dicts ({'t','o','h','l','c','v','n','vw'}) into typed column arrays
+def page_to_columns(page):
+    columns = {'timestamp': pd.to_datetime([bar['t'] for bar in page], utc=True, format='ISO8601')
+                                .as_unit('ns').asi8}
+    try:
+        values = np.array(list(map(_raw_values, page)), dtype=np.float64).reshape(len(page), len(RAW_KEYS))
+    except (KeyError, TypeError):
+        # Feeds without trade_count/vwap (or with nulls) take the slow path
+        values = np.array([[bar.get(key) or 0 for key in RAW_KEYS.values()] for bar in page], dtype=np.float64)
+    for i, column in enumerate(RAW_KEYS):
+        columns[column] = np.rint(values[:, i]) if DTYPES[column] == '<i8' else values[:, i]
+    return columns
+
+
+_raw_values = operator.itemgetter(*RAW_KEYS.values())
+
+
+def _pages(bars, page_size):
+    bars = iter(bars)
+    while True:
+        page = list(itertools.islice(bars, page_size))
+        if not page:
+            return
+        yield page
+
+
+# ✅ Page through the API (get_bars_iter follows next_page_token) straight into the store
+# Extends the history after the end of the covered range, a request that starts past it is fetched from there so
+# no hole is left. Rows are append-only, so a request reaching a gap before the end (or before the start) rebuilds
+# the store over the union of both ranges.
+def ingest_bars(api, symbol, timeframe, start_date, end_date, page_size=PAGE_SIZE, directory=STORE_DIR):
+    path = _store_path(symbol, timeframe, directory)
+    start = _to_utc(start_date)
+    end = min(_to_utc(end_date), pd.Timestamp.now(tz='UTC'))
+    meta = _read_meta(path)
+    ranges = _ranges(meta) if meta is not None else []
+    reset = False
+    if meta is not None and meta['rows'] and 'ranges' not in meta:
+        # Written before ranges were tracked: min/max only, it may hide holes
+        print(f"{symbol}: stored history has no covered ranges, re-ingesting")
+        ranges = [(_to_utc(meta['start']), _to_utc(meta['end']))]
+        reset = True
+    missing = _missing(ranges, start, end) if not reset else [(start, end)]
+    if not missing:
+        return 0
+    if ranges and missing[0][0] < ranges[-1][1]:
+        if not reset:
+            print(f"{symbol}: requested range starts before the stored history or inside a gap of it, re-ingesting")
+        reset = True
+        start, end = min(start, ranges[0][0]), max(end, ranges[-1][1])
+    elif ranges:
+        start = ranges[-1][1]
+    writer = BarWriter(path, reset=reset)
+    try:
+        last = writer.last_timestamp
+        if start >= end:
+            return 0
+        bars = api.get_bars_iter(symbol, timeframe, start=start.isoformat(), end=end.isoformat(), raw=True)
+        return _ingest_pages(writer, _pages(bars, page_size), last, start, end)
+    finally:
+        writer.close()
+
+
+def _ingest_pages(writer, pages, last, start, end):
+    appended = 0
+    for page in pages:
+        columns = page_to_columns(page)
+        if last is not None:
+            keep = columns['timestamp'] > last  # page boundaries can repeat the last stored bar
+            columns = {column: values[keep] for column, values in columns.items()}
+        if len(columns['timestamp']):
+            last = int(columns['timestamp'][-1])
+        appended += writer.append(columns)
+        store_stats['pages'] += 1
+        store_stats['rows'] += len(columns['timestamp'])
+        # Each page is durable on its own, an interrupted ingest resumes from here
+        writer.commit(start, min(pd.Timestamp(last, unit='ns', tz='UTC'), end) if last is not None else start)
+    writer.commit(start, end)
+    return appended
+
+
+# ✅ Tick data aggregated into fixed-width bars on the fly, same store layout (timeframe e.g. '10s')
+def aggregate_trades(trades, bar_seconds):
+    width = int(bar_seconds * 1e9)
+    for page in _pages(trades, PAGE_SIZE):
+        ts = pd.to_datetime([trade['t'] for trade in page], utc=True, format='ISO8601').as_unit('ns').asi8
+        price = np.fromiter((trade['p'] for trade in page), dtype=np.float64, count=len(page))
+        size = np.fromiter((trade['s'] for trade in page), dtype=np.float64, count=len(page))
+        yield ts // width * width, price, size
+
+
+def ingest_trades_as_bars(api, symbol, bar_seconds, start_date, end_date, directory=STORE_DIR):
+    path = _store_path(symbol, f'{bar_seconds}s', directory)
+    start = _to_utc(start_date)
+    end = min(_to_utc(end_date), pd.Timestamp.now(tz='UTC'))
+    writer = BarWriter(path, reset=True)
+    pending = None  # the last bar of a page may continue on the next one
+    try:
+        trades = api.get_trades_iter(symbol, start=start.isoformat(), end=end.isoformat(), raw=True)
+        for bucket, price, size in aggregate_trades(trades, bar_seconds):
+            if pending is not None:
+                bucket, price, size = (np.concatenate([pending[0], bucket]), np.concatenate([pending[1], price]),
+                                       np.concatenate([pending[2], size]))
+            tail = bucket == bucket[-1]
+            pending = (bucket[tail], price[tail], size[tail])
+            writer.append(_trade_bars(bucket[~tail], price[~tail], size[~tail]))
+            writer.commit(start, pd.Timestamp(int(bucket[-1]), unit='ns', tz='UTC'))
+        if pending is not None:
+            writer.append(_trade_bars(*pending))
+        writer.commit(start, end)
+        return writer.meta['rows']
+    finally:
+        writer.close()
+
+
+def _trade_bars(bucket, price, size):
+    if not len(bucket):
+        return {column: np.zeros(0) for column in DTYPES}
+    starts = np.flatnonzero(np.concatenate([[True], bucket[1:] != bucket[:-1]]))
+    ends = np.append(starts[1:], len(bucket)) - 1
+    volume = np.add.reduceat(size, starts)
+    return {'timestamp': bucket[starts], 'open': price[starts], 'high': np.maximum.reduceat(price, starts),
+            'low': np.minimum.reduceat(price, starts), 'close': price[ends], 'volume': np.rint(volume),
+            'trade_count': np.diff(np.append(starts, len(bucket))),
+            'vwap': np.add.reduceat(price * size, starts) / np.where(volume > 0, volume, 1)}
+
+
+# ✅ Read side: memory-mapped columns, only the requested slice is ever copied into pandas
+def open_bars(symbol, timeframe, directory=STORE_DIR):
+    path = _store_path(symbol, timeframe, directory)
+    meta = _read_meta(path)
+    if meta is None or not meta['rows']:
+        return None
+    return {column: np.memmap(os.path.join(path, f'{column}.bin'), dtype=dtype, mode='r', shape=(meta['rows'],))
+            for column, dtype in meta['dtypes'].items()}
+
+
+def load_bars(symbol, timeframe, start_date=None, end_date=None, columns=('close',), directory=STORE_DIR):
+    arrays = open_bars(symbol, timeframe, directory)
+    if arrays is None:
+        return None
+    ts = arrays['timestamp']
+    lo = np.searchsorted(ts, _to_utc(start_date).value) if start_date is not None else 0
+    hi = np.searchsorted(ts, _to_utc(end_date).value, side='right') if end_date is not None else len(ts)
+    index = pd.DatetimeIndex(np.asarray(ts[lo:hi]).view('datetime64[ns]'), tz='UTC', name='timestamp')
+    return pd.DataFrame({column: np.asarray(arrays[column][lo:hi]) for column in columns}, index=index)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest intraday bars into the columnar bar store")
+    parser.add_argument('symbols', nargs='*')
+    parser.add_argument('--file', help="text file with one symbol per line")
+    parser.add_argument('--timeframe', default='1Min')
+    parser.add_argument('--start', default='2020-01-01')
+    parser.add_argument('--end', default=pd.Timestamp.now(tz='UTC').isoformat())
+    parser.add_argument('--trades', type=int, metavar='SECONDS', help="aggregate trades into SECONDS-wide bars")
+    args = parser.parse_args()
+
+    symbols = list(args.symbols)
+    if args.file:
+        with open(args.file) as file:
+            symbols += [line.strip() for line in file if line.strip()]
+
+    from dotenv import load_dotenv
+    from transport import make_rest
+
+    load_dotenv()
+    api = make_rest(os.getenv("API_KEY"), os.getenv("SECRET_KEY"), 'https://paper-api.alpaca.markets')
+    for symbol in symbols:
+        try:
+            if args.trades:
+                rows = ingest_trades_as_bars(api, symbol, args.trades, args.start, args.end)
+            else:
+                rows = ingest_bars(api, symbol, args.timeframe, args.start, args.end)
+            print(f"{symbol}: {rows} bars stored")
+        except Exception as e:
+            print(f"Error ingesting {symbol}: {e}")
+    print(f"Store stats: {store_stats}")
@@ -0,0 +1,117 @@
+import argparse
+import contextlib
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+# bott reads its settings at import: keep the benchmark's checkpoints, journal and artifacts out of the real ones
+BENCH_DIR = tempfile.mkdtemp(prefix='bench-cycle-')
+os.environ.update(API_KEY=os.getenv("API_KEY") or 'bench', SECRET_KEY=os.getenv("SECRET_KEY") or 'bench',
+                  STATE_DB=os.path.join(BENCH_DIR, 'state.db'), JOURNAL_DIR=os.path.join(BENCH_DIR, 'journal'),
+                  ARTIFACT_DIR=os.path.join(BENCH_DIR, 'artifacts'))
+
+import bott
+from broker_state import BrokerState
+from order_tracker import OrderTracker
+from risk import RiskEngine
+from sim_broker import SimBroker
+from state_store import get_state_store
+
+
+# Stands in for bott's trade-update stream handle, so ensure_trade_updates never dials Alpaca
+class _SimStream:
+    def __init__(self, live):
+        self.live = live
+
+
+# ✅ Point bott at the simulator: its api, snapshot, risk engine and order tracker, fed by the simulator's
+# events when streamed (fills confirmed from events) or left to REST polling otherwise
+def use_broker(broker, symbols, streamed):
+    bott.api = broker
+    bott.broker_state = BrokerState(broker, symbols, max_age=30.0)
+    bott.risk = RiskEngine(broker, bott.broker_state)
+    bott.order_tracker = OrderTracker()
+    bott._trade_stream = _SimStream(streamed)
+    if streamed:
+        bott.order_tracker.add_listener(get_state_store().on_order_update)
+        bott.order_tracker.add_listener(bott.risk.on_order_update)
+        broker.subscribe(bott.order_tracker.on_update)
+
+
+# ✅ A z-score path that crosses the entry and exit bands, so every pair opens and closes several times
+def zscore_frame(n_bars, k, entry_z=bott.ENTRY_Z):
+    index = pd.date_range('2024-01-02', periods=n_bars, freq='1min', tz='UTC')
+    phase = np.random.default_rng(k).uniform(0, 2 * np.pi)
+    return pd.DataFrame({'Z-Score': (entry_z + 1.0) * np.sin(np.linspace(0, 6 * np.pi, n_bars) + phase)}, index=index)
+
+
+# Wrap a bott function so every call made by execute_trades is timed
+def _time_calls(name, timings):
+    original = getattr(bott, name)
+
+    def timed_call(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return original(*args, **kwargs)
+        finally:
+            timings[name].append((time.perf_counter() - start) * 1000)
+
+    setattr(bott, name, timed_call)
+    return original
+
+
+# ✅ bott's real batch path per pair: execute_trades -> open_spread/place_legs, close_spread/flatten
+def run_pairs(broker, n_pairs, n_bars, run_id):
+    timings = {'open_spread': [], 'close_spread': []}
+    originals = {name: _time_calls(name, timings) for name in timings}
+    try:
+        start = time.perf_counter()
+        # bott reports every leg it places, the table is the output here
+        with open(os.devnull, 'w') as quiet, contextlib.redirect_stdout(quiet):
+            for k in range(n_pairs):
+                bott.pair1, bott.pair2 = f"SYM{2 * k}", f"SYM{2 * k + 1}"
+                bott.BATCH_NAME = f"bench-{run_id}-{k}"  # fresh checkpoint and client order IDs per run
+                bott.execute_trades(zscore_frame(n_bars, k))
+        return (time.perf_counter() - start) * 1000, timings
+    finally:
+        for name, original in originals.items():
+            setattr(bott, name, original)
+
+
+def _stats(values):
+    return (np.mean(values), np.percentile(values, 99)) if values else (float('nan'), float('nan'))
+
+
+def run(sizes, n_bars, latency_ms, cancel_delay_ms):
+    pair1, pair2, hedge_ratio = bott.pair1, bott.pair2, bott.hedge_ratio
+    bott.hedge_ratio = 1.0
+    print(f"{'pairs':>6} {'mode':>9} {'trades':>7} {'open ms':>8} {'p99':>7} {'close ms':>9} {'p99':>7} "
+          f"{'calls/trade':>12} {'trades/s':>9}")
+    try:
+        for n_pairs in sizes:
+            for mode in ('polled', 'streamed'):
+                broker = SimBroker(latency_ms=latency_ms, cancel_delay_ms=cancel_delay_ms, seed=n_pairs)
+                use_broker(broker, [f"SYM{i}" for i in range(2 * n_pairs)], mode == 'streamed')
+                broker.reset_calls()
+                total_ms, timings = run_pairs(broker, n_pairs, n_bars, f"{mode}-{n_pairs}-{time.time_ns()}")
+                trades = len(timings['open_spread']) + len(timings['close_spread'])
+                open_mean, open_p99 = _stats(timings['open_spread'])
+                close_mean, close_p99 = _stats(timings['close_spread'])
+                print(f"{n_pairs:>6} {mode:>9} {trades:>7} {open_mean:>8.2f} {open_p99:>7.2f} {close_mean:>9.2f} "
+                      f"{close_p99:>7.2f} {broker.rest_calls / max(trades, 1):>12.1f} "
+                      f"{trades / (total_ms / 1000):>9.1f}")
+    finally:
+        bott.pair1, bott.pair2, bott.hedge_ratio = pair1, pair2, hedge_ratio
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="End-to-end bott cycle benchmark against the offline broker simulator")
+    parser.add_argument('--pairs', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--bars', type=int, default=300, help="bars per pair fed to execute_trades")
+    parser.add_argument('--latency-ms', type=float, default=5.0, help="simulated REST round trip")
+    parser.add_argument('--cancel-delay-ms', type=float, default=0.0, help="simulated pending_cancel duration")
+    args = parser.parse_args()
+    run(args.pairs, args.bars, args.latency_ms, args.cancel_delay_ms)
@@ -0,0 +1,88 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from signals import (CLOSE, OPEN_LONG, OPEN_SHORT, generate_signals_vectorized, position_states,
+                     signal_codes)
+
+
+# ✅ Row-by-row reference copies of the removed generate_signals and the execute_trades loop (no orders sent)
+def legacy_generate_signals(row):
+    if row['Z-Score'] > 2:
+        return "Short"
+    elif row['Z-Score'] < -2:
+        return "Long"
+    elif -0.5 <= row['Z-Score'] <= 0.5:
+        return "Exit"
+    else:
+        return "Hold"
+
+
+def legacy_actions(df):
+    position_open = False
+    actions = []
+    for index, row in df.iterrows():
+        signal = row['Signal']
+        if signal == "Long" and not position_open:
+            actions.append((index, OPEN_LONG))
+            position_open = True
+        elif signal == "Short" and not position_open:
+            actions.append((index, OPEN_SHORT))
+            position_open = True
+        elif signal == "Exit" and position_open:
+            actions.append((index, CLOSE))
+            position_open = False
+    return actions
+
+
+def make_frame(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    # Smoothed noise so the z-score wanders across the entry and exit bands
+    z = pd.Series(rng.standard_normal(rows)).ewm(alpha=0.03, adjust=False).mean().to_numpy() * 20
+    z[:29] = np.nan  # rolling window warm-up
+    return pd.DataFrame({'Z-Score': z}, index=pd.date_range('2020-01-01', periods=rows, freq='min'))
+
+
+def time_it(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+# ✅ Compare legacy and vectorized paths; legacy is extrapolated above --legacy-max rows
+def run(sizes, legacy_max):
+    print(f"{'rows':>10} {'legacy apply':>14} {'legacy iterrows':>16} {'vectorized':>12} {'speedup':>9}")
+    for rows in sizes:
+        df = make_frame(rows)
+        vec_time, (position, action) = time_it(
+            lambda: position_states(signal_codes(df['Z-Score'].to_numpy())))
+        vec_time += time_it(lambda: generate_signals_vectorized(df['Z-Score']))[0]
+
+        sample = df if rows <= legacy_max else df.iloc[:legacy_max]
+        apply_time, signals = time_it(lambda: sample.apply(legacy_generate_signals, axis=1))
+        sample = sample.assign(Signal=signals)
+        iter_time, actions = time_it(lambda: legacy_actions(sample))
+
+        expected = generate_signals_vectorized(sample['Z-Score'])
+        assert (expected.to_numpy() == sample['Signal'].to_numpy()).all(), "signal mismatch"
+        rows_hit = np.flatnonzero(action[:len(sample)])
+        assert [(sample.index[i], action[i]) for i in rows_hit] == actions, "state machine mismatch"
+
+        scale = rows / len(sample)
+        mark = " (est)" if scale > 1 else ""
+        apply_time *= scale
+        iter_time *= scale
+        speedup = (apply_time + iter_time) / vec_time
+        print(f"{rows:>10} {apply_time:>8.3f}s{mark:<6}{iter_time:>9.3f}s{mark:<6}"
+              f"{vec_time:>11.4f}s {speedup:>8.0f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark vectorized signals against the row-wise path")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 1_000_000, 10_000_000])
+    parser.add_argument('--legacy-max', type=int, default=1_000_000,
+                        help="rows to actually run through the legacy path before extrapolating")
+    args = parser.parse_args()
+    run(args.sizes, args.legacy_max)
@@ -1,11 +1,15 @@
 import numpy as np
 import pandas as pd
-import statsmodels.api as sm
 import matplotlib.pyplot as plt
-from alpaca_trade_api.rest import REST, TimeFrame
+from alpaca_trade_api.rest import TimeFrame
 from dotenv import load_dotenv
 import os
-import csv
+from bar_cache import get_bars_cached
+from hedge import hedge_spread
+from journal import get_journal
+from scheduler import Job, MarketCalendar, Scheduler
+from signals import ENTRY_Z, EXIT_Z, OPEN_LONG, OPEN_SHORT, generate_signals_vectorized, trade_actions
+from transport import make_rest
 
 pair1 = "TSLA"
 pair2 = "RIVN"
@@ -15,19 +19,18 @@ load_dotenv()
 API_KEY = os.getenv("API_KEY")
 SECRET_KEY = os.getenv("SECRET_KEY")
 BASE_URL = 'https://paper-api.alpaca.markets'
-api = REST(API_KEY, SECRET_KEY, BASE_URL)
+# Pooled keep-alive session with the shared rate budget and 429/5xx retries
+api = make_rest(API_KEY, SECRET_KEY, BASE_URL)
 
-# ✅ Logging Trades
-def log_trade(symbol, side, qty):
-    with open('trade_log.csv', 'a', newline='') as file:
-        writer = csv.writer(file)
-        writer.writerow([pd.Timestamp.now(), symbol, side, qty])
-        print(f"Trade Logged: {symbol}, {side}, {qty}")
+# ✅ Logging Trades (queued to the background journal writer, no file I/O on the order path)
+def log_trade(symbol, side, qty, price=None):
+    get_journal().record('bot', symbol, side, qty, price)
+    print(f"Trade Logged: {symbol}, {side}, {qty}")
 
 # ✅ Fetch Data from Alpaca
 def get_stock_data(symbol, start_date, end_date):
     try:
-        data = api.get_bars(symbol, TimeFrame.Day, start=start_date, end=end_date).df
+        data = get_bars_cached(api, symbol, TimeFrame.Day, start_date, end_date)
         data = data[['close']]
         data.columns = [symbol]
         return data
@@ -53,14 +56,10 @@ if abs(correlation) < 0.7:
     print("Correlation is too weak for pair trading. Exiting.")
     exit()
 
-# ✅ Perform Linear Regression to Find Hedge Ratio (Beta)
-X = sm.add_constant(df['pair2'])
-model = sm.OLS(df['pair1'], X).fit()
-hedge_ratio = model.params['pair2']
-print(f"Hedge Ratio (Beta): {hedge_ratio:.2f}")
-
-# ✅ Calculate Spread
-df['Spread'] = df['pair1'] - hedge_ratio * df['pair2']
+# ✅ Hedge Ratio (Beta): static OLS fit, or recursive least squares updated with every bar
+HEDGE_MODE = os.getenv("HEDGE_MODE", "ols")
+df['Spread'], df['Hedge_Ratio'], hedge_ratio = hedge_spread(df, 'pair1', 'pair2', mode=HEDGE_MODE)
+print(f"Hedge Ratio (Beta): {hedge_ratio:.2f} ({HEDGE_MODE})")
 
 # ✅ Calculate Rolling Mean and Standard Deviation
 df['Spread_Mean'] = df['Spread'].rolling(window=30).mean()
@@ -71,17 +70,7 @@ df['Z-Score'] = (df['Spread'] - df['Spread_Mean']) / df['Spread_Std']
 #print(df.tail())
 
 # ✅ Generate Signals Based on Z-Score
-def generate_signals(row):
-    if row['Z-Score'] > 2:
-        return "Short"
-    elif row['Z-Score'] < -2:
-        return "Long"
-    elif -0.5 <= row['Z-Score'] <= 0.5:
-        return "Exit"
-    else:
-        return "Hold"
-
-df['Signal'] = df.apply(generate_signals, axis=1)
+df['Signal'] = generate_signals_vectorized(df['Z-Score'], ENTRY_Z, EXIT_Z)
 print(df[['Z-Score', 'Signal']].tail())
 
 # ✅ Validate Trade Quantity
@@ -133,34 +122,29 @@ def get_current_position(symbol):
         return 0
 
 # ✅ Execute Trades Based on Signals
-def execute_trades(df):
-    position_open = False
+def execute_trades(df, entry_z=ENTRY_Z, exit_z=EXIT_Z):
     lot_size = 10
+    pair1_qty = lot_size
+    pair2_qty = int(lot_size * hedge_ratio)
 
-    for index, row in df.iterrows():
-        signal = row['Signal']
-        pair1_qty = lot_size
-        pair2_qty = int(lot_size * hedge_ratio)
-
-        if signal == "Long" and not position_open:
+    # Only the rows where the position state changes need a Python-level step
+    for index, action in trade_actions(df, entry_z, exit_z):
+        if action == OPEN_LONG:
             print(f"{index}: Opening Long Position (Long pair1, Short pair2)")
             place_trade('pair1', pair1_qty, 'buy')
             place_trade('pair2', pair2_qty, 'sell')
-            position_open = True
 
-        elif signal == "Short" and not position_open:
+        elif action == OPEN_SHORT:
             print(f"{index}: Opening Short Position (Short pair1, Long pair2)")
             place_trade('pair1', pair1_qty, 'sell')
             place_trade('pair2', pair2_qty, 'buy')
-            position_open = True
 
-        elif signal == "Exit" and position_open:
+        else:
             print(f"{index}: Exiting Position")
             if get_current_position('pair1') != 0:
                 place_trade('pair1', pair1_qty, 'sell' if get_current_position('pair1') > 0 else 'buy')
             if get_current_position('pair2') != 0:
                 place_trade('pair2', pair2_qty, 'buy' if get_current_position('pair2') < 0 else 'sell')
-            position_open = False
 
 
 def get_latest_price(symbol):
@@ -172,14 +156,15 @@ def get_latest_price(symbol):
     except Exception as e:
         print(f"Error fetching data for {symbol}: {e}")
         return None
-import time
-timee = 0
-while(1):
-    if(timee == 0):
-        execute_trades(df)
-        get_latest_price('pair1')
-        get_latest_price('pair2')
-        timee = 3600
-    timee -= 1
-    time.sleep(1)
-# ✅ Run the Trade Execution
+# ✅ Run the Trade Execution once per hourly bar close during market hours
+def hourly_check():
+    execute_trades(df)
+    get_latest_price('pair1')
+    get_latest_price('pair2')
+
+
+hourly_check()
+scheduler = Scheduler(MarketCalendar(api))
+scheduler.add(Job('pair1/pair2', hourly_check, '1h', market_hours=True))
+scheduler.run()
+print(f"Scheduler metrics: {scheduler.metrics()}")
@@ -1,12 +1,32 @@
+import argparse
 import numpy as np
 import pandas as pd
-import statsmodels.api as sm
-import matplotlib.pyplot as plt
-from alpaca_trade_api.rest import REST, TimeFrame
+from alpaca_trade_api.rest import TimeFrame
 from dotenv import load_dotenv
 import os
-import csv
-import time
+import asyncio
+import threading
+from artifacts import load_artifacts, save_artifacts
+from bar_cache import get_bars_cached
+from bar_store import ingest_bars, load_bars as load_stored_bars
+from broker_state import BrokerState
+from control import ControlPlane
+from flatten import flatten, print_report
+from execution import latency_summary, make_client_order_id, submit_legs
+from journal import get_journal
+from risk import RiskEngine
+import metrics
+from metrics import instrument_api, timed, timer
+from order_tracker import OrderTracker, start_trade_update_stream
+from plotting import LiveChart, render_in_background
+from scheduler import Job, MarketCalendar, Scheduler
+from stream import DATA_STREAM_URL, run_pair_stream
+from hedge import RecursiveHedgeRatio, hedge_spread
+from zscore_stream import RollingZScore
+from state_store import get_state_store
+from signals import (ENTRY_Z, EXIT_Z, OPEN_LONG, OPEN_SHORT, generate_signals_vectorized, position_states,
+                     signal_codes, trade_actions)
+from transport import make_rest
 
 pair1 = "GBPUSD"
 pair2 = "EURUSD"
@@ -16,19 +36,53 @@ load_dotenv()
 API_KEY = os.getenv("API_KEY")
 SECRET_KEY = os.getenv("SECRET_KEY")
 BASE_URL = 'https://paper-api.alpaca.markets'
-api = REST(API_KEY, SECRET_KEY, BASE_URL)
+# Pooled keep-alive session with the shared rate budget and 429/5xx retries
+# METRICS=1 / METRICS_PORT / METRICS_FILE / PROFILE_SAMPLE_MS turn on per-call timing and profiling
+metrics.start_from_env()
+api = instrument_api(make_rest(API_KEY, SECRET_KEY, BASE_URL))
 
-# ✅ Logging Trades
-def log_trade(symbol, side, qty, price, tp_price=None, sl_price=None):
-    with open('trade_log.csv', 'a', newline='') as file:
-        writer = csv.writer(file)
-        writer.writerow([pd.Timestamp.now(), symbol, side, qty, price, tp_price, sl_price])
-        print(f"Trade Logged: {symbol}, {side}, {qty}, price: ${price}, TP: ${tp_price}, SL: ${sl_price}")
+# ✅ Positions, open orders and latest trades for the strategy symbols, a few bulk calls per cycle
+broker_state = BrokerState(api, [pair1, pair2], max_age=30.0)
+# ✅ Pre-trade risk limits checked in memory (RISK_MAX_ORDER_NOTIONAL / RISK_MAX_POSITION_NOTIONAL / ...)
+risk = RiskEngine(api, broker_state)
+
+# ✅ Exit orders: 'bracket' attaches TP/SL to the entry, 'on_fill' places a TP/SL OCO from the fill event
+EXIT_MODE = os.getenv("EXIT_MODE", "bracket")
+order_tracker = OrderTracker()
+_trade_stream = None
+
+
+def ensure_trade_updates():
+    global _trade_stream
+    if _trade_stream is None:
+        order_tracker.add_listener(get_state_store().on_order_update)
+        order_tracker.add_listener(risk.on_order_update)
+        _trade_stream = start_trade_update_stream(order_tracker, key=API_KEY, secret=SECRET_KEY)
+    return order_tracker
+
+
+# Fill events can be waited on only while the stream is actually connected
+def trade_updates_live():
+    return _trade_stream is not None and _trade_stream.live
+
+# ✅ Logging Trades (queued to the background journal writer, no file I/O on the order path)
+def log_trade(symbol, side, qty, price, tp_price=None, sl_price=None, order_id=None):
+    get_journal().record('bott', symbol, side, qty, price, tp_price, sl_price, order_id)
+    print(f"Trade Logged: {symbol}, {side}, {qty}, price: ${price}, TP: ${tp_price}, SL: ${sl_price}")
 
 # ✅ Fetch Data from Alpaca
+# Daily bars go through the bar cache; intraday ones (BAR_TIMEFRAME=1Min etc.) are paged into the bar store
+BAR_TIMEFRAME = os.getenv("BAR_TIMEFRAME", "1Day")
+
+
 def get_stock_data(symbol, start_date, end_date):
     try:
-        data = api.get_bars(symbol, TimeFrame.Day, start=start_date, end=end_date).df
+        with timer('fetch_bars'):
+            if BAR_TIMEFRAME == '1Day':
+                data = get_bars_cached(api, symbol, TimeFrame.Day, start_date, end_date)
+            else:
+                ingest_bars(api, symbol, BAR_TIMEFRAME, start_date, end_date)
+                data = load_stored_bars(symbol, BAR_TIMEFRAME, start_date, end_date)
         data = data[['close']]
         data.columns = [symbol]
         return data
@@ -36,191 +90,155 @@ def get_stock_data(symbol, start_date, end_date):
         print(f"Error fetching data for {symbol}: {e}")
         return None
 
-# ✅ Get Data for pair1 and pair2
+# ✅ Analysis settings (nothing below runs at import time, see prepare_analysis / ensure_live_state)
 start_date = '2024-01-01'
 end_date = '2024-04-24'
-pair1_data = get_stock_data(pair1, start_date, end_date)
-pair2_data = get_stock_data(pair2, start_date, end_date)
-
-# ✅ Merge Data
-df = pd.merge(pair1_data, pair2_data, left_index=True, right_index=True)
-print(df.head())
-
-# ✅ Calculate Correlation
-correlation = df.corr().iloc[0, 1]
-print(f"Correlation between {pair1} and {pair2}: {correlation:.2f}")
-
-if abs(correlation) < 0.7:
-    print("Correlation is too weak for pair trading. Exiting.")
-    exit()
-
-# ✅ Perform Linear Regression to Find Hedge Ratio (Beta)
-X = sm.add_constant(df[pair2])
-model = sm.OLS(df[pair1], X).fit()
-hedge_ratio = model.params[pair2]
-print(f"Hedge Ratio (Beta): {hedge_ratio:.2f}")
-
-# ✅ Calculate Spread
-df['Spread'] = df[pair1] - hedge_ratio * df[pair2]
-
-# ✅ Calculate Rolling Mean and Standard Deviation
-df['Spread_Mean'] = df['Spread'].rolling(window=30).mean()
-df['Spread_Std'] = df['Spread'].rolling(window=30).std()
-
-# ✅ Calculate Z-Score
-df['Z-Score'] = (df['Spread'] - df['Spread_Mean']) / df['Spread_Std']
-print(df.tail())
-
-# ✅ Generate Signals Based on Z-Score
-def generate_signals(row):
-    if row['Z-Score'] > 2:
-        return "Short"
-    elif row['Z-Score'] < -2:
-        return "Long"
-    elif -0.5 <= row['Z-Score'] <= 0.5:
-        return "Exit"
-    else:
-        return "Hold"
+WINDOW = 30
+HEDGE_MODE = os.getenv("HEDGE_MODE", "ols")
+ARTIFACT_NAME = f"{pair1}_{pair2}"
+
+df = None
+hedge_ratio = None
+live_zscore = None
+live_hedge = None
+live_bar = None
+
+
+# ✅ Full analysis: fetch history, correlation check, hedge ratio, rolling stats and signals
+def prepare_analysis():
+    global df, hedge_ratio
+    pair1_data = get_stock_data(pair1, start_date, end_date)
+    pair2_data = get_stock_data(pair2, start_date, end_date)
+    if pair1_data is None or pair2_data is None:
+        return False
 
-df['Signal'] = df.apply(generate_signals, axis=1)
-print(df[['Z-Score', 'Signal']].tail())
+    # ✅ Merge Data
+    data = pd.merge(pair1_data, pair2_data, left_index=True, right_index=True)
+    print(data.head())
 
-# ✅ Plot Spread with Entry/Exit Points and TP/SL levels
-def plot_strategy(df):
-    plt.figure(figsize=(14, 8))
-    
-    # Plot 1: Spread and Z-score
-    ax1 = plt.subplot(211)
-    ax1.plot(df.index, df['Spread'], label='Spread')
-    ax1.plot(df.index, df['Spread_Mean'], label='Mean', linestyle='--', color='orange')
-    ax1.fill_between(df.index, 
-                     df['Spread_Mean'] + 2*df['Spread_Std'], 
-                     df['Spread_Mean'] - 2*df['Spread_Std'], 
-                     alpha=0.2, color='gray', label='±2 Std Dev')
-    
-    # Plot entry and exit points
-    buy_signals = df[df['Signal'] == 'Long']
-    sell_signals = df[df['Signal'] == 'Short']
-    exit_signals = df[df['Signal'] == 'Exit']
-    
-    ax1.scatter(buy_signals.index, buy_signals['Spread'], color='green', marker='^', s=100, label='Long')
-    ax1.scatter(sell_signals.index, sell_signals['Spread'], color='red', marker='v', s=100, label='Short')
-    ax1.scatter(exit_signals.index, exit_signals['Spread'], color='black', marker='x', s=100, label='Exit')
-    
-    ax1.set_title(f'Spread Between {pair1} and {pair2} with Signals')
-    ax1.legend()
-    
-    # Plot 2: Z-Score
-    ax2 = plt.subplot(212, sharex=ax1)
-    ax2.plot(df.index, df['Z-Score'], label='Z-Score', color='blue')
-    ax2.axhline(y=2, linestyle='--', color='red', label='Upper Threshold (2)')
-    ax2.axhline(y=-2, linestyle='--', color='green', label='Lower Threshold (-2)')
-    ax2.axhline(y=0.5, linestyle=':', color='gray', label='Exit Threshold (0.5)')
-    ax2.axhline(y=-0.5, linestyle=':', color='gray', label='Exit Threshold (-0.5)')
-    ax2.axhline(y=0, linestyle='-', color='black', alpha=0.3)
-    
-    # Add TP and SL levels based on standard deviation
-    tp_level = 3.0  # Take profit at 3 standard deviations
-    sl_level = 4.0  # Stop loss at 4 standard deviations (reversal of trade)
-    
-    ax2.axhline(y=tp_level, linestyle='--', color='green', alpha=0.5, label=f'TP Level (+{tp_level})')
-    ax2.axhline(y=-tp_level, linestyle='--', color='green', alpha=0.5, label=f'TP Level (-{tp_level})')
-    ax2.axhline(y=sl_level, linestyle='--', color='red', alpha=0.5, label=f'SL Level (+{sl_level})')
-    ax2.axhline(y=-sl_level, linestyle='--', color='red', alpha=0.5, label=f'SL Level (-{sl_level})')
-    
-    ax2.set_title('Z-Score with TP/SL Levels')
-    ax2.legend()
-    
-    plt.tight_layout()
-    plt.savefig('pairs_trading_strategy.png')
-    plt.show()
-
-# ✅ Validate Trade Quantity
-def validate_quantity(symbol, qty):
-    if qty <= 0:
-        print(f"Invalid quantity for {symbol}. Qty should be greater than zero.")
+    # ✅ Calculate Correlation
+    correlation = data.corr().iloc[0, 1]
+    print(f"Correlation between {pair1} and {pair2}: {correlation:.2f}")
+
+    if abs(correlation) < 0.7:
+        print("Correlation is too weak for pair trading.")
         return False
+
+    # ✅ Hedge Ratio (Beta): static OLS fit, or recursive least squares updated with every bar
+    with timer('hedge_fit'):
+        data['Spread'], data['Hedge_Ratio'], hedge_ratio = hedge_spread(data, pair1, pair2, mode=HEDGE_MODE)
+    print(f"Hedge Ratio (Beta): {hedge_ratio:.2f} ({HEDGE_MODE})")
+
+    # ✅ Calculate Rolling Mean and Standard Deviation
+    with timer('rolling_stats'):
+        data['Spread_Mean'] = data['Spread'].rolling(window=WINDOW).mean()
+        data['Spread_Std'] = data['Spread'].rolling(window=WINDOW).std()
+
+        # ✅ Calculate Z-Score
+        data['Z-Score'] = (data['Spread'] - data['Spread_Mean']) / data['Spread_Std']
+    print(data.tail())
+
+    with timer('signals'):
+        data['Signal'] = generate_signals_vectorized(data['Z-Score'], ENTRY_Z, EXIT_Z)
+    print(data[['Z-Score', 'Signal']].tail())
+    df = data
     return True
 
-# ✅ Place Trades with TP and SL
-def place_trade(symbol, qty, side, tp_percent=2, sl_percent=1):
-    if not validate_quantity(symbol, qty):
+
+def ensure_analysis():
+    return df is not None or prepare_analysis()
+
+
+# ✅ Plot Spread with Entry/Exit Points and TP/SL levels
+# Rendered headlessly on the plot thread from a screen-resolution downsample, the menu never blocks
+PLOT_PATH = 'pairs_trading_strategy.png'
+LIVE_CHART_PATH = os.getenv("LIVE_CHART")  # e.g. live_spread.png, redrawn as bars arrive
+live_chart = None
+
+
+def plot_strategy(df, wait=False):
+    future = render_in_background(df, PLOT_PATH, pair1, pair2, entry_z=ENTRY_Z, exit_z=EXIT_Z)
+    if wait:
+        print(f"Chart saved to {future.result()}")
+    else:
+        print(f"Rendering chart to {PLOT_PATH} in the background")
+    return future
+
+
+def update_live_chart(z):
+    global live_chart
+    if not LIVE_CHART_PATH:
         return
+    if live_chart is None:
+        live_chart = LiveChart(LIVE_CHART_PATH, f'Live Spread {pair1}/{pair2}', ENTRY_Z, EXIT_Z)
+        if df is not None:
+            live_chart.extend(df)
+    live_chart.append(pd.Timestamp.now(), live_zscore.spread, live_zscore.mean, live_zscore.std, z)
+
+# ✅ Report a submitted leg and log it
+def report_leg(result, tp_percent=2, sl_percent=1):
+    symbol, side, qty = result['symbol'], result['side'], result['qty']
+    if result['error'] is not None:
+        print(f"Error placing trade for {symbol}: {result['error']}")
+        return False
 
-    try:
-        latest_trade = api.get_latest_trade(symbol)
-        current_price = float(latest_trade.price)
-
-        # Calculate TP and SL based on direction
-        if side == 'buy':
-            entry_price = round(current_price * 1.001, 2)  # 0.1% above current price
-            tp_price = round(entry_price * (1 + tp_percent/100), 2)
-            sl_price = round(entry_price * (1 - sl_percent/100), 2)
-        else:  # sell
-            entry_price = round(current_price * 0.999, 2)  # 0.1% below current price
-            tp_price = round(entry_price * (1 - tp_percent/100), 2)
-            sl_price = round(entry_price * (1 + sl_percent/100), 2)
-
-        print(f"{symbol} Current Price: ${current_price}")
-        print(f"Placing Limit Order at: ${entry_price}")
-        print(f"Take Profit: ${tp_price} ({tp_percent}%)")
-        print(f"Stop Loss: ${sl_price} ({sl_percent}%)")
-
-        # Place Limit Order to enter the trade
-        order = api.submit_order(
-            symbol=symbol,
-            qty=qty,
-            side=side,
-            type='limit',
-            time_in_force='gtc',
-            limit_price=entry_price
-        )
-        print(f"Limit Order Placed: {side} {qty} of {symbol} (Order ID: {order.id})")
-        
-        # Submit bracket orders (One-Cancels-Other) for TP and SL
-        # Wait for the primary order to fill first
-        time.sleep(1)  # Give time for order to be processed
-        orders = api.list_orders(status='filled')
-        for filled_order in orders:
-            if filled_order.symbol == symbol and filled_order.side == side:
-                # Place take profit order
-                tp_side = 'sell' if side == 'buy' else 'buy'
-                tp_order = api.submit_order(
-                    symbol=symbol,
-                    qty=qty,
-                    side=tp_side,
-                    type='limit',
-                    time_in_force='gtc',
-                    limit_price=tp_price,
-                    order_class='oco',  # One-Cancels-Other
-                    stop_loss={'stop_price': sl_price}
-                )
-                print(f"TP/SL Orders Placed for {symbol} (Order ID: {tp_order.id})")
-                
-                # Log the trade
-                log_trade(symbol, side, qty, entry_price, tp_price, sl_price)
-                break
+    print(f"{symbol} Current Price: ${result['current_price']}")
+    print(f"Placing Limit Order at: ${result['entry_price']}")
+    if result['tp_price'] is not None:
+        print(f"Take Profit: ${result['tp_price']} ({tp_percent}%)")
+        print(f"Stop Loss: ${result['sl_price']} ({sl_percent}%)")
+    print(f"Limit Order Placed: {side} {qty} of {symbol} (Order ID: {result['order_id']}, "
+          f"ack {result['ack_ms']:.1f} ms)")
+    log_trade(symbol, side, qty, result['entry_price'], result['tp_price'], result['sl_price'], result['order_id'])
+    return True
 
-    except Exception as e:
-        print(f"Error placing trade for {symbol}: {e}")
 
+# ✅ Pre-trade risk check for a batch of legs, all in memory (prices from the cycle snapshot)
+# hedge_ratio marks the two legs as one spread entry: beta-neutral, approved or rejected together.
+def check_risk(legs, hedge_ratio=None):
+    if risk.buying_power is None:
+        risk.refresh()  # first order of the session: one account fetch
+    prices = {symbol: broker_state.latest_price(symbol) for symbol, _, _ in legs}
+    risk.set_prices({symbol: price for symbol, price in prices.items() if price is not None})
+    pairs = [(0, 1, hedge_ratio)] if hedge_ratio is not None and len(legs) == 2 else ()
+    return risk.check(legs, pairs)
+
+
+# ✅ Price and submit several legs concurrently; legs is a list of (symbol, qty, side)
+# With a bar the client order IDs are derived from it, so sending the same bar's legs twice is a no-op,
+# and the orders are recorded in the state store under `strategy`.
+def place_legs(legs, tp_percent=2, sl_percent=1, bracket=True, bar=None, strategy=ARTIFACT_NAME, hedge_ratio=None):
+    with timer('risk_check'):
+        reasons = check_risk(legs, hedge_ratio)
+    legs = [leg for leg, reason in zip(legs, reasons) if reason is None]
+    if not legs:
+        return []
+    client_order_ids = None
+    if bar is not None:
+        client_order_ids = [make_client_order_id(strategy, bar, symbol, side) for symbol, _, side in legs]
+    with timer('submit_legs'):
+        results = submit_legs(api, legs, tp_percent, sl_percent, bracket, state=broker_state,
+                              tracker=ensure_trade_updates(), exits_on_fill=bracket and EXIT_MODE == 'on_fill',
+                              client_order_ids=client_order_ids)
+    risk.submitted(results)
+    if bar is not None:
+        get_state_store().record_orders(strategy, [
+            dict(result, bar=bar, status='rejected' if result['error'] is not None else None) for result in results])
+    for result in results:
+        if result.get('duplicate'):
+            print(f"{result['symbol']}: {result['side']} for bar {bar} was already sent "
+                  f"(Order ID: {result['order_id']})")
+    return [report_leg(result, tp_percent, sl_percent) for result in results if not result.get('duplicate')]
 
-# ✅ Check Current Positions
-def get_current_position(symbol):
-    try:
-        position = api.get_position(symbol)
-        return int(position.qty)
-    except Exception:
-        return 0
 
 # ✅ NEW: List all open orders
 def list_open_orders(symbol=None):
     try:
         if symbol:
-            orders = api.list_orders(status='open', symbols=symbol)
+            orders = broker_state.open_orders(symbol)
             print(f"\n--- Open Orders for {symbol} ---")
         else:
-            orders = api.list_orders(status='open')
+            orders = broker_state.open_orders()
             print("\n--- All Open Orders ---")
             
         if not orders:
@@ -250,6 +268,7 @@ def list_open_orders(symbol=None):
 def cancel_order(order_id):
     try:
         api.cancel_order(order_id)
+        broker_state.on_order_change()
         print(f"Order {order_id} cancelled successfully.")
         return True
     except Exception as e:
@@ -265,78 +284,218 @@ def cancel_all_orders(symbol=None):
         else:
             api.cancel_all_orders()
             print("All open orders cancelled.")
+        broker_state.on_order_change()
         return True
     except Exception as e:
         print(f"Error cancelling orders: {e}")
         return False
 
-# ✅ NEW: Close position for a symbol
+# ✅ NEW: Close position for a symbol (cancel its orders, close, verify; see flatten.py)
 def close_position(symbol):
-    try:
-        position = api.get_position(symbol)
-        qty = abs(float(position.qty))
-        side = 'sell' if float(position.qty) > 0 else 'buy'
-        
-        # Cancel any open orders for this symbol first
-        cancel_all_orders(symbol)
-        
-        # Submit market order to close the position
-        api.submit_order(
-            symbol=symbol,
-            qty=qty,
-            side=side,
-            type='market',
-            time_in_force='gtc'
-        )
-        print(f"Position for {symbol} closed with market order ({side} {qty} shares).")
-        return True
-    except Exception as e:
-        print(f"Error closing position for {symbol}: {e}")
-        return False
+    report = flatten_symbols([symbol])
+    return report is not None and report['flat']
 
 # ✅ NEW: Close all positions
 def close_all_positions():
+    report = flatten_symbols(None)
+    return report is not None and report['flat']
+
+
+def flatten_symbols(symbols):
     try:
-        api.close_all_positions()
-        print("All positions closed.")
-        return True
+        # Fill events confirm the closes when the trade-update stream is up, otherwise bulk polling does
+        tracker = order_tracker if trade_updates_live() else None
+        report = flatten(api, symbols, tracker=tracker, state=broker_state)
+        print_report(report)
+        return report
     except Exception as e:
-        print(f"Error closing all positions: {e}")
+        print(f"Error flattening {symbols or 'all symbols'}: {e}")
+        return None
+
+# ✅ Open / close the spread (shared by the batch and streaming paths)
+def open_spread(direction, label, lot_size=10, bar=None, strategy=ARTIFACT_NAME):
+    if hedge_ratio is None or not np.isfinite(hedge_ratio):
+        print(f"{label}: No usable hedge ratio yet ({hedge_ratio}), not opening")
         return False
+    pair1_qty = lot_size
+    pair2_qty = int(lot_size * hedge_ratio)
+    if direction == OPEN_LONG:
+        print(f"{label}: Opening Long Position (Long {pair1}, Short {pair2})")
+        place_legs([(pair1, pair1_qty, 'buy'), (pair2, pair2_qty, 'sell')], tp_percent=2, sl_percent=1, bar=bar,
+                   strategy=strategy, hedge_ratio=hedge_ratio)
+    else:
+        print(f"{label}: Opening Short Position (Short {pair1}, Long {pair2})")
+        place_legs([(pair1, pair1_qty, 'sell'), (pair2, pair2_qty, 'buy')], tp_percent=2, sl_percent=1, bar=bar,
+                   strategy=strategy, hedge_ratio=hedge_ratio)
+    return True
+
+
+# The entries' bracket TP/SL legs hold the position until they are cancelled, so an exit cancels both
+# symbols' working orders first, then closes and verifies (see flatten.py). Re-running it on a flat spread is a no-op.
+def close_spread(label):
+    print(f"{label}: Exiting Position")
+    report = flatten_symbols([pair1, pair2])
+    return report is not None and report['flat']
+
 
 # ✅ Execute Trades Based on Signals
-def execute_trades(df):
-    position_open = False
-    lot_size = 10
-
-    for index, row in df.iterrows():
-        signal = row['Signal']
-        pair1_qty = lot_size
-        pair2_qty = int(lot_size * hedge_ratio)
-
-        if signal == "Long" and not position_open:
-            print(f"{index}: Opening Long Position (Long {pair1}, Short {pair2})")
-            place_trade(pair1, pair1_qty, 'buy', tp_percent=2, sl_percent=1)
-            place_trade(pair2, pair2_qty, 'sell', tp_percent=2, sl_percent=1)
-            position_open = True
-
-        elif signal == "Short" and not position_open:
-            print(f"{index}: Opening Short Position (Short {pair1}, Long {pair2})")
-            place_trade(pair1, pair1_qty, 'sell', tp_percent=2, sl_percent=1)
-            place_trade(pair2, pair2_qty, 'buy', tp_percent=2, sl_percent=1)
-            position_open = True
-
-        elif signal == "Exit" and position_open:
-            print(f"{index}: Exiting Position")
-            # Close existing positions
-            pair1_pos = get_current_position(pair1)
-            pair2_pos = get_current_position(pair2)
-            
-            if pair1_pos != 0:
-                place_trade(pair1, abs(pair1_pos), 'sell' if pair1_pos > 0 else 'buy')
-            if pair2_pos != 0:
-                place_trade(pair2, abs(pair2_pos), 'buy' if pair2_pos < 0 else 'sell')
-            position_open = False
+# Resumes after the last checkpointed bar in the position it was left in, so a re-run only trades new bars
+BATCH_NAME = f"{ARTIFACT_NAME}-batch"
+
+
+def execute_trades(df, entry_z=ENTRY_Z, exit_z=EXIT_Z):
+    store = get_state_store()
+    checkpoint = store.load(BATCH_NAME, artifact_settings())
+    position = 0
+    if checkpoint is not None and checkpoint['last_bar'] is not None:
+        position = checkpoint['position']
+        df = df[df.index > pd.Timestamp(checkpoint['last_bar'])]
+        print(f"Resuming after {checkpoint['last_bar']} (position {position}), {len(df)} new bars")
+    if df.empty:
+        return
+
+    # Only the rows where the position state changes need a Python-level step
+    for index, action in trade_actions(df, entry_z, exit_z, start_open=position):
+        if action in (OPEN_LONG, OPEN_SHORT):
+            open_spread(action, index, bar=index, strategy=BATCH_NAME)
+            position = int(action)
+        else:
+            close_spread(index)
+            position = 0
+        store.checkpoint(BATCH_NAME, position, index, hedge_ratio, settings=artifact_settings())
+    store.checkpoint(BATCH_NAME, position, df.index[-1], hedge_ratio, settings=artifact_settings())
+
+
+# ✅ Live Z-Score / hedge state: restored from the artifact cache, or fitted once and cached
+def artifact_settings():
+    return {'pair1': pair1, 'pair2': pair2, 'timeframe': BAR_TIMEFRAME, 'hedge_mode': HEDGE_MODE, 'window': WINDOW,
+            'entry_z': ENTRY_Z, 'exit_z': EXIT_Z, 'end_date': end_date}
+
+
+def live_state():
+    return {'zscore': live_zscore.to_state(), 'hedge': live_hedge.to_state() if live_hedge is not None else None}
+
+
+def restore_live_state(saved_ratio, state):
+    global hedge_ratio, live_zscore, live_hedge
+    hedge_ratio = saved_ratio
+    live_zscore = RollingZScore.from_state(state['zscore'])
+    live_hedge = RecursiveHedgeRatio.from_state(state['hedge']) if state['hedge'] else None
+
+
+def save_live_state():
+    save_artifacts(ARTIFACT_NAME, dict(artifact_settings(), hedge_ratio=hedge_ratio, **live_state()))
+
+
+# ✅ Per-bar checkpoint in the state store (a single WAL append, no file rewrite)
+def checkpoint_live_state(bar):
+    global live_bar
+    get_state_store().checkpoint(ARTIFACT_NAME, live_zscore.position, bar, hedge_ratio, live_state(),
+                                 artifact_settings())
+    live_bar = bar
+
+
+def _bar_time(bar):
+    ts = pd.Timestamp(bar)
+    return ts.tz_localize('UTC') if ts.tzinfo is None else ts.tz_convert('UTC')
+
+
+def ensure_live_state(refresh=False):
+    global hedge_ratio, live_zscore, live_hedge, live_bar
+    if live_zscore is not None and not refresh:
+        return True
+
+    # Newest first: the last bar checkpoint, then the fitted artifacts, then a fresh fit
+    checkpoint = None if refresh else get_state_store().load(ARTIFACT_NAME, artifact_settings())
+    if checkpoint is not None and checkpoint['state'] is not None:
+        hedge_ratio = checkpoint['hedge_ratio']
+        live_zscore = RollingZScore.from_state(checkpoint['state']['zscore'])
+        hedge = checkpoint['state']['hedge']
+        live_hedge = RecursiveHedgeRatio.from_state(hedge) if hedge else None
+        live_bar = checkpoint['last_bar']
+        outstanding = get_state_store().outstanding(ARTIFACT_NAME)
+        print(f"Resumed from checkpoint at bar {live_bar} (position {live_zscore.position}, "
+              f"{len(outstanding)} outstanding orders)")
+        return True
+
+    cached = None if refresh else load_artifacts(ARTIFACT_NAME, artifact_settings())
+    if cached is not None:
+        hedge_ratio = cached['hedge_ratio']
+        live_zscore = RollingZScore.from_state(cached['zscore'])
+        live_hedge = RecursiveHedgeRatio.from_state(cached['hedge']) if cached['hedge'] else None
+        print(f"Restored live state from cache (Hedge Ratio: {hedge_ratio:.2f})")
+        return True
+
+    if not ensure_analysis():
+        return False
+    last_position = position_states(signal_codes(df['Z-Score'], ENTRY_Z, EXIT_Z))[0][-1]
+    live_zscore = RollingZScore(window=WINDOW, hedge_ratio=hedge_ratio, position=int(last_position)).seed(df['Spread'])
+    live_hedge = RecursiveHedgeRatio().seed(df[pair1], df[pair2]) if HEDGE_MODE == 'recursive' else None
+    save_live_state()
+    return True
+
+
+@timed('bar_cycle')
+def trade_latest_bar(price1=None, price2=None, bar=None):
+    global hedge_ratio
+    if not ensure_live_state():
+        return None
+    # Scheduled checks are labelled with the check period they fall in, streamed bars with their own time
+    bar = _bar_time(bar if bar is not None else pd.Timestamp.now(tz='UTC').floor(CHECK_TIMEFRAME)).isoformat()
+    if live_bar is not None and _bar_time(bar) <= _bar_time(live_bar):
+        print(f"Bar {bar} already processed (last checkpoint {live_bar}), skipping")
+        return None
+    # Every bar, scheduled or streamed: positions and orders from the snapshot, the account once a minute.
+    # A failed fetch skips this bar only (an API error must not end the bar stream)
+    try:
+        risk.refresh()
+    except Exception as e:
+        print(f"Error refreshing the risk state, skipping bar {bar}: {e}")
+        return None
+    if price1 is None:
+        price1 = get_latest_price(pair1)
+    if price2 is None:
+        price2 = get_latest_price(pair2)
+    if price1 is None or price2 is None:
+        return None
+
+    # If the orders raise, the estimators go back to before this bar, so the retried bar is not counted twice
+    saved = (hedge_ratio, live_state())
+    try:
+        if live_hedge is not None:
+            beta = live_hedge.update(float(price1), float(price2))
+            if not np.isnan(beta):
+                hedge_ratio = beta
+                live_zscore.hedge_ratio = beta
+
+        with timer('zscore_update'):
+            z, signal, action = live_zscore.update(float(price1), float(price2))
+        print(f"Live Z-Score: {z:.2f} ({signal})")
+        update_live_chart(z)
+        label = pd.Timestamp.now()
+        if action in (OPEN_LONG, OPEN_SHORT):
+            if not open_spread(action, label, bar=bar):
+                live_zscore.position = 0  # nothing was opened, the next bar may signal the entry again
+        elif action:
+            close_spread(label)
+    except Exception:
+        restore_live_state(*saved)
+        raise
+    # After the orders: a crash before this line re-runs the bar, and its orders resolve to the ones already sent
+    with timer('save_state'):
+        checkpoint_live_state(bar)
+    return signal
+
+
+# ✅ Event-driven mode: each streamed bar pair is evaluated the moment it arrives
+def stream_trading(url=DATA_STREAM_URL):
+    if not ensure_live_state():
+        return
+    print("Starting streaming trading. Press Ctrl+C to return to menu.")
+    stats = run_pair_stream(pair1, pair2, trade_latest_bar, url, API_KEY, SECRET_KEY)
+    print(f"Stream stats: {stats}")
+    if metrics.registry.enabled:
+        print(f"Stage timings: {metrics.registry.summary()}")
 
 
 def get_latest_price(symbol):
@@ -349,6 +508,114 @@ def get_latest_price(symbol):
         print(f"Error fetching data for {symbol}: {e}")
         return None
 
+# ✅ Automated trading: one check per bar close, scheduled instead of polled
+CHECK_TIMEFRAME = '1h'
+MARKET_HOURS_ONLY = False  # FX pairs trade around the clock; set True for equities
+
+
+# One trading cycle at a time, whether scheduled or asked for from the control plane
+_cycle_lock = threading.Lock()
+
+
+@timed('check_cycle')
+def automated_check():
+    with _cycle_lock:
+        print(f"\n--- Trading Check at {pd.Timestamp.now()} ---")
+        broker_state.refresh()
+        # Feed the newest bar into the live Z-Score instead of replaying the static frame
+        trade_latest_bar()
+
+
+# ✅ Control plane mode: the scheduler trades on its own event loop while operator commands run on the
+# control plane's worker threads (python control.py positions, python control.py stop, ...)
+_control_stop = None
+
+
+def run_once():
+    # An operator run never queues behind (or in front of) a scheduled cycle
+    if not _cycle_lock.acquire(blocking=False):
+        return {'status': 'busy', 'detail': 'a trading cycle is running, try again'}
+    try:
+        if not ensure_analysis():
+            return {'status': 'error', 'detail': 'analysis failed'}
+        execute_trades(df)
+        return {'status': 'done', 'checkpoint': get_state_store().load(BATCH_NAME)}
+    finally:
+        _cycle_lock.release()
+
+
+def plot_command():
+    if not ensure_analysis():
+        return {'status': 'error', 'detail': 'analysis failed'}
+    plot_strategy(df)
+    return {'status': 'rendering', 'path': PLOT_PATH}
+
+
+def status_command(scheduler=None):
+    return {'pair': f"{pair1}/{pair2}", 'position': live_zscore.position if live_zscore is not None else None,
+            'last_bar': live_bar, 'hedge_ratio': hedge_ratio,
+            'outstanding_orders': len(get_state_store().outstanding(ARTIFACT_NAME)), 'order_acks': latency_summary(),
+            'scheduler': scheduler.metrics() if scheduler is not None else None}
+
+
+def make_control_plane(scheduler=None):
+    control = ControlPlane()
+    control.register('orders', lambda symbol=None: list_open_orders(symbol), "open orders [symbol=]")
+    control.register('positions', lambda: broker_state.positions(), "current positions")
+    control.register('cancel', cancel_order, "cancel one order: order_id=")
+    control.register('cancel_all', lambda symbol=None: cancel_all_orders(symbol), "cancel open orders [symbol=]")
+    control.register('close', close_position, "close a position: symbol=")
+    control.register('close_all', close_all_positions, "close every position")
+    control.register('flatten', lambda symbols=None: flatten_symbols(symbols.split(',') if symbols else None),
+                     "cancel orders and close positions, verified: [symbols=A,B]")
+    control.register('run_once', run_once, "run the trading algorithm over the analysis frame once")
+    control.register('check', automated_check, "run one live trading check now")
+    control.register('plot', plot_command, "render the strategy chart")
+    control.register('status', lambda: status_command(scheduler), "position, last bar, order acks, scheduler metrics")
+    control.register('risk', risk.snapshot, "risk engine view: equity, buying power, exposure, rejections")
+    control.register('stop', stop_controlled, "stop automated trading and exit")
+    return control
+
+
+def stop_controlled():
+    if _control_stop is None:
+        return {'status': 'not running'}
+    loop, stop = _control_stop
+    loop.call_soon_threadsafe(stop.set)
+    return {'status': 'stopping'}
+
+
+def run_controlled():
+    global _control_stop
+    if not ensure_live_state():
+        return
+    scheduler = Scheduler(MarketCalendar(api))
+    scheduler.add(Job(f"{pair1}/{pair2}", automated_check, CHECK_TIMEFRAME, market_hours=MARKET_HOURS_ONLY))
+    control = make_control_plane(scheduler)
+    control.serve()
+
+    async def trade():
+        global _control_stop
+        _control_stop = (asyncio.get_running_loop(), asyncio.Event())
+        try:
+            await asyncio.to_thread(automated_check)  # Start immediately
+        except Exception as e:
+            # Same as a failed scheduled run (Scheduler._execute): report it, keep trading and serving commands
+            print(f"Error in the first trading check: {e}")
+        await scheduler.run_async(_control_stop[1])
+
+    print("Automated trading with the control plane. Stop with `python control.py stop` or Ctrl+C.")
+    try:
+        asyncio.run(trade())
+    except KeyboardInterrupt:
+        print("\nScheduler stopped.")
+    finally:
+        _control_stop = None
+        control.shutdown()
+    print(f"Scheduler metrics: {scheduler.metrics()}")
+    print(f"Control command latencies: {control.stats()}")
+
+
 # ✅ NEW: Interactive command menu
 def show_command_menu():
     print("\n===== Pairs Trading Command Menu =====")
@@ -361,16 +628,17 @@ def show_command_menu():
     print("7. Run trading algorithm once")
     print("8. Start automated trading")
     print("9. Plot strategy")
+    print("10. Start streaming trading (event-driven)")
     print("0. Exit program")
     print("=====================================")
     
-    choice = input("Enter your choice (0-9): ")
+    choice = input("Enter your choice (0-10): ")
     return choice
 
 # ✅ NEW: Show all current positions
 def show_positions():
     try:
-        positions = api.list_positions()
+        positions = broker_state.positions()
         print("\n--- Current Positions ---")
         if not positions:
             print("No open positions.")
@@ -392,43 +660,19 @@ def show_positions():
         print(f"Error retrieving positions: {e}")
 
 # ✅ Main function with interactive menu
-def main():
+def main(automated=False):
     # Initial setup and analysis
     #plot_strategy(df)  # Plot the strategy before execution
     
-    automated_mode = False
-    check_interval = 3600  # Check every hour
-    next_check_time = 0
+    automated_mode = automated
     
     while True:
         if automated_mode:
-            current_time = int(time.time())
-            
-            if current_time >= next_check_time:
-                print(f"\n--- Trading Check at {pd.Timestamp.now()} ---")
-                execute_trades(df)
-                
-                # Get latest prices for monitoring
-                get_latest_price(pair1)
-                get_latest_price(pair2)
-                
-                # Set next check time
-                next_check_time = current_time + check_interval
-                print(f"Next check in {check_interval} seconds")
-                print("\nPress Ctrl+C to return to menu...")
-            
-            # Sleep to avoid excessive CPU usage
-            time.sleep(5)
-            
-            # Check if user wants to go back to menu (non-blocking input)
-            # This is simplified here, actual non-blocking input requires more complex code
-            try:
-                # This is a simplification - in a real application, you'd use a more 
-                # sophisticated approach for non-blocking input
-                pass
-            except KeyboardInterrupt:
-                automated_mode = False
-                print("\nReturning to menu...")
+            # Trades on each bar close with the control plane up; `python control.py stop` (or Ctrl+C)
+            # stops the scheduler and returns to the menu
+            run_controlled()
+            automated_mode = False
+            print("\nReturning to menu...")
         else:
             choice = show_command_menu()
             
@@ -448,19 +692,44 @@ def main():
             elif choice == '6':
                 close_all_positions()
             elif choice == '7':
-                execute_trades(df)
+                if ensure_analysis():
+                    execute_trades(df)
             elif choice == '8':
                 automated_mode = True
-                next_check_time = int(time.time())  # Start immediately
-                print("Starting automated trading. Press Ctrl+C to return to menu.")
             elif choice == '9':
-                plot_strategy(df)
+                if ensure_analysis():
+                    plot_strategy(df)
+            elif choice == '10':
+                stream_trading()
             elif choice == '0':
                 print("Exiting program...")
                 break
             else:
                 print("Invalid choice. Please try again.")
 
-# Run the main function if script is executed directly
+# ✅ CLI entry point: analysis and plotting only run when a command asks for them
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Pairs trading bot")
+    parser.add_argument('command', nargs='?', default='menu',
+                        choices=['menu', 'auto', 'stream', 'once', 'analyze', 'plot'])
+    parser.add_argument('--refresh', action='store_true', help="refit instead of using cached artifacts")
+    args = parser.parse_args()
+
+    if args.refresh and args.command in ('menu', 'auto', 'stream'):
+        prepare_analysis() and ensure_live_state(refresh=True)
+
+    if args.command == 'menu':
+        main()
+    elif args.command == 'auto':
+        main(automated=True)
+    elif args.command == 'stream':
+        stream_trading()
+    elif args.command == 'once':
+        if prepare_analysis():
+            execute_trades(df)
+    elif args.command == 'analyze':
+        if prepare_analysis():
+            ensure_live_state(refresh=True)
+    elif args.command == 'plot':
+        if prepare_analysis():
+            plot_strategy(df, wait=True)
\ No newline at end of file
@@ -0,0 +1,129 @@
+import threading
+import time
+
+import pandas as pd
+
+PAGE_LIMIT = 500  # the most list_orders returns per call
+
+
+# ✅ Every open order, paged newest first by submission time; a single call silently stops at PAGE_LIMIT
+def list_open_orders(api, page_limit=PAGE_LIMIT):
+    orders, seen, until = [], set(), None
+    while True:
+        page = list(api.list_orders(status='open', limit=page_limit, direction='desc', until=until))
+        new = [order for order in page if order.id not in seen]
+        seen.update(order.id for order in new)
+        orders.extend(new)
+        if len(page) < page_limit:
+            return orders
+        if not new:
+            print(f"Warning: more than {page_limit} open orders share one submission time, some may be missing")
+            return orders
+        # until is exclusive: step just past the oldest so orders submitted at the same instant aren't skipped
+        until = (pd.Timestamp(page[-1].submitted_at) + pd.Timedelta(1, 'us')).isoformat()
+
+
+# ✅ Per-cycle snapshot of positions, open orders and latest trades, fetched in three bulk calls
+# Lookups are served from memory; a section is refetched only once it is stale or invalidated.
+class BrokerState:
+    def __init__(self, api, symbols=(), max_age=60.0):
+        self.api = api
+        self.symbols = list(symbols)
+        self.max_age = max_age
+        self.rest_calls = 0
+        self._lock = threading.RLock()
+        self._positions = {}
+        self._orders = []
+        self._prices = {}
+        self._fetched = {'positions': 0.0, 'orders': 0.0, 'prices': 0.0}
+
+    def add_symbols(self, *symbols):
+        with self._lock:
+            new = [s for s in symbols if s not in self.symbols]
+            if new:
+                self.symbols.extend(new)
+                self._fetched['prices'] = 0.0
+
+    # ✅ Refresh everything at the start of a cycle
+    def refresh(self):
+        with self._lock:
+            self._refresh_positions()
+            self._refresh_orders()
+            self._refresh_prices()
+
+    def invalidate(self, *sections):
+        with self._lock:
+            for section in sections or self._fetched:
+                self._fetched[section] = 0.0
+
+    # ✅ After submitting or cancelling, positions and open orders are no longer trustworthy
+    def on_order_change(self):
+        self.invalidate('positions', 'orders')
+
+    # When a section was last fetched (monotonic clock), so readers can tell a new snapshot from a cached one
+    def fetched_at(self, section):
+        with self._lock:
+            return self._fetched[section]
+
+    def _stale(self, section):
+        return time.monotonic() - self._fetched[section] > self.max_age
+
+    def _refresh_positions(self):
+        positions = self.api.list_positions()
+        self.rest_calls += 1
+        self._positions = {p.symbol: p for p in positions}
+        self._fetched['positions'] = time.monotonic()
+
+    def _refresh_orders(self):
+        self._orders = list_open_orders(self.api)
+        self.rest_calls += 1
+        self._fetched['orders'] = time.monotonic()
+
+    def _refresh_prices(self):
+        if not self.symbols:
+            return
+        trades = self.api.get_latest_trades(self.symbols)
+        self.rest_calls += 1
+        self._prices = {symbol: float(trade.price) for symbol, trade in trades.items()}
+        self._fetched['prices'] = time.monotonic()
+
+    # Prices pushed from elsewhere (a stream, a shard coordinator) count as a fresh price snapshot;
+    # symbols without a price (no trade yet) are skipped
+    def set_prices(self, prices):
+        with self._lock:
+            self._prices.update({symbol: float(price) for symbol, price in prices.items() if price is not None})
+            self._fetched['prices'] = time.monotonic()
+
+    # ✅ Lookups
+    def positions(self):
+        with self._lock:
+            if self._stale('positions'):
+                self._refresh_positions()
+            return list(self._positions.values())
+
+    def position_qty(self, symbol):
+        with self._lock:
+            if self._stale('positions'):
+                self._refresh_positions()
+            position = self._positions.get(symbol)
+            return int(float(position.qty)) if position is not None else 0
+
+    def get_position(self, symbol):
+        with self._lock:
+            if self._stale('positions'):
+                self._refresh_positions()
+            return self._positions.get(symbol)
+
+    def open_orders(self, symbol=None):
+        with self._lock:
+            if self._stale('orders'):
+                self._refresh_orders()
+            return [o for o in self._orders if symbol is None or o.symbol == symbol]
+
+    def latest_price(self, symbol):
+        with self._lock:
+            if symbol not in self.symbols:
+                self.add_symbols(symbol)
+            if self._stale('prices') or symbol not in self._prices:
+                self._refresh_prices()
+            return self._prices.get(symbol)
@@ -1,13 +1,12 @@
-import requests
+from dotenv import load_dotenv
+import os
 
-url = "https://paper-api.alpaca.markets/v2/positions"
+from flatten import flatten, print_report
+from transport import make_rest
 
-headers = {
-    "accept": "application/json",
-    "APCA-API-KEY-ID": "PKRGS52QTJ0TEN1DPPS5",
-    "APCA-API-SECRET-KEY": "afqTWIfxp3bcRGHXtd2kfSzqyIbcBy07v438xmVK"
-}
+# Emergency flatten: cancel every open order, close every position, and verify the account ends flat
+# (python flatten.py SYMBOL ... for a subset)
+load_dotenv()
+api = make_rest(os.getenv("API_KEY"), os.getenv("SECRET_KEY"), 'https://paper-api.alpaca.markets')
 
-response = requests.delete(url, headers=headers)
-
-print(response.text)
\ No newline at end of file
+print_report(flatten(api))
@@ -0,0 +1,304 @@
+import argparse
+import hmac
+import itertools
+import json
+import os
+import socket
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http.client import HTTPConnection
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+import metrics
+
+# ✅ Operator control plane: commands arrive over HTTP (localhost port or Unix socket) and run on their own
+# worker threads, so the trading loop never waits on an operator. Every command becomes a job with its
+# queue and run latency; POST returns at once, GET /jobs/<id> (or ?wait=SECONDS) gives the result.
+CONTROL_PORT = int(os.getenv("CONTROL_PORT", "8765"))
+CONTROL_SOCKET = os.getenv("CONTROL_SOCKET")  # e.g. /tmp/tradingbot.sock, used instead of the port when set
+CONTROL_TOKEN = os.getenv("CONTROL_TOKEN")  # shared secret every request must carry as "Authorization: Bearer ..."
+MAX_WAIT = 300.0
+CONTROL_WORKERS = 2
+MAX_JOBS = 200
+
+
+# Broker objects (Alpaca entities, SimBroker namespaces) into plain JSON values
+def to_jsonable(value):
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    if isinstance(value, dict):
+        return {str(k): to_jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple, set)):
+        return [to_jsonable(v) for v in value]
+    if hasattr(value, '_raw'):
+        return to_jsonable(value._raw)
+    if isinstance(value, SimpleNamespace):
+        return to_jsonable(vars(value))
+    if hasattr(value, 'item'):
+        return value.item()  # numpy scalars
+    return str(value)
+
+
+class ControlPlane:
+    def __init__(self, workers=CONTROL_WORKERS, max_jobs=MAX_JOBS, token=CONTROL_TOKEN):
+        self.token = token
+        self.unix = False
+        self.commands = {}
+        self.jobs = OrderedDict()
+        self.max_jobs = max_jobs
+        self.latencies = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='control')
+        self.server = None
+
+    def register(self, name, func, help=''):
+        self.commands[name] = (func, help)
+        return func
+
+    # ✅ Queue a command; returns the job dict immediately
+    def submit(self, name, params=None):
+        if name not in self.commands:
+            raise KeyError(f"unknown command {name!r}")
+        job = {'id': next(self._ids), 'command': name, 'params': params or {}, 'status': 'queued', 'result': None,
+               'error': None, 'queued_at': time.time(), 'queue_ms': None, 'run_ms': None}
+        job['done'] = threading.Event()
+        with self._lock:
+            self.jobs[job['id']] = job
+            while len(self.jobs) > self.max_jobs:
+                self.jobs.popitem(last=False)
+        self._pool.submit(self._run, job)
+        return job
+
+    def _run(self, job):
+        started = time.perf_counter()
+        job['queue_ms'] = (time.time() - job['queued_at']) * 1000
+        job['status'] = 'running'
+        func, _ = self.commands[job['command']]
+        try:
+            job['result'] = to_jsonable(func(**job['params']))
+            job['status'] = 'done'
+        except Exception as e:
+            job['error'] = f"{type(e).__name__}: {e}"
+            job['status'] = 'error'
+            print(f"Error in control command {job['command']}: {e}")
+        finally:
+            elapsed = time.perf_counter() - started
+            job['run_ms'] = elapsed * 1000
+            metrics.observe(f"control_{job['command']}", elapsed)
+            with self._lock:
+                self.latencies.setdefault(job['command'], []).append(job['run_ms'])
+            job['done'].set()
+
+    def get(self, job_id):
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def wait(self, job, timeout):
+        job['done'].wait(timeout)
+        return job
+
+    def stats(self):
+        with self._lock:
+            summary = {}
+            for name, runs in self.latencies.items():
+                ordered = sorted(runs[-1000:])
+                summary[name] = {'count': len(runs), 'p50_ms': ordered[len(ordered) // 2], 'max_ms': ordered[-1]}
+            return summary
+
+    # ✅ HTTP front end on 127.0.0.1:port, or on a Unix socket when a path is given
+    def serve(self, port=CONTROL_PORT, socket_path=CONTROL_SOCKET):
+        handler = type('Handler', (_ControlHandler,), {'control': self})
+        self.unix = bool(socket_path)
+        if socket_path:
+            if os.path.exists(socket_path):
+                os.unlink(socket_path)
+            self.server = _UnixHTTPServer(socket_path, handler)
+            where = socket_path
+        else:
+            self.server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+            where = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, name='control-http', daemon=True).start()
+        print(f"Control plane at {where}" + ("" if self.token else " (no CONTROL_TOKEN set, local clients only)"))
+        return self.server
+
+    def shutdown(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+        self._pool.shutdown(wait=False)
+
+
+def _public(job):
+    return {key: value for key, value in job.items() if key != 'done'}
+
+
+class _ControlHandler(BaseHTTPRequestHandler):
+    control = None
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _route(self):
+        path, _, query = self.path.partition('?')
+        options = dict(part.split('=', 1) for part in query.split('&') if '=' in part)
+        return path.strip('/').split('/'), options
+
+    # ✅ Only local, non-browser clients: a web page's request carries an Origin header, a DNS-rebinding page
+    # a foreign Host, and with a token set every request must present it
+    def _refused(self):
+        if self.headers.get('Origin') is not None:
+            return 403, 'cross-origin requests are not accepted'
+        host = (self.headers.get('Host') or '').rsplit(':', 1)[0]
+        if not self.control.unix and host not in ('127.0.0.1', 'localhost'):
+            return 403, f'unexpected Host {host!r}'
+        token = self.control.token
+        if token and not hmac.compare_digest(self.headers.get('Authorization', ''), f'Bearer {token}'):
+            return 401, 'missing or wrong token'
+        return None
+
+    # ?wait=SECONDS, clamped to [0, MAX_WAIT]; ValueError on anything that isn't a number
+    def _wait_seconds(self, options):
+        wait = float(options.get('wait', 0))
+        if wait != wait:
+            raise ValueError('wait is NaN')
+        return min(max(wait, 0.0), MAX_WAIT)
+
+    def do_GET(self):
+        refused = self._refused()
+        if refused is not None:
+            self._reply(refused[0], {'error': refused[1]})
+            return
+        parts, options = self._route()
+        if parts == ['commands']:
+            self._reply(200, {name: help for name, (_, help) in self.control.commands.items()})
+        elif parts == ['stats']:
+            self._reply(200, self.control.stats())
+        elif parts == ['jobs']:
+            with self.control._lock:
+                jobs = [_public(job) for job in self.control.jobs.values()]
+            self._reply(200, jobs)
+        elif len(parts) == 2 and parts[0] == 'jobs' and parts[1].isdigit():
+            job = self.control.get(int(parts[1]))
+            if job is None:
+                self._reply(404, {'error': 'unknown job'})
+                return
+            try:
+                wait = self._wait_seconds(options)
+            except ValueError:
+                self._reply(400, {'error': f"bad wait {options['wait']!r}"})
+                return
+            self.control.wait(job, wait)
+            self._reply(200, _public(job))
+        else:
+            self._reply(404, {'error': 'not found'})
+
+    # POST /commands/<name> with a JSON object of keyword arguments (Content-Type: application/json, which a
+    # page can't send cross-origin without a preflight this server never answers)
+    def do_POST(self):
+        refused = self._refused()
+        if refused is None and self.headers.get('Content-Type', '').split(';')[0].strip() != 'application/json':
+            refused = 415, 'Content-Type must be application/json'
+        if refused is not None:
+            self._reply(refused[0], {'error': refused[1]})
+            return
+        parts, options = self._route()
+        if len(parts) != 2 or parts[0] != 'commands':
+            self._reply(404, {'error': 'not found'})
+            return
+        try:
+            wait = self._wait_seconds(options)
+            length = int(self.headers.get('Content-Length') or 0)
+            params = json.loads(self.rfile.read(length) or b'{}')
+            if not isinstance(params, dict):
+                raise ValueError('arguments must be a JSON object')
+            job = self.control.submit(parts[1], params)
+        except (ValueError, KeyError) as e:
+            self._reply(400, {'error': str(e)})
+            return
+        self.control.wait(job, wait)
+        self._reply(200 if job['done'].is_set() else 202, _public(job))
+
+    def log_message(self, format, *args):
+        pass
+
+    def address_string(self):
+        return str(self.client_address or 'unix')
+
+
+class _UnixHTTPServer(ThreadingHTTPServer):
+    address_family = socket.AF_UNIX
+
+    def server_bind(self):
+        # Created 0600: only the bot's own user can connect
+        umask = os.umask(0o177)
+        try:
+            self.socket.bind(self.server_address)
+        finally:
+            os.umask(umask)
+        self.server_name, self.server_port = 'localhost', 0
+
+    def get_request(self):
+        request, _ = self.socket.accept()
+        return request, ''
+
+
+class _UnixHTTPConnection(HTTPConnection):
+    def __init__(self, path, timeout=None):
+        super().__init__('localhost', timeout=timeout)
+        self.path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.path)
+
+
+# ✅ Client side, also used by the CLI below
+def request(method, path, payload=None, port=CONTROL_PORT, socket_path=CONTROL_SOCKET, timeout=60.0,
+            token=CONTROL_TOKEN):
+    if socket_path:
+        conn = _UnixHTTPConnection(socket_path, timeout=timeout)
+    else:
+        conn = HTTPConnection('127.0.0.1', port, timeout=timeout)
+    try:
+        body = json.dumps(payload).encode() if payload is not None else None
+        headers = {'Content-Type': 'application/json'}
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        conn.request(method, path, body=body, headers=headers)
+        response = conn.getresponse()
+        return response.status, json.loads(response.read() or b'null')
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Send a command to a running bot's control plane")
+    parser.add_argument('command', help="command name, 'commands', 'jobs', 'stats' or a job id")
+    parser.add_argument('params', nargs='*', help="key=value arguments")
+    parser.add_argument('--wait', type=float, default=30.0, help="seconds to wait for the result (0 = don't)")
+    parser.add_argument('--port', type=int, default=CONTROL_PORT)
+    parser.add_argument('--socket', default=CONTROL_SOCKET)
+    args = parser.parse_args()
+
+    target = dict(port=args.port, socket_path=args.socket)
+    try:
+        if args.command in ('commands', 'jobs', 'stats'):
+            status, reply = request('GET', f'/{args.command}', **target)
+        elif args.command.isdigit():
+            status, reply = request('GET', f'/jobs/{args.command}?wait={args.wait}', **target)
+        else:
+            params = dict(param.split('=', 1) for param in args.params)
+            status, reply = request('POST', f'/commands/{args.command}?wait={args.wait}', params, **target)
+        print(json.dumps(reply, indent=2))
+    except OSError as e:
+        print(f"Error reaching control plane: {e}")
@@ -0,0 +1,118 @@
+import hashlib
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+LIMIT_OFFSET = 0.001  # enter 0.1% through the last trade price
+
+# Reused across cycles so each entry doesn't pay thread start-up
+_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix='order')
+
+# ✅ Per-leg submit-to-ack latencies in milliseconds, newest last
+ack_latencies = deque(maxlen=10000)
+
+
+# ✅ Limit entry price plus TP/SL levels
+def leg_prices(current_price, side, tp_percent=2, sl_percent=1):
+    if side == 'buy':
+        entry_price = round(current_price * (1 + LIMIT_OFFSET), 2)
+        tp_price = round(entry_price * (1 + tp_percent / 100), 2)
+        sl_price = round(entry_price * (1 - sl_percent / 100), 2)
+    else:
+        entry_price = round(current_price * (1 - LIMIT_OFFSET), 2)
+        tp_price = round(entry_price * (1 - tp_percent / 100), 2)
+        sl_price = round(entry_price * (1 + sl_percent / 100), 2)
+    return entry_price, tp_price, sl_price
+
+
+# ✅ Deterministic client order ID: the same strategy, bar, symbol and side always map to the same ID,
+# so a resubmission after a crash or a retried POST is rejected by the broker instead of doubling the leg.
+def make_client_order_id(strategy, bar, symbol, side):
+    digest = hashlib.sha1(f"{strategy}|{bar}|{symbol}|{side}".encode()).hexdigest()[:32]
+    return f"{strategy[:15]}-{digest}"
+
+
+def _is_duplicate(error):
+    return getattr(error, 'status_code', None) == 422 and 'unique' in str(error)
+
+
+# ✅ Price and submit one leg; TP/SL ride along as a native bracket instead of a later OCO
+# With a BrokerState the price comes from its snapshot and the snapshot is invalidated after the submit.
+# With an OrderTracker the leg is indexed before it is sent; exits_on_fill places the TP/SL OCO from
+# the fill event instead of a bracket.
+def submit_leg(api, symbol, qty, side, tp_percent=2, sl_percent=1, bracket=True, client_order_id=None,
+               state=None, tracker=None, exits_on_fill=False):
+    result = {'symbol': symbol, 'qty': qty, 'side': side, 'order_id': None, 'error': None}
+    bracket = bracket and not exits_on_fill
+    with_exits = bracket or exits_on_fill
+    try:
+        current_price = state.latest_price(symbol) if state is not None else None
+        if current_price is None:
+            current_price = float(api.get_latest_trade(symbol).price)
+        entry_price, tp_price, sl_price = leg_prices(current_price, side, tp_percent, sl_percent)
+        result.update(current_price=current_price, entry_price=entry_price,
+                      tp_price=tp_price if with_exits else None, sl_price=sl_price if with_exits else None)
+
+        order_args = dict(symbol=symbol, qty=qty, side=side, type='limit', time_in_force='gtc',
+                          limit_price=entry_price, client_order_id=client_order_id or uuid.uuid4().hex)
+        result['client_order_id'] = order_args['client_order_id']
+        if bracket:
+            order_args.update(order_class='bracket', take_profit={'limit_price': tp_price},
+                              stop_loss={'stop_price': sl_price})
+        if tracker is not None:
+            record = tracker.track(order_args['client_order_id'], symbol, side, qty)
+            if exits_on_fill:
+                from order_tracker import attach_exits_on_fill
+                attach_exits_on_fill(tracker, api, record, tp_price, sl_price)
+
+        sent = time.perf_counter()
+        try:
+            order = api.submit_order(**order_args)
+        except Exception as e:
+            if not _is_duplicate(e):
+                raise
+            # Already sent for this bar (earlier run, or a retry whose first attempt got through)
+            order = api.get_order_by_client_order_id(order_args['client_order_id'])
+            result['duplicate'] = True
+        result['ack_ms'] = (time.perf_counter() - sent) * 1000
+        ack_latencies.append(result['ack_ms'])
+        result['order_id'] = order.id
+        # Bracket TP/SL legs, so their owner can cancel them before an exit (they hold the quantity)
+        result['leg_ids'] = [leg.id for leg in getattr(order, 'legs', None) or []]
+        if tracker is not None:
+            tracker.track(order_args['client_order_id'], order_id=order.id)
+    except Exception as e:
+        result['error'] = e
+    finally:
+        if state is not None and result['order_id'] is not None:
+            state.on_order_change()
+    return result
+
+
+# ✅ Submit several legs at once; legs is a list of (symbol, qty, side)
+def submit_legs(api, legs, tp_percent=2, sl_percent=1, bracket=True, state=None, tracker=None,
+                exits_on_fill=False, client_order_ids=None):
+    if state is not None:
+        # One bulk latest-trades call for every leg, before the legs fan out
+        state.add_symbols(*(symbol for symbol, _, _ in legs))
+        for symbol, _, _ in legs:
+            state.latest_price(symbol)
+    client_order_ids = client_order_ids or [None] * len(legs)
+    futures = [_pool.submit(submit_leg, api, symbol, qty, side, tp_percent, sl_percent, bracket, order_id, state,
+                            tracker, exits_on_fill)
+               for (symbol, qty, side), order_id in zip(legs, client_order_ids)]
+    return [future.result() for future in futures]
+
+
+# ✅ Submit-to-ack latency of the legs sent so far (bott's status command reports it)
+def latency_summary():
+    if not ack_latencies:
+        return {}
+    ordered = sorted(ack_latencies)
+    return {
+        'count': len(ordered),
+        'p50_ms': ordered[len(ordered) // 2],
+        'p99_ms': ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))],
+        'max_ms': ordered[-1],
+    }
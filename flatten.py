@@ -0,0 +1,129 @@
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from broker_state import list_open_orders
+
+# ✅ Kill switch: cancel working orders and close positions for a set of symbols (or everything), concurrently
+# Each round is a fixed number of parallel round trips whatever the symbol count:
+#   1. one bulk open-orders + one list_positions (together)
+#   2. every cancel at once, then the same bulk pair until the cancels are confirmed (the broker answers a cancel
+#      with pending_cancel and keeps the quantity held until it is done)
+#   3. every close_position at once, then verify with the bulk pair (or close-order fill events from an
+#      OrderTracker) until flat; a round where no close went out doesn't wait, the next round retries at once
+# Both waits share the round's timeout. Leftovers (rejected closes, unfilled close orders, orders that appeared
+# meanwhile) go into the next round.
+FLATTEN_WORKERS = int(os.getenv("FLATTEN_WORKERS", "32"))
+WORKING = ('new', 'accepted', 'partially_filled', 'held', 'pending_new', 'pending_cancel', 'pending_replace')
+
+_pool = ThreadPoolExecutor(max_workers=FLATTEN_WORKERS, thread_name_prefix='flatten')
+
+
+def _parallel(func, items):
+    futures = [(item, _pool.submit(func, item)) for item in items]
+    results = {}
+    for item, future in futures:
+        try:
+            results[item] = (future.result(), None)
+        except Exception as e:
+            results[item] = (None, e)
+    return results
+
+
+def _snapshot(api, symbols):
+    wanted = None if symbols is None else set(symbols)
+    orders_future = _pool.submit(list_open_orders, api)
+    positions = [p for p in api.list_positions() if wanted is None or p.symbol in wanted]
+    orders = [o for o in orders_future.result() if (wanted is None or o.symbol in wanted) and o.status in WORKING]
+    return orders, positions
+
+
+def _poll(api, symbols, done, deadline, interval):
+    polls = 0
+    while True:
+        orders, positions = _snapshot(api, symbols)
+        polls += 1
+        if done(orders, positions) or time.monotonic() >= deadline:
+            return orders, positions, polls
+        time.sleep(interval)
+
+
+def flatten(api, symbols=None, max_rounds=3, timeout=10.0, interval=0.25, tracker=None, state=None):
+    started = time.perf_counter()
+    report = {'symbols': None if symbols is None else sorted(symbols), 'rounds': [], 'flat': False,
+              'canceled': 0, 'closed': 0, 'errors': []}
+    orders, positions = _snapshot(api, symbols)
+    for round_number in range(1, max_rounds + 1):
+        if not orders and not positions:
+            report['flat'] = True
+            break
+        round_started = time.perf_counter()
+        deadline = time.monotonic() + timeout
+        polls = 0
+        # Cancel first: quantity held by working orders (bracket legs, pending exits) can't be closed.
+        # Held bracket legs go away with their parent, so only the parents are canceled.
+        canceled = _parallel(api.cancel_order, [order.id for order in orders
+                                                if order.status not in ('held', 'pending_cancel')])
+        if orders:
+            orders, positions, polls = _poll(api, symbols, lambda orders, _: not orders, deadline, interval)
+        closed = _parallel(api.close_position, [position.symbol for position in positions])
+        # A cancel that finds the order already done (bracket legs go with their parent) is not a failure
+        errors = [(key, str(error)) for key, (_, error) in canceled.items()
+                  if error is not None and getattr(error, 'status_code', None) not in (404, 422)]
+        errors += [(key, str(error)) for key, (_, error) in closed.items() if error is not None]
+        close_orders = [order for order, error in closed.values() if error is None and order is not None]
+        report['canceled'] += sum(error is None for _, error in canceled.values())
+        report['closed'] += len(close_orders)
+        report['errors'] += errors
+        if state is not None:
+            state.invalidate()
+
+        if close_orders:
+            if tracker is not None:
+                # Fill events arrive as soon as the closes execute; one snapshot afterwards confirms
+                records = [tracker.track(order.client_order_id, order.symbol, order.side, order.qty,
+                                         order_id=order.id) for order in close_orders]
+                tracker.wait(records, max(0.0, deadline - time.monotonic()))
+            orders, positions, verify_polls = _poll(api, symbols, lambda left, held: not left and not held,
+                                                    deadline, interval)
+        else:
+            # Nothing went out, so nothing to wait for: the next round retries from this snapshot
+            orders, positions = _snapshot(api, symbols)
+            verify_polls = 1
+        report['rounds'].append({'round': round_number, 'cancels': len(canceled), 'closes': len(closed),
+                                 'errors': len(errors), 'verify_polls': polls + verify_polls,
+                                 'left_orders': len(orders), 'left_positions': len(positions),
+                                 'ms': (time.perf_counter() - round_started) * 1000})
+    else:
+        report['flat'] = not orders and not positions
+    report['leftover_orders'] = [order.id for order in orders]
+    report['leftover_positions'] = {position.symbol: position.qty for position in positions}
+    report['time_to_flat_ms'] = (time.perf_counter() - started) * 1000
+    return report
+
+
+def print_report(report):
+    scope = ', '.join(report['symbols']) if report['symbols'] is not None else 'all symbols'
+    status = 'FLAT' if report['flat'] else 'NOT FLAT'
+    print(f"Flatten {scope}: {status} in {report['time_to_flat_ms']:.0f} ms after {len(report['rounds'])} round(s), "
+          f"{report['canceled']} orders canceled, {report['closed']} close orders sent")
+    for key, error in report['errors']:
+        print(f"  {key}: {error}")
+    if not report['flat']:
+        print(f"  Leftover positions: {report['leftover_positions']}, orders: {report['leftover_orders']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cancel open orders and close positions, then verify")
+    parser.add_argument('symbols', nargs='*', help="symbols to flatten (default: everything)")
+    parser.add_argument('--rounds', type=int, default=3)
+    parser.add_argument('--timeout', type=float, default=10.0, help="seconds to wait for flat per round")
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+    from transport import make_rest
+
+    load_dotenv()
+    api = make_rest(os.getenv("API_KEY"), os.getenv("SECRET_KEY"), 'https://paper-api.alpaca.markets')
+    print_report(flatten(api, args.symbols or None, args.rounds, args.timeout))
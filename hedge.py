@@ -0,0 +1,98 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+# ✅ Hedge ratio estimator modes: 'ols' is the original single static fit,
+# 'recursive' is exponentially-weighted recursive least squares updated every bar.
+HEDGE_MODES = ('ols', 'recursive')
+FORGETTING = 0.99  # weight of the previous observation, 1.0 = expanding-window OLS
+MIN_PERIODS = 30
+
+
+# ✅ Static OLS fit of pair1 on pair2 with intercept (same result as sm.OLS(...).params[pair2])
+def ols_hedge_ratio(y, x):
+    y = np.asarray(y, dtype=np.float64)
+    x = np.asarray(x, dtype=np.float64)
+    x_dev = x - x.mean()
+    return float((x_dev * (y - y.mean())).sum() / (x_dev * x_dev).sum())
+
+
+# ✅ Recursive least squares (intercept + beta) with a forgetting factor, O(1) per update
+# Keeps exponentially-weighted sums, so it gives the exact weighted OLS solution at every step.
+class RecursiveHedgeRatio:
+    def __init__(self, forgetting=FORGETTING, min_periods=MIN_PERIODS):
+        self.forgetting = forgetting
+        self.min_periods = min_periods
+        self.count = 0
+        self.sw = self.sx = self.sy = self.sxx = self.sxy = 0.0
+        self.beta = math.nan
+        self.alpha = math.nan
+
+    def update(self, y, x):
+        lam = self.forgetting
+        self.sw = lam * self.sw + 1.0
+        self.sx = lam * self.sx + x
+        self.sy = lam * self.sy + y
+        self.sxx = lam * self.sxx + x * x
+        self.sxy = lam * self.sxy + x * y
+        self.count += 1
+
+        denom = self.sw * self.sxx - self.sx * self.sx
+        if self.count >= self.min_periods and denom > 0:
+            self.beta = (self.sw * self.sxy - self.sx * self.sy) / denom
+            self.alpha = (self.sy - self.beta * self.sx) / self.sw
+        return self.beta
+
+    # ✅ Warm up the running sums from history
+    def seed(self, y, x):
+        for yi, xi in zip(np.asarray(y, dtype=np.float64), np.asarray(x, dtype=np.float64)):
+            self.update(yi, xi)
+        return self
+
+    def to_state(self):
+        return {'forgetting': self.forgetting, 'min_periods': self.min_periods, 'count': self.count,
+                'sums': [self.sw, self.sx, self.sy, self.sxx, self.sxy], 'beta': self.beta, 'alpha': self.alpha}
+
+    @classmethod
+    def from_state(cls, state):
+        estimator = cls(state['forgetting'], state['min_periods'])
+        estimator.count = state['count']
+        estimator.sw, estimator.sx, estimator.sy, estimator.sxx, estimator.sxy = state['sums']
+        estimator.beta = math.nan if state['beta'] is None else state['beta']
+        estimator.alpha = math.nan if state['alpha'] is None else state['alpha']
+        return estimator
+
+
+# ✅ Vectorized batch form over a whole history, identical to running RecursiveHedgeRatio.update row by row
+def recursive_hedge_ratios(y, x, forgetting=FORGETTING, min_periods=MIN_PERIODS):
+    y = pd.Series(np.asarray(y, dtype=np.float64))
+    x = pd.Series(np.asarray(x, dtype=np.float64))
+    # ewm(adjust=True) weights the i-th previous value by (1 - alpha)**i, i.e. forgetting**i
+    if forgetting >= 1.0:
+        mean = lambda s: s.expanding().mean()
+    else:
+        mean = lambda s: s.ewm(alpha=1.0 - forgetting, adjust=True).mean()
+
+    mx, my = mean(x), mean(y)
+    var = mean(x * x) - mx * mx
+    cov = mean(x * y) - mx * my
+    beta = (cov / var.where(var > 0)).to_numpy(copy=True)
+    beta[:min_periods - 1] = np.nan
+    return beta
+
+
+# ✅ Spread and latest hedge ratio for a merged price frame, in either mode
+def hedge_spread(df, pair1, pair2, mode='ols', forgetting=FORGETTING, min_periods=MIN_PERIODS):
+    if mode not in HEDGE_MODES:
+        raise ValueError(f"Unknown hedge mode {mode!r}, expected one of {HEDGE_MODES}")
+    if mode == 'ols':
+        beta = ols_hedge_ratio(df[pair1], df[pair2])
+        return df[pair1] - beta * df[pair2], pd.Series(beta, index=df.index), beta
+
+    betas = pd.Series(recursive_hedge_ratios(df[pair1], df[pair2], forgetting, min_periods), index=df.index)
+    latest = float(betas.iloc[-1])
+    if math.isnan(latest):
+        # Fewer than min_periods bars, the recursive estimator isn't warm yet: trade on the static fit until it is
+        latest = ols_hedge_ratio(df[pair1], df[pair2])
+    return df[pair1] - betas * df[pair2], betas, latest
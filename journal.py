@@ -0,0 +1,141 @@
+import atexit
+import csv
+import glob
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+
+import pandas as pd
+
+# ✅ One schema for every script writing trades
+JOURNAL_DIR = os.getenv("JOURNAL_DIR", "journal")
+SCHEMA = ['timestamp', 'strategy', 'symbol', 'side', 'qty', 'price', 'tp_price', 'sl_price', 'order_id']
+DTYPES = {'strategy': 'string', 'symbol': 'string', 'side': 'string', 'qty': 'float64', 'price': 'float64',
+          'tp_price': 'float64', 'sl_price': 'float64', 'order_id': 'string'}
+OPEN_SUFFIX = '.open.csv'
+
+
+# ✅ Trade journal: record() only enqueues, a background thread batches rows into CSV segments
+class TradeJournal:
+    def __init__(self, directory=JOURNAL_DIR, flush_rows=256, flush_seconds=1.0, segment_rows=100_000):
+        self.directory = directory
+        self.flush_rows = flush_rows
+        self.flush_seconds = flush_seconds
+        self.segment_rows = segment_rows
+        self._queue = queue.SimpleQueue()
+        self._segment = None
+        self._segment_count = 0
+        self._stopped = threading.Event()
+        os.makedirs(directory, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name='trade-journal', daemon=True)
+        self._thread.start()
+
+    def record(self, strategy, symbol, side, qty, price=None, tp_price=None, sl_price=None, order_id=None):
+        self._queue.put((datetime.now(timezone.utc).isoformat(), strategy, symbol, side, qty, price,
+                         tp_price, sl_price, order_id))
+
+    # A segment is written as trades-*.open.csv and renamed to trades-*.csv once closed, only then it can be compacted
+    def _open_segment(self):
+        name = f"trades-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{self._segment_count:04d}{OPEN_SUFFIX}"
+        self._segment_count += 1
+        self._segment = open(os.path.join(self.directory, name), 'w', newline='')
+        self._writer = csv.writer(self._segment)
+        self._writer.writerow(SCHEMA)
+        self._segment_rows = 0
+
+    def _write(self, rows):
+        if self._segment is None or self._segment_rows >= self.segment_rows:
+            self._close_segment()
+            self._open_segment()
+        self._writer.writerows(rows)
+        self._segment.flush()
+        self._segment_rows += len(rows)
+
+    def _close_segment(self):
+        if self._segment is not None:
+            self._segment.close()
+            os.replace(self._segment.name, self._segment.name[:-len(OPEN_SUFFIX)] + '.csv')
+            self._segment = None
+
+    def _run(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_seconds
+        while not (self._stopped.is_set() and self._queue.empty()):
+            try:
+                batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+            except queue.Empty:
+                pass
+            if len(batch) >= self.flush_rows or (batch and time.monotonic() >= deadline):
+                self._write(batch)
+                batch = []
+            if time.monotonic() >= deadline:
+                deadline = time.monotonic() + self.flush_seconds
+        if batch:
+            self._write(batch)
+        self._close_segment()
+
+    def close(self):
+        self._stopped.set()
+        self._thread.join()
+
+
+# ✅ Fold finished CSV segments into one Parquet file per compaction (needs pyarrow)
+# Only closed segments: every writer process (bots, shards) keeps its current one open as trades-*.open.csv.
+# An open segment whose writer process is gone (killed before it could close it) is finished too.
+def compact(directory=JOURNAL_DIR):
+    segments = sorted(glob.glob(os.path.join(directory, 'trades-*.csv')))
+    segments = [path for path in segments if not path.endswith(OPEN_SUFFIX) or not _writer_alive(path)]
+    if not segments:
+        return None
+    frame = pd.concat([_read_segment(path) for path in segments], ignore_index=True)
+    # Unique per process and call, a second compaction within the same second must not overwrite the first
+    stem = os.path.join(directory, f"compacted-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}")
+    n = 0
+    while os.path.exists(f"{stem}-{n:04d}.parquet"):
+        n += 1
+    target = f"{stem}-{n:04d}.parquet"
+    frame.to_parquet(target + '.tmp', index=False)
+    os.replace(target + '.tmp', target)
+    for path in segments:
+        os.remove(path)
+    return target
+
+
+# trades-<date>-<time>-<pid>-<n>.open.csv
+def _writer_alive(path):
+    try:
+        pid = int(os.path.basename(path).split('-')[3])
+        os.kill(pid, 0)
+    except (ValueError, IndexError, ProcessLookupError):
+        return False
+    except PermissionError:
+        pass  # exists, owned by another user
+    return True
+
+
+def _read_segment(path):
+    frame = pd.read_csv(path, dtype=DTYPES, engine='c')
+    frame['timestamp'] = pd.to_datetime(frame['timestamp'], utc=True, format='ISO8601')
+    return frame
+
+
+# ✅ Load the whole journal (Parquet + CSV segments) into one DataFrame for P&L analysis
+def read_journal(directory=JOURNAL_DIR):
+    frames = [pd.read_parquet(path) for path in sorted(glob.glob(os.path.join(directory, 'compacted-*.parquet')))]
+    frames += [_read_segment(path) for path in sorted(glob.glob(os.path.join(directory, 'trades-*.csv')))]
+    if not frames:
+        return pd.DataFrame({col: pd.Series(dtype=DTYPES.get(col, 'datetime64[ns, UTC]')) for col in SCHEMA})
+    return pd.concat(frames, ignore_index=True).sort_values('timestamp', kind='stable', ignore_index=True)
+
+
+_journal = None
+
+
+def get_journal():
+    global _journal
+    if _journal is None:
+        _journal = TradeJournal()
+        atexit.register(_journal.close)
+    return _journal
@@ -0,0 +1,282 @@
+import atexit
+import bisect
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import nullcontext
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# ✅ Off unless METRICS=1 (or enable() is called); disabled timers are a shared no-op context
+METRICS_ENABLED = os.getenv("METRICS", "0") == "1"
+METRICS_FILE = os.getenv("METRICS_FILE")  # written at exit when set
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))  # /metrics endpoint when set
+PROFILE_SAMPLE_MS = float(os.getenv("PROFILE_SAMPLE_MS", "0"))  # sampling profiler when set
+PREFIX = 'tradingbot'
+BUCKETS = (0.00001, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+           1.0, 2.5, 5.0, 10.0, 30.0)
+
+_NULL = nullcontext()
+
+
+# ✅ Cumulative-bucket latency histogram (seconds), Prometheus layout
+class Histogram:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+    def quantile(self, q):
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for bound, n in zip(self.buckets + (float('inf'),), self.counts):
+            seen += n
+            if seen >= target:
+                return bound
+        return float('inf')
+
+
+class Registry:
+    def __init__(self):
+        self.enabled = METRICS_ENABLED
+        self.counters = Counter()
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    def count(self, name, n=1):
+        if self.enabled:
+            with self._lock:
+                self.counters[name] += n
+
+    def observe(self, name, seconds):
+        if self.enabled:
+            with self._lock:
+                histogram = self.histograms.get(name)
+                if histogram is None:
+                    histogram = self.histograms[name] = Histogram()
+                histogram.observe(seconds)
+
+    def timer(self, name):
+        return _Timer(self, name) if self.enabled else _NULL
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    # ✅ Prometheus text exposition format
+    def render(self):
+        lines = []
+        with self._lock:
+            for name, value in sorted(self.counters.items()):
+                lines.append(f"# TYPE {PREFIX}_{name}_total counter")
+                lines.append(f"{PREFIX}_{name}_total {value}")
+            for name, histogram in sorted(self.histograms.items()):
+                metric = f"{PREFIX}_{name}_seconds"
+                lines.append(f"# TYPE {metric} histogram")
+                cumulative = 0
+                for bound, n in zip(histogram.buckets, histogram.counts):
+                    cumulative += n
+                    lines.append(f'{metric}_bucket{{le="{bound}"}} {cumulative}')
+                lines.append(f'{metric}_bucket{{le="+Inf"}} {histogram.count}')
+                lines.append(f"{metric}_sum {histogram.sum:.6f}")
+                lines.append(f"{metric}_count {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        with self._lock:
+            stages = {name: {'count': h.count, 'mean_ms': h.sum / h.count * 1000 if h.count else None,
+                             'p50_ms': _ms(h.quantile(0.5)), 'p99_ms': _ms(h.quantile(0.99))}
+                      for name, h in self.histograms.items()}
+            return {'stages': stages, 'counters': dict(self.counters)}
+
+
+def _ms(bound):
+    return None if bound is None else bound * 1000
+
+
+class _Timer:
+    __slots__ = ('registry', 'name', 'start')
+
+    def __init__(self, registry, name):
+        self.registry = registry
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.registry.observe(self.name, time.perf_counter() - self.start)
+        if exc_type is not None:
+            self.registry.count(f"{self.name}_errors")
+        return False
+
+
+registry = Registry()
+count = registry.count
+observe = registry.observe
+timer = registry.timer
+
+
+def enable(on=True):
+    registry.enabled = on
+
+
+# ✅ Decorator form of timer(); the enabled check happens per call so it can be flipped at runtime
+def timed(name):
+    def decorate(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not registry.enabled:
+                return func(*args, **kwargs)
+            with _Timer(registry, name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+# ✅ Per-method latency/error metrics for a broker client (broker_<method>); returns api as-is when disabled
+class InstrumentedAPI:
+    def __init__(self, api):
+        self._api = api
+        self._wrapped = {}
+
+    def __getattr__(self, name):
+        attr = getattr(self._api, name)
+        if name.startswith('_') or not callable(attr):
+            return attr
+        wrapped = self._wrapped.get(name)
+        if wrapped is None:
+            wrapped = self._wrapped[name] = _wrap_call(name)
+        return lambda *args, **kwargs: wrapped(getattr(self._api, name), *args, **kwargs)
+
+
+def _wrap_call(name):
+    metric = f"broker_{name}"
+
+    def call(method, *args, **kwargs):
+        registry.count(f"{metric}_calls")
+        with registry.timer(metric):
+            return method(*args, **kwargs)
+    return call
+
+
+def instrument_api(api):
+    return InstrumentedAPI(api) if registry.enabled else api
+
+
+# ✅ Export: atomic file write and a tiny /metrics HTTP endpoint on a daemon thread
+def write_metrics(path=METRICS_FILE):
+    if not path:
+        return None
+    with open(path + '.tmp', 'w') as f:
+        f.write(registry.render())
+    os.replace(path + '.tmp', path)
+    return path
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = registry.render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_metrics(port=METRICS_PORT, host='127.0.0.1'):
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+    print(f"Metrics at http://{host}:{server.server_address[1]}/metrics")
+    return server
+
+
+# ✅ Sampling profiler: a daemon thread snapshots stacks every interval, output is collapsed-stack text
+# (one "file:func;file:func count" line per stack, the input format of flamegraph.pl / speedscope)
+class SamplingProfiler:
+    def __init__(self, interval_ms=5.0, thread_ids=None, max_depth=64):
+        self.interval = interval_ms / 1000
+        self.thread_ids = thread_ids  # None = every thread but the profiler's own
+        self.max_depth = max_depth
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own or (self.thread_ids is not None and thread_id not in self.thread_ids):
+                    continue
+                stack = []
+                while frame is not None and len(stack) < self.max_depth:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def top(self, n=10):
+        leaves = Counter()
+        for stack, hits in self.stacks.items():
+            leaves[stack.rsplit(';', 1)[-1]] += hits
+        return leaves.most_common(n)
+
+    def dump(self, path):
+        with open(path, 'w') as f:
+            for stack, hits in self.stacks.most_common():
+                f.write(f"{stack} {hits}\n")
+        return path
+
+
+# ✅ Wire up whatever the environment asks for
+_profiler = None
+
+
+def start_from_env():
+    global _profiler
+    if METRICS_PORT:
+        enable()
+        serve_metrics(METRICS_PORT)
+    if METRICS_FILE:
+        enable()
+        atexit.register(write_metrics, METRICS_FILE)
+    if PROFILE_SAMPLE_MS and _profiler is None:
+        _profiler = SamplingProfiler(PROFILE_SAMPLE_MS).start()
+        atexit.register(_dump_profile)
+
+
+def _dump_profile():
+    _profiler.stop()
+    path = _profiler.dump(f"profile-{os.getpid()}.folded")
+    print(f"Profile: {_profiler.samples} samples written to {path}, hottest: {_profiler.top(5)}")
@@ -0,0 +1,254 @@
+import asyncio
+import json
+import os
+import threading
+import time
+
+TRADE_STREAM_URL = os.getenv("TRADE_STREAM_URL", "wss://paper-api.alpaca.markets/stream")
+TERMINAL = ('filled', 'canceled', 'expired', 'rejected', 'replaced', 'done_for_day')
+
+# ✅ trade_updates event name -> order status (events that already are statuses map to themselves)
+EVENT_STATUS = {'fill': 'filled', 'partial_fill': 'partially_filled', 'pending_new': 'new',
+                'order_cancel_rejected': None, 'order_replace_rejected': None, 'pending_cancel': None,
+                'pending_replace': None, 'calculated': None}
+
+# ✅ Allowed moves; anything else (late or duplicated events) is ignored instead of regressing the state
+TRANSITIONS = {
+    None: {'new', 'accepted', 'held', 'partially_filled', 'filled', 'canceled', 'expired', 'rejected'},
+    'held': {'new', 'accepted', 'partially_filled', 'filled', 'canceled', 'expired', 'rejected'},
+    'new': {'accepted', 'partially_filled', 'filled', 'canceled', 'expired', 'rejected', 'replaced', 'done_for_day'},
+    'accepted': {'new', 'partially_filled', 'filled', 'canceled', 'expired', 'rejected', 'replaced', 'done_for_day'},
+    'partially_filled': {'partially_filled', 'filled', 'canceled', 'expired', 'replaced', 'done_for_day'},
+}
+
+tracker_stats = {'events': 0, 'ignored': 0, 'unknown_orders': 0, 'fill_latency_ms': None}
+
+
+def _field(order, name, default=None):
+    if isinstance(order, dict):
+        return order.get(name, default)
+    return getattr(order, name, default)
+
+
+# ✅ What we know about one order, updated only from trade-update events
+class OrderRecord:
+    def __init__(self, order_id=None, client_order_id=None, symbol=None, side=None, qty=None):
+        self.order_id = order_id
+        self.client_order_id = client_order_id
+        self.symbol = symbol
+        self.side = side
+        self.qty = qty
+        self.status = None
+        self.filled_qty = 0.0
+        self.filled_avg_price = None
+        self.submitted_at = time.perf_counter()
+        self.updated_at = None
+        self.done = threading.Event()
+        self.callbacks = []
+
+    @property
+    def terminal(self):
+        return self.status in TERMINAL
+
+
+# ✅ In-memory order index by order ID and client order ID, fed by trade-update events
+# Callbacks registered with on_fill() run once when the order is filled, or when it ends
+# partially filled, with the OrderRecord.
+class OrderTracker:
+    def __init__(self):
+        self.by_id = {}
+        self.by_client_id = {}
+        self._lock = threading.RLock()
+        self._listeners = []
+
+    # Register before submitting, so an event that beats the REST ack is still matched
+    def track(self, client_order_id, symbol=None, side=None, qty=None, order_id=None):
+        with self._lock:
+            record = self.by_client_id.get(client_order_id)
+            if record is None:
+                record = OrderRecord(order_id, client_order_id, symbol, side, qty)
+                self.by_client_id[client_order_id] = record
+            if order_id is not None:
+                record.order_id = order_id
+                self.by_id[order_id] = record
+            return record
+
+    def get(self, order_id=None, client_order_id=None):
+        with self._lock:
+            if order_id is not None and order_id in self.by_id:
+                return self.by_id[order_id]
+            return self.by_client_id.get(client_order_id)
+
+    # Drop a finished order from the index (long-running owners prune what they no longer follow)
+    def forget(self, record):
+        with self._lock:
+            self.by_client_id.pop(record.client_order_id, None)
+            self.by_id.pop(record.order_id, None)
+
+    def add_listener(self, listener):
+        self._listeners.append(listener)
+
+    def on_fill(self, record, callback):
+        with self._lock:
+            if record.terminal:
+                fire = record.filled_qty > 0
+            else:
+                record.callbacks.append(callback)
+                fire = False
+        if fire:
+            callback(record)
+
+    # ✅ One trade update: (event, order) from SimBroker.subscribe or the Alpaca trade_updates stream
+    def on_update(self, event, order):
+        tracker_stats['events'] += 1
+        status = EVENT_STATUS.get(event, event)
+        if status is None:
+            return None
+        order_id = _field(order, 'id')
+        client_order_id = _field(order, 'client_order_id')
+        with self._lock:
+            record = self.get(order_id, client_order_id)
+            if record is None:
+                # Orders we did not submit (other scripts, bracket child legs) are indexed too
+                tracker_stats['unknown_orders'] += 1
+                record = self.track(client_order_id or order_id, _field(order, 'symbol'), _field(order, 'side'),
+                                    _field(order, 'qty'))
+            if order_id is not None and record.order_id is None:
+                record.order_id = order_id
+                self.by_id[order_id] = record
+            if status not in TRANSITIONS.get(record.status, ()):
+                tracker_stats['ignored'] += 1
+                return record
+
+            record.status = status
+            record.updated_at = time.perf_counter()
+            filled = _field(order, 'filled_qty')
+            if filled is not None:
+                record.filled_qty = float(filled)
+            price = _field(order, 'filled_avg_price')
+            if price is not None:
+                record.filled_avg_price = float(price)
+            callbacks = []
+            if record.terminal:
+                record.done.set()
+                if record.filled_qty > 0:
+                    callbacks, record.callbacks = record.callbacks, []
+                else:
+                    record.callbacks = []
+        if status == 'filled':
+            tracker_stats['fill_latency_ms'] = (record.updated_at - record.submitted_at) * 1000
+        for callback in callbacks:
+            try:
+                callback(record)
+            except Exception as e:
+                print(f"Error in fill callback for {record.symbol}: {e}")
+        for listener in list(self._listeners):
+            listener(event, record)
+        return record
+
+    # ✅ Alpaca stream message: {"stream": "trade_updates", "data": {"event": ..., "order": {...}}}
+    def handle_message(self, message):
+        if message.get('stream') != 'trade_updates':
+            return None
+        data = message.get('data') or {}
+        return self.on_update(data.get('event'), data.get('order') or {})
+
+    # Block until every order is terminal (or timeout); returns {order_id or client_order_id: status}
+    def wait(self, records, timeout=10.0):
+        deadline = time.monotonic() + timeout
+        for record in records:
+            record.done.wait(max(0.0, deadline - time.monotonic()))
+        return {record.order_id or record.client_order_id: record.status for record in records}
+
+
+class TradeStreamAuthError(Exception):
+    pass
+
+
+# ✅ Alpaca trading websocket: auth, listen to trade_updates, feed every message to the tracker
+# Runs until stop is set; any disconnect, clean or not, reconnects with backoff, a rejected key raises.
+# connected (a threading.Event) is set only while the socket is authorized and listening.
+async def stream_trade_updates(tracker, url=TRADE_STREAM_URL, key=None, secret=None, stop=None, connected=None):
+    import websockets
+    from websockets.exceptions import ConnectionClosed
+
+    key = key or os.getenv("API_KEY")
+    secret = secret or os.getenv("SECRET_KEY")
+    connected = connected or threading.Event()
+    backoff = 1.0
+    while stop is None or not stop.is_set():
+        try:
+            async with websockets.connect(url, max_size=None) as ws:
+                await ws.send(json.dumps({'action': 'auth', 'key': key, 'secret': secret}))
+                reply = json.loads(await ws.recv())
+                if reply.get('data', {}).get('status') != 'authorized':
+                    raise TradeStreamAuthError(f"Trade stream auth failed: {reply}")
+                await ws.send(json.dumps({'action': 'listen', 'data': {'streams': ['trade_updates']}}))
+                backoff = 1.0
+                connected.set()
+                async for raw in ws:
+                    tracker.handle_message(json.loads(raw))
+                    if stop is not None and stop.is_set():
+                        return
+                print(f"Trade stream closed by the server ({ws.close_code}), reconnecting in {backoff:.0f}s")
+        except (OSError, ConnectionError, ConnectionClosed) as e:
+            print(f"Trade stream error: {e}, reconnecting in {backoff:.0f}s")
+        finally:
+            connected.clear()
+        await asyncio.sleep(backoff)
+        backoff = min(backoff * 2, 30.0)
+
+
+# ✅ Background trade-update stream; the handle says whether events are flowing right now
+class TradeUpdateStream:
+    def __init__(self, tracker, url=TRADE_STREAM_URL, key=None, secret=None):
+        self.connected = threading.Event()
+        self.error = None
+        self._stop = asyncio.Event()
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, args=(tracker, url, key, secret), name='trade-updates',
+                                        daemon=True)
+        self._thread.start()
+
+    def _run(self, tracker, url, key, secret):
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._loop.run_until_complete(
+                stream_trade_updates(tracker, url, key, secret, self._stop, self.connected))
+        except TradeStreamAuthError as e:
+            self.error = e
+            print(f"{e}, fills will be confirmed by polling")
+
+    @property
+    def live(self):
+        return self._thread.is_alive() and self.connected.is_set()
+
+    def stop(self):
+        self._loop.call_soon_threadsafe(self._stop.set)
+
+
+def start_trade_update_stream(tracker, url=TRADE_STREAM_URL, key=None, secret=None):
+    return TradeUpdateStream(tracker, url, key, secret)
+
+
+# ✅ The moment an entry fills, protect it with a TP/SL OCO pair sized to the filled quantity
+def attach_exits_on_fill(tracker, api, record, tp_price, sl_price):
+    from execution import _pool
+
+    def place_exits(filled):
+        side = 'sell' if filled.side == 'buy' else 'buy'
+        qty = int(filled.filled_qty) if float(filled.filled_qty).is_integer() else filled.filled_qty
+
+        def submit():
+            try:
+                order = api.submit_order(symbol=filled.symbol, qty=qty, side=side, type='limit', time_in_force='gtc',
+                                         order_class='oco', take_profit={'limit_price': tp_price},
+                                         stop_loss={'stop_price': sl_price})
+                print(f"TP/SL OCO placed for {filled.symbol}: {side} {qty} TP ${tp_price} SL ${sl_price} "
+                      f"(Order ID: {order.id})")
+            except Exception as e:
+                print(f"Error placing TP/SL for {filled.symbol}: {e}")
+        # Off the event thread, the stream keeps dispatching while the OCO is in flight
+        _pool.submit(submit)
+
+    tracker.on_fill(record, place_exits)
@@ -0,0 +1,251 @@
+import math
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from signals import ENTRY_Z, EXIT_Z
+
+MAX_POINTS = 2000  # about one point per horizontal pixel of a 14in figure at 150 dpi
+TP_LEVEL = 3.0  # Take profit at 3 standard deviations
+SL_LEVEL = 4.0  # Stop loss at 4 standard deviations (reversal of trade)
+
+
+# ✅ Downsampling: indices of the points to draw, always including the first and last point
+# minmax keeps each bucket's extremes (exact envelope, fully vectorized); lttb keeps the visual shape.
+def minmax_indices(values, n_buckets):
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    if n <= 2 * n_buckets:
+        return np.arange(n)
+    size = math.ceil(n / n_buckets)
+    padded = np.full(n_buckets * size, np.nan)
+    padded[:n] = values
+    rows = padded.reshape(n_buckets, size)
+    finite = ~np.isnan(rows)
+    lows = np.where(finite, rows, np.inf).argmin(axis=1)
+    highs = np.where(finite, rows, -np.inf).argmax(axis=1)
+    offsets = np.arange(n_buckets) * size
+    picked = np.concatenate([[0, n - 1], offsets + lows, offsets + highs])
+    return np.unique(picked[picked < n])
+
+
+def lttb_indices(values, n_out):
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    if n <= n_out or n_out < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    x = np.arange(n, dtype=np.float64)
+    y = np.where(np.isnan(values), 0.0, values)  # gaps only matter for the drawn line, not the choice
+    picked = np.empty(n_out, dtype=np.int64)
+    picked[0], picked[-1] = 0, n - 1
+    prev = 0
+    for b in range(n_out - 2):
+        lo, hi = edges[b], edges[b + 1]
+        next_lo, next_hi = hi, edges[b + 2] if b + 2 < len(edges) else n
+        avg_x = x[next_lo:next_hi].mean() if next_hi > next_lo else x[-1]
+        avg_y = y[next_lo:next_hi].mean() if next_hi > next_lo else y[-1]
+        # Largest triangle between the previous pick, this bucket's candidates and the next bucket's mean
+        area = np.abs((x[prev] - avg_x) * (y[lo:hi] - y[prev]) - (x[prev] - x[lo:hi]) * (avg_y - y[prev]))
+        prev = lo + int(area.argmax())
+        picked[b + 1] = prev
+    return picked
+
+
+def downsample_indices(frame, columns, max_points=MAX_POINTS, method='minmax'):
+    if len(frame) <= max_points:
+        return np.arange(len(frame))
+    # Union over the key series so every drawn line keeps its own extremes
+    if method == 'lttb':
+        picks = [lttb_indices(frame[col].to_numpy(), max_points // len(columns)) for col in columns]
+    else:
+        picks = [minmax_indices(frame[col].to_numpy(), max(1, max_points // (2 * len(columns)))) for col in columns]
+    return np.unique(np.concatenate(picks))
+
+
+# Only the first row of each run of Long/Short/Exit is marked, and at most one marker per x bucket
+def signal_markers(frame, signal, max_markers=MAX_POINTS // 4):
+    mask = frame['Signal'].to_numpy() == signal
+    starts = np.flatnonzero(mask & ~np.concatenate([[False], mask[:-1]]))
+    if len(starts) > max_markers:
+        _, first = np.unique(starts // math.ceil(len(frame) / max_markers), return_index=True)
+        starts = starts[first]
+    return frame.iloc[starts]
+
+
+# ✅ Spread/bands/signals + Z-Score chart drawn on a pyplot-free Agg figure (safe off the main thread)
+def render_strategy(df, path, pair1, pair2, entry_z=ENTRY_Z, exit_z=EXIT_Z, max_points=MAX_POINTS,
+                    method='minmax'):
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    view = df.iloc[downsample_indices(df, ['Spread', 'Z-Score'], max_points, method)]
+    fig = Figure(figsize=(14, 8))
+    FigureCanvasAgg(fig)
+
+    # Plot 1: Spread and Z-score
+    ax1 = fig.add_subplot(211)
+    ax1.plot(view.index, view['Spread'], label='Spread')
+    ax1.plot(view.index, view['Spread_Mean'], label='Mean', linestyle='--', color='orange')
+    ax1.fill_between(view.index,
+                     view['Spread_Mean'] + 2*view['Spread_Std'],
+                     view['Spread_Mean'] - 2*view['Spread_Std'],
+                     alpha=0.2, color='gray', label='±2 Std Dev')
+
+    # Plot entry and exit points
+    for signal, color, marker in (('Long', 'green', '^'), ('Short', 'red', 'v'), ('Exit', 'black', 'x')):
+        points = signal_markers(df, signal)
+        ax1.scatter(points.index, points['Spread'], color=color, marker=marker, s=100, label=signal)
+
+    ax1.set_title(f'Spread Between {pair1} and {pair2} with Signals')
+    ax1.legend()
+
+    # Plot 2: Z-Score
+    ax2 = fig.add_subplot(212, sharex=ax1)
+    ax2.plot(view.index, view['Z-Score'], label='Z-Score', color='blue')
+    _z_levels(ax2, entry_z, exit_z)
+    ax2.set_title('Z-Score with TP/SL Levels')
+    ax2.legend()
+
+    fig.tight_layout()
+    fig.savefig(path)
+    return path
+
+
+def _z_levels(ax, entry_z, exit_z):
+    ax.axhline(y=entry_z, linestyle='--', color='red', label=f'Upper Threshold ({entry_z})')
+    ax.axhline(y=-entry_z, linestyle='--', color='green', label=f'Lower Threshold (-{entry_z})')
+    ax.axhline(y=exit_z, linestyle=':', color='gray', label=f'Exit Threshold ({exit_z})')
+    ax.axhline(y=-exit_z, linestyle=':', color='gray', label=f'Exit Threshold (-{exit_z})')
+    ax.axhline(y=0, linestyle='-', color='black', alpha=0.3)
+    ax.axhline(y=TP_LEVEL, linestyle='--', color='green', alpha=0.5, label=f'TP Level (+{TP_LEVEL})')
+    ax.axhline(y=-TP_LEVEL, linestyle='--', color='green', alpha=0.5, label=f'TP Level (-{TP_LEVEL})')
+    ax.axhline(y=SL_LEVEL, linestyle='--', color='red', alpha=0.5, label=f'SL Level (+{SL_LEVEL})')
+    ax.axhline(y=-SL_LEVEL, linestyle='--', color='red', alpha=0.5, label=f'SL Level (-{SL_LEVEL})')
+
+
+# ✅ One background render thread; a newer request for the same key replaces a pending one
+class BackgroundRenderer:
+    def __init__(self):
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='plot')
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def submit(self, key, func, *args, **kwargs):
+        with self._lock:
+            queued = key in self._pending
+            future = self._pending[key][0] if queued else Future()
+            self._pending[key] = (future, func, args, kwargs)
+        if not queued:
+            self._pool.submit(self._run, key)
+        return future
+
+    def _run(self, key):
+        with self._lock:
+            future, func, args, kwargs = self._pending.pop(key)
+        try:
+            future.set_result(func(*args, **kwargs))
+        except Exception as e:
+            print(f"Error rendering {key}: {e}")
+            future.set_exception(e)
+
+
+_renderer = None
+
+
+def get_renderer():
+    global _renderer
+    if _renderer is None:
+        _renderer = BackgroundRenderer()
+    return _renderer
+
+
+def render_in_background(df, path, pair1, pair2, **kwargs):
+    return get_renderer().submit(path, render_strategy, df, path, pair1, pair2, **kwargs)
+
+
+# ✅ Live chart: bars are appended in O(1) amortized, the figure is built once and its lines updated
+# in place on the render thread every `every` bars (only a downsampled copy crosses threads).
+class LiveChart:
+    def __init__(self, path, title='', entry_z=ENTRY_Z, exit_z=EXIT_Z, every=1, max_points=MAX_POINTS):
+        self.path = path
+        self.title = title
+        self.entry_z = entry_z
+        self.exit_z = exit_z
+        self.every = every
+        self.max_points = max_points
+        self.size = 0
+        self._times = np.empty(1024, dtype='datetime64[ns]')
+        self._values = np.empty((1024, 4))  # spread, mean, std, z
+        self._fig = None
+
+    def _reserve(self, size):
+        if size > len(self._times):
+            capacity = max(size, 2 * len(self._times))
+            self._times = np.resize(self._times, capacity)
+            self._values = np.resize(self._values, (capacity, 4))
+
+    def append(self, timestamp, spread, mean, std, z):
+        self._reserve(self.size + 1)
+        self._times[self.size] = pd.Timestamp(timestamp).tz_localize(None).to_datetime64()
+        self._values[self.size] = (spread, mean, std, z)
+        self.size += 1
+        if self.size % self.every == 0:
+            return self.refresh()
+        return None
+
+    # Extend from a finished analysis frame (e.g. the history the live Z-Score was seeded from)
+    def extend(self, df):
+        index = df.index.tz_localize(None) if getattr(df.index, 'tz', None) is not None else df.index
+        self._reserve(self.size + len(df))
+        self._times[self.size:self.size + len(df)] = index.to_numpy(dtype='datetime64[ns]')
+        self._values[self.size:self.size + len(df)] = df[['Spread', 'Spread_Mean', 'Spread_Std', 'Z-Score']].to_numpy()
+        self.size += len(df)
+        return self.refresh()
+
+    def refresh(self):
+        values = self._values[:self.size]
+        picked = np.unique(np.concatenate([minmax_indices(values[:, 0], self.max_points // 4),
+                                           minmax_indices(values[:, 3], self.max_points // 4)]))
+        return get_renderer().submit(self.path, self._draw, self._times[picked].copy(), values[picked].copy())
+
+    def _draw(self, times, values):
+        if self._fig is None:
+            self._build()
+        spread, mean, std, z = values.T
+        self._lines['spread'].set_data(times, spread)
+        self._lines['mean'].set_data(times, mean)
+        self._lines['upper'].set_data(times, mean + 2 * std)
+        self._lines['lower'].set_data(times, mean - 2 * std)
+        self._lines['z'].set_data(times, z)
+        for ax in self._axes:
+            ax.relim()
+            ax.autoscale_view()
+        self._fig.savefig(self.path)
+        return self.path
+
+    def _build(self):
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+
+        self._fig = Figure(figsize=(14, 8))
+        FigureCanvasAgg(self._fig)
+        ax1 = self._fig.add_subplot(211)
+        ax2 = self._fig.add_subplot(212, sharex=ax1)
+        empty = np.array([], dtype='datetime64[ns]')
+        self._lines = {
+            'spread': ax1.plot(empty, [], label='Spread')[0],
+            'mean': ax1.plot(empty, [], label='Mean', linestyle='--', color='orange')[0],
+            'upper': ax1.plot(empty, [], color='gray', alpha=0.5, label='±2 Std Dev')[0],
+            'lower': ax1.plot(empty, [], color='gray', alpha=0.5)[0],
+            'z': ax2.plot(empty, [], label='Z-Score', color='blue')[0],
+        }
+        _z_levels(ax2, self.entry_z, self.exit_z)
+        ax1.set_title(self.title)
+        ax1.legend(loc='upper left')
+        ax2.set_title('Z-Score with TP/SL Levels')
+        ax2.legend(loc='upper left')
+        self._fig.tight_layout()
+        self._axes = (ax1, ax2)
@@ -0,0 +1,342 @@
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from artifacts import load_artifacts, save_artifacts
+from bar_cache import get_bars_cached
+from broker_state import BrokerState
+from execution import _pool, submit_legs
+from hedge import ols_hedge_ratio
+from journal import get_journal
+from order_tracker import OrderTracker
+from risk import RiskEngine
+from scheduler import Job, MarketCalendar, Scheduler
+from signals import CLOSE, ENTRY_Z, EXIT_Z, position_states, signal_codes
+from zscore_stream import RollingZScoreBatch
+
+WINDOW = 30
+LOT_SIZE = 10
+ARTIFACT_NAME = 'portfolio'
+CANCEL_TIMEOUT = 5.0  # seconds to wait for a pair's cancels to be confirmed before its exit goes out
+
+
+def parse_pairs(specs):
+    pairs = []
+    for spec in specs:
+        pair1, _, pair2 = spec.partition('/')
+        if not pair1 or not pair2:
+            raise ValueError(f"Pair must look like SYMBOL1/SYMBOL2: {spec!r}")
+        pairs.append((pair1.strip(), pair2.strip()))
+    return pairs
+
+
+# ✅ N pair strategies in one process: one bar fetch per distinct symbol, one BrokerState snapshot
+# (three bulk calls per cycle however many pairs) and one batched Z-Score update for all pairs.
+# Orders go through the shared rate-limited session of `api` (see transport.make_rest).
+class Portfolio:
+    def __init__(self, api, pairs, window=WINDOW, entry_z=ENTRY_Z, exit_z=EXIT_Z, lot_size=LOT_SIZE,
+                 max_age=30.0, bracket=True, name=ARTIFACT_NAME, risk_share=1.0):
+        self.api = api
+        self.pairs = list(pairs)
+        self.window = window
+        self.entry_z = entry_z
+        self.exit_z = exit_z
+        self.lot_size = lot_size
+        self.bracket = bracket
+        self.name = name
+        self.symbols = sorted({symbol for pair in self.pairs for symbol in pair})
+        column = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self.legs = np.array([[column[p1], column[p2]] for p1, p2 in self.pairs], dtype=np.int64)
+        self.state = BrokerState(api, self.symbols, max_age=max_age)
+        self.risk = RiskEngine(api, self.state, share=risk_share)
+        # Signed filled quantity this portfolio holds per pair leg; pairs can share a symbol,
+        # so exits unwind the pair's own legs rather than the netted broker position.
+        self.book = np.zeros((len(self.pairs), 2), dtype=np.int64)
+        # Orders each pair has working (entries, exits and their bracket TP/SL legs): tracker key -> (pair, leg),
+        # and how much of each order's fill is already in the book
+        self.tracker = OrderTracker()
+        self.tracker.add_listener(self._on_order_update)
+        self.tracker.add_listener(self.risk.on_order_update)
+        self.owner = {}
+        self._counted = {}
+        self.zscore = None
+
+    def labels(self):
+        return [f"{p1}/{p2}" for p1, p2 in self.pairs]
+
+    def settings(self):
+        return {'pairs': self.labels(), 'window': self.window, 'entry_z': self.entry_z, 'exit_z': self.exit_z}
+
+    # ✅ Close history as a (bars, symbols) matrix, each symbol read through the bar cache once
+    def load_history(self, start_date, end_date, timeframe):
+        closes = {}
+        for symbol in self.symbols:
+            try:
+                closes[symbol] = get_bars_cached(self.api, symbol, timeframe, start_date, end_date)['close']
+            except Exception as e:
+                print(f"Error fetching data for {symbol}: {e}")
+        return pd.DataFrame(closes, columns=self.symbols)
+
+    # ✅ Static OLS hedge ratio per pair, then every pair's window is seeded in one matrix pass
+    def fit(self, history):
+        prices = history.to_numpy(dtype=np.float64)
+        y, x = prices[:, self.legs[:, 0]], prices[:, self.legs[:, 1]]
+        betas = np.empty(len(self.pairs))
+        positions = np.zeros(len(self.pairs), dtype=np.int8)
+        for j in range(len(self.pairs)):
+            both = ~(np.isnan(y[:, j]) | np.isnan(x[:, j]))
+            betas[j] = ols_hedge_ratio(y[both, j], x[both, j]) if both.sum() > 2 else np.nan
+        spreads = y - betas * x
+        rolling = pd.DataFrame(spreads).rolling(self.window)
+        z = ((spreads - rolling.mean()) / rolling.std()).to_numpy()
+        for j in range(len(self.pairs)):
+            # Resume in the position the historical signals end in, like bott.ensure_live_state
+            positions[j] = position_states(signal_codes(z[:, j], self.entry_z, self.exit_z))[0][-1] if len(z) else 0
+        self.zscore = RollingZScoreBatch(len(self.pairs), self.window, betas, self.entry_z, self.exit_z,
+                                         positions).seed(spreads)
+        for label, beta in zip(self.labels(), betas):
+            print(f"{label}: Hedge Ratio (Beta) {beta:.2f}")
+        return self
+
+    def save(self):
+        orders = []
+        for key, (j, leg) in self.owner.items():
+            record = self.tracker.get(None, key)
+            if record is not None:
+                orders.append([key, record.order_id, int(j), int(leg), record.symbol, record.side, record.qty,
+                               self._counted.get(key, 0.0)])
+        save_artifacts(self.name, dict(self.settings(), zscore=self.zscore.to_state(), book=self.book.tolist(),
+                                       orders=orders))
+
+    def restore(self):
+        cached = load_artifacts(self.name, self.settings())
+        if cached is None:
+            return False
+        self.zscore = RollingZScoreBatch.from_state(cached['zscore'])
+        self.book = np.array(cached['book'], dtype=np.int64).reshape(len(self.pairs), 2)
+        for key, order_id, j, leg, symbol, side, qty, counted in cached.get('orders', []):
+            self.tracker.track(key, symbol, side, qty, order_id=order_id)
+            self.owner[key] = (j, leg)
+            self._counted[key] = counted
+        print(f"Restored portfolio state for {len(self.pairs)} pairs from cache")
+        return True
+
+    # ✅ Orders for every pair that acts this bar, as (pair, leg, signed qty) + the (symbol, qty, side) leg
+    def _orders(self, actions):
+        orders = []
+        for j in np.flatnonzero(actions):
+            legs = self.legs[j]
+            if actions[j] == CLOSE:
+                targets = -self.book[j]
+            else:
+                beta = self.zscore.hedge_ratios[j]
+                targets = np.array([self.lot_size, -int(self.lot_size * beta)]) * int(actions[j])
+            for leg in (0, 1):
+                qty = int(targets[leg])
+                if qty or actions[j] != CLOSE:  # a zero hedge leg on an entry is left for the risk check to reject
+                    side = 'buy' if qty > 0 else 'sell'
+                    orders.append(((j, leg, qty), (self.symbols[legs[leg]], abs(qty), side)))
+        return orders
+
+    # ✅ Remember which pair owns each sent order, bracket TP/SL legs included
+    def _own(self, results):
+        for ((j, leg, _), _), result in results:
+            if result['order_id'] is None:
+                record = self.tracker.get(None, result.get('client_order_id'))
+                if record is not None:
+                    self.tracker.forget(record)
+                continue
+            self.owner[result['client_order_id']] = (j, leg)
+            exit_side = 'sell' if result['side'] == 'buy' else 'buy'
+            for leg_id in result.get('leg_ids', ()):
+                self.tracker.track(leg_id, result['symbol'], exit_side, result['qty'], order_id=leg_id)
+                self.owner[leg_id] = (j, leg)
+
+    # ✅ The book moves on fills only (entries, exits and TP/SL legs), never on an order acknowledgement
+    def _on_order_update(self, event, record):
+        key = record.client_order_id
+        owner = self.owner.get(key)
+        if owner is None:
+            return
+        filled = float(record.filled_qty or 0)
+        delta = filled - self._counted.get(key, 0.0)
+        if delta > 0:
+            self._counted[key] = filled
+            self.book[owner] += int(round(delta)) if record.side == 'buy' else -int(round(delta))
+
+    # ✅ Fill reconciliation at the start of each bar: owned orders still in the open-orders snapshot update from
+    # it, the ones that left it are fetched once for their final status and fill
+    def reconcile(self):
+        records = [self.tracker.get(None, key) for key in self.owner]
+        records = [record for record in records if record is not None and record.order_id and not record.terminal]
+        if not records:
+            return
+        working = {order.id: order for order in self.state.open_orders()}
+        gone = []
+        for record in records:
+            order = working.get(record.order_id)
+            if order is None:
+                gone.append(record)
+            else:
+                self.tracker.on_update(order.status, order)
+        if gone:
+            self._poll(gone)
+        self._prune()
+
+    # Latest status and fill of the given orders, one get_order each (concurrently), into the tracker
+    def _poll(self, records):
+        def fetch(record):
+            try:
+                return self.api.get_order(record.order_id)
+            except Exception as e:
+                print(f"Error fetching order {record.order_id}: {e}")
+                return None
+        for order in _pool.map(fetch, records):
+            if order is not None:
+                self.tracker.on_update(order.status, order)
+
+    # ✅ Before pairs exit, their working orders are cancelled and the cancels confirmed: TP/SL legs hold the
+    # quantity (the broker rejects the exit otherwise) and an unfilled entry must not fill after the exit.
+    def _cancel_working(self, pairs):
+        records = [self.tracker.get(None, key) for key, (j, _) in self.owner.items() if j in pairs]
+        records = [record for record in records if record is not None and record.order_id and not record.terminal]
+        if not records:
+            return
+
+        def cancel(record):
+            if record.status == 'held':
+                return  # a held bracket leg goes with its parent
+            try:
+                self.api.cancel_order(record.order_id)
+            except Exception as e:
+                if getattr(e, 'status_code', None) not in (404, 422):  # already done
+                    print(f"Error cancelling order {record.order_id}: {e}")
+        list(_pool.map(cancel, records))
+        self.state.on_order_change()
+        deadline = time.monotonic() + CANCEL_TIMEOUT
+        while records:
+            self._poll(records)
+            records = [record for record in records if not record.terminal]
+            if not records or time.monotonic() >= deadline:
+                break
+            time.sleep(0.1)
+        for record in records:
+            print(f"Order {record.order_id} ({record.symbol}) not confirmed cancelled, its pair may not exit")
+        self._prune()
+
+    def _prune(self):
+        for key in list(self.owner):
+            record = self.tracker.get(None, key)
+            if record is None or record.terminal:
+                del self.owner[key]
+                self._counted.pop(key, None)
+                if record is not None:
+                    self.tracker.forget(record)
+
+    # ✅ One cycle: refresh the shared snapshot, update all pairs, submit every leg concurrently
+    def cycle(self):
+        self.state.refresh()
+        return self.on_prices({symbol: self.state.latest_price(symbol) for symbol in self.symbols})
+
+    # One bar for every pair from {symbol: price} (also fed directly by shard workers)
+    # A symbol without a quote (None, missing or NaN) holds its pairs for this bar, see RollingZScoreBatch.update
+    def on_prices(self, latest):
+        latest = {symbol: price for symbol, price in latest.items() if price is not None and np.isfinite(price)}
+        self.state.set_prices(latest)
+        # Positions/orders come from the snapshot (refetched only when stale), the account once a minute
+        self.risk.refresh()
+        self.risk.set_prices(latest)
+        self.reconcile()
+        prices = np.array([latest.get(symbol, np.nan) for symbol in self.symbols], dtype=np.float64)
+        z, codes, actions = self.zscore.update(prices[self.legs[:, 0]], prices[self.legs[:, 1]])
+
+        closing = set(np.flatnonzero(actions == CLOSE).tolist())
+        if closing:
+            self._cancel_working(closing)
+        orders = self._orders(actions)
+        if orders:
+            for j in np.flatnonzero(actions):
+                kind = 'Exiting' if actions[j] == CLOSE else ('Opening Long' if actions[j] > 0 else 'Opening Short')
+                print(f"{self.labels()[j]}: {kind} (Z-Score {z[j]:.2f})")
+            # Every leg of the cycle checked in one batch; an entry's two legs pass or fail together
+            legs = {}
+            for k, ((j, leg, _), _) in enumerate(orders):
+                legs.setdefault(j, {})[leg] = k
+            pairs = [(ks[0], ks[1], self.zscore.hedge_ratios[j]) for j, ks in legs.items()
+                     if actions[j] != CLOSE and len(ks) == 2]
+            reasons = self.risk.check([leg for _, leg in orders], pairs)
+            orders = [order for order, reason in zip(orders, reasons) if reason is None]
+            # Closing legs go out as plain limits, a bracket on an exit would reopen risk
+            closing = [actions[j] == CLOSE for (j, _, _), _ in orders]
+            results = []
+            for exits in (False, True):
+                batch = [leg for leg, is_exit in zip(orders, closing) if is_exit == exits]
+                if batch:
+                    results += list(zip(batch, submit_legs(self.api, [leg for _, leg in batch],
+                                                           bracket=self.bracket and not exits, state=self.state,
+                                                           tracker=self.tracker)))
+            self.risk.submitted([result for _, result in results])
+            self._own(results)
+            journal = get_journal()
+            for _, result in results:
+                if result['error'] is not None:
+                    print(f"Error placing trade for {result['symbol']}: {result['error']}")
+                    continue
+                journal.record('portfolio', result['symbol'], result['side'], result['qty'], result['entry_price'],
+                               result['tp_price'], result['sl_price'], result['order_id'])
+        self.save()
+        return z, actions
+
+
+def run_portfolio(api, pairs, start_date, end_date, timeframe, check_timeframe='1h', market_hours=False,
+                  once=False, refresh=False, **kwargs):
+    portfolio = Portfolio(api, pairs, **kwargs)
+    if refresh or not portfolio.restore():
+        portfolio.fit(portfolio.load_history(start_date, end_date, timeframe)).save()
+    portfolio.cycle()
+    if once:
+        return portfolio
+    print(f"Trading {len(pairs)} pairs ({len(portfolio.symbols)} symbols). Press Ctrl+C to stop.")
+    scheduler = Scheduler(MarketCalendar(api))
+    scheduler.add(Job('portfolio', portfolio.cycle, check_timeframe, market_hours=market_hours))
+    scheduler.run()
+    print(f"Scheduler metrics: {scheduler.metrics()}")
+    return portfolio
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Trade many pairs from one process")
+    parser.add_argument('pairs', nargs='*', help="pairs as SYMBOL1/SYMBOL2")
+    parser.add_argument('--file', help="CSV with pair1,pair2 columns (e.g. scanner output) or one pair per line")
+    parser.add_argument('--start', default='2024-01-01')
+    parser.add_argument('--end', default='2024-04-24')
+    parser.add_argument('--window', type=int, default=WINDOW)
+    parser.add_argument('--lot-size', type=int, default=LOT_SIZE)
+    parser.add_argument('--every', default='1h', help="check timeframe")
+    parser.add_argument('--market-hours', action='store_true')
+    parser.add_argument('--once', action='store_true', help="run a single cycle and exit")
+    parser.add_argument('--refresh', action='store_true', help="refit instead of using cached artifacts")
+    args = parser.parse_args()
+
+    pairs = parse_pairs(args.pairs)
+    if args.file:
+        if args.file.endswith('.csv'):
+            table = pd.read_csv(args.file)
+            pairs += list(zip(table['pair1'], table['pair2']))
+        else:
+            with open(args.file) as file:
+                pairs += parse_pairs(line.strip() for line in file if line.strip())
+    if not pairs:
+        parser.error("no pairs given")
+
+    from alpaca_trade_api.rest import TimeFrame
+    from dotenv import load_dotenv
+    from transport import make_rest
+
+    load_dotenv()
+    api = make_rest(os.getenv("API_KEY"), os.getenv("SECRET_KEY"), 'https://paper-api.alpaca.markets')
+    run_portfolio(api, pairs, args.start, args.end, TimeFrame.Day, args.every, args.market_hours, args.once,
+                  args.refresh, window=args.window, lot_size=args.lot_size)
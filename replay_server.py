@@ -0,0 +1,90 @@
+import argparse
+import asyncio
+import json
+
+import pandas as pd
+
+from stream import REPLAY_DONE
+
+
+# ✅ Recorded bars as Alpaca stream messages, in time order
+def load_bar_messages(symbols, path=None, timeframe='1Day'):
+    frames = []
+    if path:
+        prices = pd.read_parquet(path) if path.endswith('.parquet') else pd.read_csv(path, index_col=0, parse_dates=True)
+        for symbol in symbols:
+            frames.append(pd.DataFrame({'S': symbol, 'c': prices[symbol]}).dropna())
+    else:
+        from bar_cache import load_bars
+
+        for symbol in symbols:
+            bars, _ = load_bars(symbol, timeframe)
+            if bars is None:
+                raise FileNotFoundError(f"No cached {timeframe} bars for {symbol}")
+            frames.append(pd.DataFrame({'S': symbol, 'o': bars['open'], 'h': bars['high'], 'l': bars['low'],
+                                        'c': bars['close'], 'v': bars['volume']}))
+
+    bars = pd.concat(frames).sort_index(kind='stable')
+    index = pd.DatetimeIndex(bars.index)
+    if index.tz is None:
+        index = index.tz_localize('UTC')
+    bars['t'] = index.strftime('%Y-%m-%dT%H:%M:%SZ')
+    bars['T'] = 'b'
+    return bars.to_dict('records')
+
+
+# ✅ Local stand-in for the market data websocket: speaks the same JSON handshake, then replays bars
+class ReplayServer:
+    def __init__(self, messages, interval=0.0):
+        self.messages = messages
+        self.interval = interval  # seconds between bar timestamps, 0 = as fast as possible
+
+    async def handler(self, ws):
+        await ws.send(json.dumps([{'T': 'success', 'msg': 'connected'}]))
+        await ws.recv()  # auth, any key is accepted
+        await ws.send(json.dumps([{'T': 'success', 'msg': 'authenticated'}]))
+        request = json.loads(await ws.recv())
+        symbols = set(request.get('bars', []))
+        await ws.send(json.dumps([{'T': 'subscription', 'bars': sorted(symbols)}]))
+
+        batch, batch_ts = [], None
+        for message in self.messages:
+            if message['S'] not in symbols:
+                continue
+            if batch and message['t'] != batch_ts:
+                await self._send(ws, batch)
+                batch = []
+            batch.append(message)
+            batch_ts = message['t']
+        if batch:
+            await self._send(ws, batch)
+        await ws.close(reason=REPLAY_DONE)  # tells the client not to reconnect
+
+    async def _send(self, ws, batch):
+        await ws.send(json.dumps(batch))
+        await asyncio.sleep(self.interval)
+
+    async def serve(self, host='127.0.0.1', port=8765, ready=None):
+        import websockets
+
+        async with websockets.serve(self.handler, host, port):
+            print(f"Replaying {len(self.messages)} bars on ws://{host}:{port}")
+            if ready is not None:
+                ready.set()
+            await asyncio.Future()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay recorded bars over a local websocket")
+    parser.add_argument('symbols', nargs='+')
+    parser.add_argument('--data', help="CSV/Parquet with a close column per symbol (default: bar cache)")
+    parser.add_argument('--timeframe', default='1Day')
+    parser.add_argument('--interval', type=float, default=0.0, help="seconds between bars")
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    server = ReplayServer(load_bar_messages(args.symbols, args.data, args.timeframe), args.interval)
+    try:
+        asyncio.run(server.serve(port=args.port))
+    except KeyboardInterrupt:
+        pass
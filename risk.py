@@ -0,0 +1,226 @@
+import os
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+
+import metrics
+
+# ✅ Pre-trade limits (notional in account currency); 0 disables a limit
+MAX_ORDER_NOTIONAL = float(os.getenv("RISK_MAX_ORDER_NOTIONAL", "50000"))
+MAX_POSITION_NOTIONAL = float(os.getenv("RISK_MAX_POSITION_NOTIONAL", "100000"))
+MAX_BETA_IMBALANCE = float(os.getenv("RISK_MAX_BETA_IMBALANCE", "0.25"))  # |q2 + beta*q1| / |beta*q1|
+ACCOUNT_MAX_AGE = 60.0  # seconds between get_account calls
+
+risk_stats = {'batches': 0, 'legs': 0, 'approved': 0, 'rejected': 0, 'reasons': Counter(), 'last_check_us': None}
+
+
+def _signed(qty, side):
+    return float(qty) if side == 'buy' else -float(qty)
+
+
+# Exposure a leg adds on top of `current` (a flip counts only what goes past flat), as checked and reserved
+def _added(current, signed):
+    return max(0.0, abs(current + signed) - abs(current))
+
+
+# ✅ In-memory risk engine: equity, buying power, positions and working-order quantity per symbol
+# Refreshed from the BrokerState snapshot each cycle (plus one get_account every ACCOUNT_MAX_AGE seconds)
+# and moved by trade-update events in between, so a check never makes a REST call.
+class RiskEngine:
+    # share: the fraction of the account's buying power this engine may use (1/n for each of n shards)
+    def __init__(self, api, state, max_order_notional=MAX_ORDER_NOTIONAL, max_position_notional=MAX_POSITION_NOTIONAL,
+                 max_beta_imbalance=MAX_BETA_IMBALANCE, account_max_age=ACCOUNT_MAX_AGE, share=1.0):
+        self.api = api
+        self.state = state
+        self.share = share
+        self.max_order_notional = max_order_notional
+        self.max_position_notional = max_position_notional
+        self.max_beta_imbalance = max_beta_imbalance
+        self.account_max_age = account_max_age
+        self.equity = None
+        self.buying_power = None
+        self.positions = {}
+        self.pending = {}
+        self.prices = {}
+        self.rejections = deque(maxlen=1000)
+        self._account_at = 0.0
+        self._synced = (0.0, 0.0)
+        self._filled = {}
+        self._working = {}
+        self._done = OrderedDict()  # orders that finished before submitted() saw them: key -> filled qty
+        self._lock = threading.Lock()
+
+    # ✅ Periodic refresh from the cycle's broker snapshot; the account only when it is stale
+    # A snapshot is adopted only when it was fetched after the last one, otherwise the event-driven
+    # updates since then would be overwritten with older data.
+    def refresh(self, force_account=False):
+        positions = self.state.positions()
+        orders = self.state.open_orders()
+        fetched = (self.state.fetched_at('positions'), self.state.fetched_at('orders'))
+        account = None
+        if force_account or time.monotonic() - self._account_at > self.account_max_age:
+            account = self.api.get_account()
+        with self._lock:
+            if fetched[0] > self._synced[0]:
+                self.positions = {p.symbol: float(p.qty) for p in positions}
+            if fetched[1] > self._synced[1]:
+                self.pending = {}
+                for order in orders:
+                    if order.status != 'held':
+                        open_qty = float(order.qty) - float(order.filled_qty or 0)
+                        self.pending[order.symbol] = self.pending.get(order.symbol, 0.0) + _signed(open_qty, order.side)
+            self._synced = fetched
+            if account is not None:
+                self.equity = float(account.equity)
+                self.buying_power = float(account.buying_power) * self.share
+                self._account_at = time.monotonic()
+        return self
+
+    def set_prices(self, prices):
+        with self._lock:
+            self.prices.update({symbol: float(price) for symbol, price in prices.items()})
+
+    # ✅ Trade updates (OrderTracker listener): any fill moves the position and a fill that reduces it gives its
+    # buying power back; for orders this engine approved, the fill also leaves working quantity and a
+    # cancel/expiry/rejection releases what was left.
+    # Events that beat submitted() (the REST ack) are remembered and settled there.
+    def on_order_update(self, event, record):
+        if record.symbol is None or record.side is None:
+            return
+        key = record.client_order_id or record.order_id
+        with self._lock:
+            filled = float(record.filled_qty or 0)
+            delta = filled - self._filled.get(key, 0.0)
+            if delta > 0:
+                self._filled[key] = filled
+                signed = _signed(delta, record.side)
+                before = self.positions.get(record.symbol, 0.0)
+                self.positions[record.symbol] = before + signed
+                if key in self._working:
+                    self._working[key] -= delta
+                    self.pending[record.symbol] = self.pending.get(record.symbol, 0.0) - signed
+                if record.filled_avg_price is not None:
+                    self.prices[record.symbol] = float(record.filled_avg_price)
+                freed = max(0.0, abs(before) - abs(before + signed))
+                price = self.prices.get(record.symbol)
+                if freed and self.buying_power is not None and price is not None:
+                    self.buying_power += freed * price
+            if record.terminal:
+                self._filled.pop(key, None)
+                if key in self._working:
+                    left = self._working.pop(key)
+                    if left > 0:
+                        self._release(record.symbol, left, record.side)
+                else:
+                    self._done[key] = filled
+                    while len(self._done) > 10_000:
+                        self._done.popitem(last=False)
+
+    def _release(self, symbol, qty, side):
+        signed = _signed(qty, side)
+        before = self.positions.get(symbol, 0.0) + self.pending.get(symbol, 0.0)
+        self.pending[symbol] = self.pending.get(symbol, 0.0) - signed
+        price = self.prices.get(symbol)
+        if self.buying_power is not None and price is not None:
+            self.buying_power += max(0.0, abs(before) - abs(before - signed)) * price
+
+    # After submit_legs: sent legs are followed by client order ID, the others give their reservation back
+    def submitted(self, results):
+        with self._lock:
+            for result in results:
+                # A duplicate resolved to an order sent earlier, which the broker snapshot already counts
+                if result['error'] is not None or result['order_id'] is None or result.get('duplicate'):
+                    self._release(result['symbol'], result['qty'], result['side'])
+                    continue
+                key, qty = result['client_order_id'], float(result['qty'])
+                done = key in self._done
+                filled = self._done.pop(key) if done else self._filled.get(key, 0.0)
+                symbol = result['symbol']
+                if filled:
+                    self.pending[symbol] = self.pending.get(symbol, 0.0) - _signed(filled, result['side'])
+                if done:
+                    if qty > filled:
+                        self._release(symbol, qty - filled, result['side'])
+                else:
+                    self._working[key] = qty - filled
+
+    # ✅ One batch = every leg of a cycle, legs as (symbol, qty, side). pairs lists (i, j, beta) for legs that open
+    # a hedged pair: they are checked for beta neutrality and approved or rejected together.
+    # Returns one reason per leg (None = approved); approved legs are reserved against the limits at once.
+    def check(self, legs, pairs=(), prices=None):
+        started = time.perf_counter()
+        reasons = [None] * len(legs)
+        with self._lock:
+            prices = self.prices if prices is None else {**self.prices, **prices}
+            exposure = {}
+            buying_power = self.buying_power
+            for i, (symbol, qty, side) in enumerate(legs):
+                current = exposure.get(symbol)
+                if current is None:
+                    current = self.positions.get(symbol, 0.0) + self.pending.get(symbol, 0.0)
+                if qty <= 0:
+                    reasons[i] = 'qty'
+                    continue
+                new = current + _signed(qty, side)
+                exposure[symbol] = new
+                if abs(new) <= abs(current) and (new == 0 or (new > 0) == (current > 0)):
+                    continue  # reduces exposure: never blocked
+                price = prices.get(symbol)
+                if price is None:
+                    reasons[i] = 'no_price'
+                elif self.max_order_notional and qty * price > self.max_order_notional:
+                    reasons[i] = 'order_notional'
+                elif self.max_position_notional and abs(new) * price > self.max_position_notional:
+                    reasons[i] = 'position_notional'
+                elif buying_power is not None:
+                    added = _added(current, _signed(qty, side)) * price
+                    if added > buying_power:
+                        reasons[i] = 'buying_power'
+                    else:
+                        buying_power -= added
+                if reasons[i] is not None:
+                    exposure[symbol] = current
+
+            for i, j, beta in pairs:
+                if reasons[i] is None and reasons[j] is None and self.max_beta_imbalance:
+                    hedge = beta * _signed(legs[i][1], legs[i][2])
+                    imbalance = abs(_signed(legs[j][1], legs[j][2]) + hedge) / max(abs(hedge), 1e-12)
+                    if imbalance > self.max_beta_imbalance:
+                        reasons[i] = reasons[j] = 'beta_imbalance'
+                if (reasons[i] is None) != (reasons[j] is None):
+                    # Never leg into half a pair
+                    reasons[i] = reasons[i] or f"pair_{reasons[j]}"
+                    reasons[j] = reasons[j] or f"pair_{reasons[i]}"
+
+            # Reserve what was approved (recomputed, a pair rejection can undo an approval above)
+            for (symbol, qty, side), reason in zip(legs, reasons):
+                if reason is None:
+                    before = self.positions.get(symbol, 0.0) + self.pending.get(symbol, 0.0)
+                    signed = _signed(qty, side)
+                    self.pending[symbol] = self.pending.get(symbol, 0.0) + signed
+                    price = prices.get(symbol)
+                    if self.buying_power is not None and price is not None:
+                        self.buying_power -= _added(before, signed) * price
+        elapsed = time.perf_counter() - started
+        self._record(legs, reasons, elapsed)
+        return reasons
+
+    def _record(self, legs, reasons, elapsed):
+        risk_stats['batches'] += 1
+        risk_stats['legs'] += len(legs)
+        risk_stats['last_check_us'] = elapsed * 1e6
+        metrics.observe('risk_check', elapsed)
+        for (symbol, qty, side), reason in zip(legs, reasons):
+            if reason is None:
+                risk_stats['approved'] += 1
+                continue
+            risk_stats['rejected'] += 1
+            risk_stats['reasons'][reason] += 1
+            metrics.count(f"risk_rejected_{reason}")
+            self.rejections.append((time.time(), symbol, qty, side, reason))
+            print(f"Risk rejected {side} {qty} {symbol}: {reason}")
+
+    def snapshot(self):
+        with self._lock:
+            return {'equity': self.equity, 'buying_power': self.buying_power, 'positions': dict(self.positions),
+                    'pending': {s: q for s, q in self.pending.items() if q}, 'stats': dict(risk_stats)}
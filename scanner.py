@@ -0,0 +1,129 @@
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+from hedge import ols_hedge_ratio
+
+MIN_CORRELATION = 0.7
+MAX_PVALUE = 0.05
+
+# Price matrix shared with pool workers once through the initializer instead of per task
+_prices = None
+
+
+# ✅ Full correlation matrix in one vectorized pass, keep the upper-triangle pairs above the threshold
+def correlated_pairs(prices, min_correlation=MIN_CORRELATION):
+    values = prices.to_numpy(dtype=np.float64)
+    corr = np.corrcoef(values, rowvar=False)
+    rows, cols = np.triu_indices(len(prices.columns), k=1)
+    keep = np.abs(corr[rows, cols]) >= min_correlation
+    return rows[keep], cols[keep], corr[rows[keep], cols[keep]]
+
+
+def _init_worker(values):
+    global _prices
+    _prices = values
+
+
+# ✅ Engle-Granger test: OLS residuals, then an ADF regression with a fixed number of lagged differences
+# Solved with closed-form numpy least squares instead of statsmodels' per-pair AIC lag search.
+def engle_granger(y, x, lags=1):
+    from statsmodels.tsa.adfvalues import mackinnonp
+
+    beta = ols_hedge_ratio(y, x)
+    resid = y - beta * x
+    resid = resid - resid.mean()
+    diff = np.diff(resid)
+    target = diff[lags:]
+    regressors = [resid[lags:-1]] + [diff[lags - k:-k] for k in range(1, lags + 1)]
+    design = np.column_stack(regressors)
+    coef, _, _, _ = np.linalg.lstsq(design, target, rcond=None)
+    err = target - design @ coef
+    dof = len(target) - design.shape[1]
+    sigma2 = err @ err / dof
+    cov = sigma2 * np.linalg.inv(design.T @ design)
+    t_stat = coef[0] / np.sqrt(cov[0, 0])
+    return t_stat, mackinnonp(t_stat, regression='c', N=2), beta, resid.std()
+
+
+def _test_pairs(chunk, lags=1):
+    results = []
+    for i, j in chunk:
+        try:
+            t_stat, p_value, beta, spread_std = engle_granger(_prices[:, i], _prices[:, j], lags)
+        except Exception:
+            continue
+        results.append((i, j, t_stat, p_value, beta, spread_std))
+    return results
+
+
+# ✅ Rank all pairs of a price universe (columns = symbols) by cointegration strength
+def scan_pairs(prices, min_correlation=MIN_CORRELATION, max_pvalue=MAX_PVALUE, workers=None,
+               lags=1, chunk_size=256):
+    prices = prices.dropna()
+    symbols = list(prices.columns)
+    rows, cols, corr = correlated_pairs(prices, min_correlation)
+    print(f"{len(rows)} of {len(symbols) * (len(symbols) - 1) // 2} pairs pass |correlation| >= {min_correlation}")
+
+    candidates = list(zip(rows.tolist(), cols.tolist()))
+    chunks = [candidates[k:k + chunk_size] for k in range(0, len(candidates), chunk_size)]
+    correlation = dict(zip(candidates, corr.tolist()))
+
+    values = np.ascontiguousarray(prices.to_numpy(dtype=np.float64))
+    results = []
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), initializer=_init_worker,
+                             initargs=(values,)) as pool:
+        for chunk_result in pool.map(partial(_test_pairs, lags=lags), chunks):
+            results.extend(chunk_result)
+
+    ranked = pd.DataFrame(
+        [(symbols[i], symbols[j], correlation[(i, j)], t, p, beta, std)
+         for i, j, t, p, beta, std in results],
+        columns=['pair1', 'pair2', 'correlation', 'coint_t', 'p_value', 'hedge_ratio', 'spread_std'])
+    ranked = ranked[ranked['p_value'] <= max_pvalue]
+    return ranked.sort_values(['p_value', 'coint_t']).reset_index(drop=True)
+
+
+# ✅ Load close prices for a universe through the bar cache
+def load_universe(api, symbols, start_date, end_date, timeframe):
+    from bar_cache import get_bars_cached
+
+    closes = {}
+    for symbol in symbols:
+        try:
+            closes[symbol] = get_bars_cached(api, symbol, timeframe, start_date, end_date)['close']
+        except Exception as e:
+            print(f"Error fetching data for {symbol}: {e}")
+    return pd.DataFrame(closes)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scan a symbol universe for cointegrated pairs")
+    parser.add_argument('symbols', nargs='*', help="symbols to scan (or use --file)")
+    parser.add_argument('--file', help="text file with one symbol per line")
+    parser.add_argument('--start', default='2024-01-01')
+    parser.add_argument('--end', default='2024-04-24')
+    parser.add_argument('--min-correlation', type=float, default=MIN_CORRELATION)
+    parser.add_argument('--max-pvalue', type=float, default=MAX_PVALUE)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--lags', type=int, default=1, help="lagged differences in the ADF regression")
+    parser.add_argument('--top', type=int, default=20)
+    args = parser.parse_args()
+
+    symbols = list(args.symbols)
+    if args.file:
+        with open(args.file) as file:
+            symbols += [line.strip() for line in file if line.strip()]
+
+    from alpaca_trade_api.rest import TimeFrame
+    from dotenv import load_dotenv
+    from transport import make_rest
+
+    load_dotenv()
+    api = make_rest(os.getenv("API_KEY"), os.getenv("SECRET_KEY"), 'https://paper-api.alpaca.markets')
+    prices = load_universe(api, symbols, args.start, args.end, TimeFrame.Day)
+    print(scan_pairs(prices, args.min_correlation, args.max_pvalue, args.workers, args.lags).head(args.top))
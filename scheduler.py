@@ -0,0 +1,160 @@
+import asyncio
+import heapq
+import itertools
+import time
+from collections import deque
+
+import pandas as pd
+
+MARKET_TZ = 'America/New_York'
+
+
+# ✅ Trading sessions from Alpaca's calendar endpoint (weekdays 09:30-16:00 ET without an api), cached by date
+class MarketCalendar:
+    def __init__(self, api=None, tz=MARKET_TZ):
+        self.api = api
+        self.tz = tz
+        self._sessions = {}
+
+    def _load(self, start, end):
+        days = {}
+        if self.api is not None:
+            try:
+                for day in self.api.get_calendar(start=start.isoformat(), end=end.isoformat()):
+                    date = pd.Timestamp(day.date).date()
+                    days[date] = (str(day.open), str(day.close))
+            except Exception as e:
+                print(f"Error fetching market calendar: {e}")
+                days = {}
+        if not days:
+            for date in pd.bdate_range(start, end).date:
+                days[date] = ('09:30', '16:00')
+        for date in pd.date_range(start, end).date:
+            if date in days:
+                session_open = pd.Timestamp(f"{date} {days[date][0]}", tz=self.tz).tz_convert('UTC')
+                session_close = pd.Timestamp(f"{date} {days[date][1]}", tz=self.tz).tz_convert('UTC')
+                self._sessions[date] = (session_open, session_close)
+            else:
+                self._sessions[date] = None
+
+    def session(self, date):
+        if date not in self._sessions:
+            self._load(date, date + pd.Timedelta(days=30))
+        return self._sessions[date]
+
+    # ✅ Next bar close strictly after `now`: intraday bars are aligned to the session open
+    def next_bar_close(self, now, timeframe):
+        now = pd.Timestamp(now).tz_convert('UTC')
+        date = now.tz_convert(self.tz).date()
+        for _ in range(15):  # long weekends / holidays
+            session = self.session(date)
+            if session is not None:
+                session_open, session_close = session
+                if timeframe >= pd.Timedelta(days=1):
+                    if now < session_close:
+                        return session_close
+                elif now < session_close:
+                    steps = max(0, (now - session_open) // timeframe) + 1
+                    return min(session_open + steps * timeframe, session_close)
+            date = date + pd.Timedelta(days=1)
+        raise RuntimeError("No trading session found in the next two weeks")
+
+
+# ✅ A strategy callback fired at each bar close of its timeframe
+class Job:
+    def __init__(self, name, callback, timeframe='1h', market_hours=True, delay=1.0, tolerance=None):
+        self.name = name
+        self.callback = callback
+        self.timeframe = pd.Timedelta(timeframe)
+        self.market_hours = market_hours  # False for 24/7 symbols (crypto/FX)
+        self.delay = delay  # seconds after the close, so the bar is published
+        self.tolerance = tolerance if tolerance is not None else self.timeframe.total_seconds() / 2
+        self.running = False
+        self.metrics = {'runs': 0, 'missed': 0, 'skipped_busy': 0, 'errors': 0, 'jitter_ms': deque(maxlen=1000)}
+
+
+# ✅ Runs many jobs in one asyncio loop, sleeping exactly until the next due job
+class Scheduler:
+    def __init__(self, calendar=None):
+        self.calendar = calendar or MarketCalendar()
+        self.jobs = []
+        self._heap = []
+        self._seq = itertools.count()
+
+    def add(self, job):
+        self.jobs.append(job)
+        self._push(job, time.time())
+        return job
+
+    def next_due(self, job, now):
+        now_ts = pd.Timestamp(now, unit='s', tz='UTC')
+        if job.market_hours:
+            close = self.calendar.next_bar_close(now_ts, job.timeframe)
+        else:
+            close = now_ts.floor(job.timeframe) + job.timeframe
+        return close.timestamp() + job.delay
+
+    def _push(self, job, now):
+        heapq.heappush(self._heap, (self.next_due(job, now), next(self._seq), job))
+
+    async def _execute(self, job):
+        job.running = True
+        try:
+            await asyncio.to_thread(job.callback)
+        except Exception as e:
+            job.metrics['errors'] += 1
+            print(f"Error in scheduled job {job.name}: {e}")
+        finally:
+            job.running = False
+
+    async def run_async(self, stop=None):
+        tasks = set()
+        while self._heap and (stop is None or not stop.is_set()):
+            due, _, job = self._heap[0]
+            wait = due - time.time()
+            if wait > 0:
+                if stop is None:
+                    await asyncio.sleep(wait)
+                else:
+                    try:
+                        await asyncio.wait_for(stop.wait(), wait)
+                    except asyncio.TimeoutError:
+                        pass
+                continue  # re-check the heap head, the clock may have jumped
+            heapq.heappop(self._heap)
+            lateness = time.time() - due
+            job.metrics['jitter_ms'].append(lateness * 1000)
+
+            if lateness > job.tolerance:
+                job.metrics['missed'] += 1
+                print(f"{job.name}: missed bar close by {lateness:.1f}s, skipping to the next one")
+            elif job.running:
+                job.metrics['skipped_busy'] += 1
+            else:
+                job.metrics['runs'] += 1
+                task = asyncio.create_task(self._execute(job))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            self._push(job, max(time.time(), due))
+        if tasks:
+            await asyncio.gather(*tasks)
+
+    def run(self):
+        try:
+            asyncio.run(self.run_async())
+        except KeyboardInterrupt:
+            print("\nScheduler stopped.")
+
+    def metrics(self):
+        summary = {}
+        for job in self.jobs:
+            jitter = sorted(job.metrics['jitter_ms'])
+            summary[job.name] = {
+                'runs': job.metrics['runs'],
+                'missed': job.metrics['missed'],
+                'skipped_busy': job.metrics['skipped_busy'],
+                'errors': job.metrics['errors'],
+                'jitter_p50_ms': jitter[len(jitter) // 2] if jitter else None,
+                'jitter_max_ms': jitter[-1] if jitter else None,
+            }
+        return summary
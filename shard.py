@@ -0,0 +1,294 @@
+import argparse
+import math
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from collections import defaultdict
+from multiprocessing.managers import BaseManager
+
+from portfolio import Portfolio, parse_pairs
+
+QUEUE_HOST = os.getenv("SHARD_QUEUE_HOST", "127.0.0.1")
+QUEUE_PORT = int(os.getenv("SHARD_QUEUE_PORT", "50555"))
+# The queue server speaks pickle, so anyone holding the key can run code on the coordinator's host.
+# Required for --remote and for workers; a local coordinator makes a random one for the processes it spawns.
+QUEUE_AUTHKEY = os.getenv("SHARD_QUEUE_AUTHKEY", "").encode() or None
+RATE_LIMIT_PER_MIN = int(os.getenv("ALPACA_RATE_LIMIT", "200"))
+
+
+# ✅ Split pairs into n shards of near-equal size, keeping pairs that share a symbol together where possible
+# so each symbol's bars go to as few shards as possible.
+def partition_pairs(pairs, n_shards):
+    capacity = math.ceil(len(pairs) / n_shards)
+    shards = [[] for _ in range(n_shards)]
+    symbols = [set() for _ in range(n_shards)]
+    for pair in pairs:
+        open_shards = [k for k in range(n_shards) if len(shards[k]) < capacity]
+        best = max(open_shards, key=lambda k: (len(symbols[k] & set(pair)), -len(shards[k])))
+        shards[best].append(pair)
+        symbols[best].update(pair)
+    return [shard for shard in shards if shard]
+
+
+def route_table(shards):
+    routes = defaultdict(list)
+    for k, shard in enumerate(shards):
+        for symbol in sorted({symbol for pair in shard for symbol in pair}):
+            routes[symbol].append(k)
+    return dict(routes)
+
+
+# ✅ Message queue stand-in: named queues served over TCP by a multiprocessing manager
+# Workers on other machines connect with the same address and authkey; swap in a real broker
+# (Redis, NATS, ...) by replacing connect_queues().
+_queues = {}
+
+
+def _get_queue(name):
+    return _queues.setdefault(name, queue.Queue())
+
+
+class QueueManager(BaseManager):
+    pass
+
+
+QueueManager.register('get_queue', callable=_get_queue)
+
+
+def start_queue_server(host=QUEUE_HOST, port=QUEUE_PORT, authkey=QUEUE_AUTHKEY):
+    manager = QueueManager(address=(host, port), authkey=authkey)
+    manager.start()
+    return manager
+
+
+def connect_queues(host=QUEUE_HOST, port=QUEUE_PORT, authkey=QUEUE_AUTHKEY, retries=50):
+    for attempt in range(retries):
+        try:
+            manager = QueueManager(address=(host, port), authkey=authkey)
+            manager.connect()
+            return manager
+        except (ConnectionError, OSError):
+            if attempt == retries - 1:
+                raise
+            time.sleep(0.1)
+
+
+# ✅ Live api for a shard or the coordinator: its own pooled session with an equal share of the account's
+# request budget, split n_shards + 1 ways so the coordinator's market-data calls fit in it too
+def live_api(n_shards):
+    from dotenv import load_dotenv
+    from transport import TokenBucket, RateLimitedSession, make_rest
+
+    load_dotenv()
+    api = make_rest(os.getenv("API_KEY"), os.getenv("SECRET_KEY"), 'https://paper-api.alpaca.markets')
+    api._session = RateLimitedSession(TokenBucket(max(1, RATE_LIMIT_PER_MIN // (n_shards + 1))))
+    return api
+
+
+def sim_api(n_shards, latency_ms=5.0):
+    from sim_broker import SimBroker
+    return SimBroker(latency_ms=latency_ms, volatility=0.01)
+
+
+# ✅ Shard worker: gets its pairs from config:<k>, then evaluates a bar once every symbol it owns has a
+# price for that bar timestamp. Reports book, prices and timings to the coordinator after each bar.
+def run_shard(shard_id, host=QUEUE_HOST, port=QUEUE_PORT, authkey=QUEUE_AUTHKEY, api_factory=live_api):
+    manager = connect_queues(host, port, authkey)
+    inbox = manager.get_queue(f'bars:{shard_id}')
+    reports = manager.get_queue('reports')
+    config = manager.get_queue(f'config:{shard_id}').get()
+
+    api = api_factory(config['n_shards'])
+    # Every shard sees the whole account; each gets an equal share of its buying power
+    portfolio = Portfolio(api, [tuple(pair) for pair in config['pairs']], name=f"portfolio-shard{shard_id}",
+                          risk_share=1.0 / config['n_shards'], **config['portfolio'])
+    if config.get('refresh') or not portfolio.restore():
+        portfolio.fit(portfolio.load_history(config['start'], config['end'], config['timeframe'])).save()
+    reports.put({'type': 'ready', 'shard': shard_id, 'pairs': len(portfolio.pairs), 'pid': os.getpid()})
+
+    # Offline, the shard's simulator fills at the prices the coordinator published instead of its own walk
+    feed_price = getattr(api, 'set_price', None)
+    pending = {}
+    wanted = set(portfolio.symbols)
+    while True:
+        message = inbox.get()
+        if message is None:
+            break
+        received = time.perf_counter()
+        bar = pending.setdefault(message['t'], {})
+        bar.update(message['prices'])
+        if not wanted <= bar.keys():
+            continue
+        del pending[message['t']]
+        for stale in [t for t in pending if t < message['t']]:
+            del pending[stale]  # a symbol without a print for that bar never completes it
+        try:
+            if feed_price is not None:
+                for symbol, price in bar.items():
+                    feed_price(symbol, price)
+            z, actions = portfolio.on_prices(bar)
+            error = None
+        except Exception as e:
+            actions, error = [], str(e)
+            print(f"Shard {shard_id} error on bar {message['t']}: {e}")
+        reports.put({'type': 'bar', 'shard': shard_id, 't': message['t'], 'sent': message['sent'],
+                     'busy_ms': (time.perf_counter() - received) * 1000,
+                     'actions': int(sum(action != 0 for action in actions)), 'positions': _net_positions(portfolio),
+                     'prices': {symbol: bar[symbol] for symbol in wanted}, 'error': error})
+    reports.put({'type': 'stopped', 'shard': shard_id})
+
+
+def _net_positions(portfolio):
+    net = defaultdict(int)
+    for (symbol1, symbol2), (qty1, qty2) in zip(portfolio.pairs, portfolio.book.tolist()):
+        net[symbol1] += qty1
+        net[symbol2] += qty2
+    return dict(net)
+
+
+# ✅ Coordinator: owns market data, routes each symbol's price only to the shards that trade it,
+# and folds shard reports into portfolio-wide positions and exposure. It never waits on a shard,
+# so a slow shard only delays its own pairs.
+class Coordinator:
+    def __init__(self, pairs, n_shards, start_date, end_date, timeframe, host=QUEUE_HOST, port=QUEUE_PORT,
+                 authkey=QUEUE_AUTHKEY, refresh=False, **portfolio_kwargs):
+        self.shards = partition_pairs(pairs, n_shards)
+        self.authkey = authkey or os.urandom(32)
+        self.routes = route_table(self.shards)
+        self.manager = start_queue_server(host, port, self.authkey)
+        self.reports = self.manager.get_queue('reports')
+        self.inboxes = [self.manager.get_queue(f'bars:{k}') for k in range(len(self.shards))]
+        for k, shard in enumerate(self.shards):
+            self.manager.get_queue(f'config:{k}').put({
+                'pairs': shard, 'n_shards': len(self.shards), 'start': start_date, 'end': end_date,
+                'timeframe': timeframe, 'refresh': refresh, 'portfolio': portfolio_kwargs})
+        self.positions = [{} for _ in self.shards]
+        self.prices = {}
+        self.stats = [{'bars': 0, 'lag_ms': None, 'busy_ms': None, 'actions': 0, 'errors': 0}
+                      for _ in self.shards]
+        self.ready = set()
+        self._lock = threading.Lock()
+        self._reader = threading.Thread(target=self._read_reports, name='shard-reports', daemon=True)
+        self._reader.start()
+
+    # Local worker processes; on other machines run `python shard.py worker --shard k --host ...` instead
+    def spawn_local(self, api_factory=live_api):
+        host, port = self.manager.address
+        self.processes = [multiprocessing.Process(target=run_shard, name=f'shard-{k}', daemon=True,
+                                                  args=(k, host, port, self.authkey, api_factory))
+                          for k in range(len(self.shards))]
+        for process in self.processes:
+            process.start()
+        return self.processes
+
+    def wait_ready(self, timeout=120.0):
+        deadline = time.monotonic() + timeout
+        while len(self.ready) < len(self.shards) and time.monotonic() < deadline:
+            time.sleep(0.05)
+        return len(self.ready) == len(self.shards)
+
+    # ✅ Route one bar: {symbol: price} for any subset of symbols, stamped with the bar time
+    def publish(self, timestamp, prices):
+        per_shard = defaultdict(dict)
+        for symbol, price in prices.items():
+            for k in self.routes.get(symbol, ()):
+                per_shard[k][symbol] = price
+        sent = time.time()
+        for k, shard_prices in per_shard.items():
+            self.inboxes[k].put({'t': timestamp, 'prices': shard_prices, 'sent': sent})
+
+    # Polled mode: one bulk latest-trades call for every symbol of every shard
+    def cycle(self, api):
+        trades = api.get_latest_trades(list(self.routes))
+        self.publish(time.time(), {symbol: float(trade.price) for symbol, trade in trades.items()})
+
+    def _read_reports(self):
+        while True:
+            try:
+                report = self.reports.get()
+            except (EOFError, OSError):
+                return  # queue server shut down
+            k = report['shard']
+            with self._lock:
+                if report['type'] == 'ready':
+                    self.ready.add(k)
+                elif report['type'] == 'bar':
+                    stats = self.stats[k]
+                    stats['bars'] += 1
+                    stats['lag_ms'] = (time.time() - report['sent']) * 1000
+                    stats['busy_ms'] = report['busy_ms']
+                    stats['actions'] += report['actions']
+                    stats['errors'] += report['error'] is not None
+                    self.positions[k] = report['positions']
+                    self.prices.update(report['prices'])
+
+    # ✅ Portfolio-wide view: net quantity per symbol across shards, gross/net exposure at last prices
+    def risk(self):
+        with self._lock:
+            net = defaultdict(int)
+            for positions in self.positions:
+                for symbol, qty in positions.items():
+                    net[symbol] += qty
+            exposure = {symbol: qty * self.prices.get(symbol, 0.0) for symbol, qty in net.items() if qty}
+            return {'positions': {symbol: qty for symbol, qty in net.items() if qty},
+                    'gross_exposure': sum(map(abs, exposure.values())), 'net_exposure': sum(exposure.values()),
+                    'shards': [dict(stats) for stats in self.stats]}
+
+    def stop(self):
+        for inbox in self.inboxes:
+            inbox.put(None)
+        for process in getattr(self, 'processes', []):
+            process.join(timeout=10)
+        self.manager.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run pair strategies sharded across processes or machines")
+    sub = parser.add_subparsers(dest='role', required=True)
+    coordinator = sub.add_parser('coordinator')
+    coordinator.add_argument('pairs', nargs='*', help="pairs as SYMBOL1/SYMBOL2")
+    coordinator.add_argument('--file', help="one pair per line")
+    coordinator.add_argument('--shards', type=int, default=os.cpu_count())
+    coordinator.add_argument('--remote', action='store_true', help="don't spawn workers, wait for remote ones")
+    coordinator.add_argument('--start', default='2024-01-01')
+    coordinator.add_argument('--end', default='2024-04-24')
+    coordinator.add_argument('--every', type=float, default=60.0, help="seconds between cycles")
+    coordinator.add_argument('--sim', action='store_true', help="offline: every process uses SimBroker")
+    coordinator.add_argument('--refresh', action='store_true')
+    worker = sub.add_parser('worker')
+    worker.add_argument('--shard', type=int, required=True)
+    worker.add_argument('--host', default=QUEUE_HOST)
+    worker.add_argument('--port', type=int, default=QUEUE_PORT)
+    worker.add_argument('--sim', action='store_true')
+    args = parser.parse_args()
+
+    if QUEUE_AUTHKEY is None and (args.role == 'worker' or args.remote):
+        parser.error("set SHARD_QUEUE_AUTHKEY to a shared secret to run workers over the network")
+    if args.role == 'worker':
+        run_shard(args.shard, args.host, args.port, QUEUE_AUTHKEY, sim_api if args.sim else live_api)
+    else:
+        pairs = parse_pairs(args.pairs)
+        if args.file:
+            with open(args.file) as file:
+                pairs += parse_pairs(line.strip() for line in file if line.strip())
+        api_factory = sim_api if args.sim else live_api
+        host = '0.0.0.0' if args.remote else QUEUE_HOST
+        coord = Coordinator(pairs, args.shards, args.start, args.end, '1Day', host=host, refresh=args.refresh)
+        print(f"{len(pairs)} pairs in {len(coord.shards)} shards, {len(coord.routes)} symbols")
+        if not args.remote:
+            coord.spawn_local(api_factory)
+        coord.wait_ready(timeout=float('inf') if args.remote else 120.0)
+        market = api_factory(len(coord.shards))
+        try:
+            while True:
+                started = time.monotonic()
+                if args.sim:
+                    market.tick()  # the simulated market moves one step per cycle, the shards follow its prints
+                coord.cycle(market)
+                time.sleep(max(0.0, args.every - (time.monotonic() - started)))
+                print(f"Risk: {coord.risk()}")
+        except KeyboardInterrupt:
+            print("\nStopping shards...")
+        coord.stop()
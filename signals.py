@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+
+# ✅ Default Z-Score thresholds
+ENTRY_Z = 2.0
+EXIT_Z = 0.5
+
+# ✅ Compact signal codes (int8) and the labels the bots print/plot
+HOLD, LONG, SHORT, EXIT = 0, 1, 2, 3
+SIGNAL_NAMES = np.array(["Hold", "Long", "Short", "Exit"], dtype=object)
+
+# ✅ Position transitions produced by the state machine
+OPEN_LONG, OPEN_SHORT, CLOSE = 1, -1, 2
+
+
+# ✅ Long/Short/Exit/Hold for a whole Z-Score column at once (NaN -> Hold, like the row version)
+def signal_codes(z, entry_z=ENTRY_Z, exit_z=EXIT_Z):
+    z = np.asarray(z, dtype=np.float64)
+    codes = np.zeros(len(z), dtype=np.int8)
+    codes[np.abs(z) <= exit_z] = EXIT
+    codes[z < -entry_z] = LONG
+    codes[z > entry_z] = SHORT
+    return codes
+
+
+def generate_signals_vectorized(z, entry_z=ENTRY_Z, exit_z=EXIT_Z):
+    codes = signal_codes(z, entry_z, exit_z)
+    labels = SIGNAL_NAMES[codes]
+    if isinstance(z, pd.Series):
+        return pd.Series(labels, index=z.index, name='Signal')
+    return labels
+
+
+def _forward_fill_index(mask):
+    idx = np.where(mask, np.arange(len(mask)), -1)
+    return np.maximum.accumulate(idx) if len(idx) else idx
+
+
+# ✅ Same open/close state machine as execute_trades, in one vectorized pass
+# Returns (position, action): position is +1 long spread / -1 short spread / 0 flat after each row,
+# action is OPEN_LONG / OPEN_SHORT / CLOSE on rows where execute_trades would send orders, else 0.
+def position_states(codes, start_open=0):
+    codes = np.asarray(codes)
+    n = len(codes)
+    if n == 0:
+        return np.zeros(0, dtype=np.int8), np.zeros(0, dtype=np.int8)
+
+    # Entries while open and exits while flat are no-ops, so "open" only depends on the last event
+    event = codes != HOLD
+    last_event = _forward_fill_index(event)
+    is_open = np.zeros(n, dtype=bool)
+    seen = last_event >= 0
+    is_open[seen] = codes[last_event[seen]] != EXIT
+    if start_open:
+        is_open[~seen] = True
+
+    was_open = np.empty(n, dtype=bool)
+    was_open[0] = bool(start_open)
+    was_open[1:] = is_open[:-1]
+
+    opened = is_open & ~was_open
+    closed = ~is_open & was_open
+
+    # Direction of an open position is fixed by the row that opened it
+    direction = np.where(codes == LONG, 1, -1).astype(np.int8)
+    last_open = _forward_fill_index(opened)
+    position = np.zeros(n, dtype=np.int8)
+    held = is_open & (last_open >= 0)
+    position[held] = direction[last_open[held]]
+    if start_open:
+        position[is_open & (last_open < 0)] = start_open
+
+    action = np.zeros(n, dtype=np.int8)
+    action[opened] = direction[opened]
+    action[closed] = CLOSE
+    return position, action
+
+
+# ✅ Rows of df where execute_trades has to act, as (index, action) pairs
+def trade_actions(df, entry_z=ENTRY_Z, exit_z=EXIT_Z, start_open=0):
+    codes = signal_codes(df['Z-Score'].to_numpy(), entry_z, exit_z)
+    _, action = position_states(codes, start_open)
+    rows = np.flatnonzero(action)
+    return list(zip(df.index[rows], action[rows]))
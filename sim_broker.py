@@ -0,0 +1,362 @@
+import itertools
+import random
+import threading
+import time
+import zlib
+from collections import Counter
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+
+def _utc(value):
+    ts = pd.Timestamp(value)
+    return ts.tz_convert('UTC') if ts.tzinfo else ts.tz_localize('UTC')
+
+
+def _bar_width(timeframe):
+    name = str(timeframe)
+    if 'Day' in name:
+        return pd.Timedelta('1D')
+    return pd.Timedelta('1s') if 'Sec' in name else pd.Timedelta('1min')
+
+
+WORKING = ('new', 'accepted', 'partially_filled', 'held', 'pending_cancel')
+
+
+class SimAPIError(Exception):
+    def __init__(self, message, status_code=404):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+# ✅ In-process stand-in for the Alpaca REST client: same method names and entity attributes the bots use
+# latency_ms/jitter_ms are slept on every call (so concurrent calls overlap like real round trips);
+# fill is 'immediate' (marketable limits and market orders fill on submit), 'never', or a fill probability.
+# cancel_delay_ms > 0 makes cancels asynchronous like Alpaca's: pending_cancel first, canceled after the delay.
+class SimBroker:
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, fill='immediate', start_price=100.0, volatility=0.002,
+                 equity=100_000.0, seed=0, cancel_delay_ms=0.0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.fill = fill
+        self.start_price = start_price
+        self.volatility = volatility
+        self.equity = equity
+        self.cancel_delay_ms = cancel_delay_ms
+        self.calls = Counter()
+        self.orders = {}
+        self.positions = {}
+        self.prices = {}
+        self._ids = itertools.count(1)
+        self._rng = random.Random(seed)
+        self._lock = threading.RLock()
+        self._listeners = []
+
+    # ✅ Plumbing: latency, call counting, prices
+    def _call(self, name):
+        with self._lock:
+            self.calls[name] += 1
+        if self.latency_ms or self.jitter_ms:
+            time.sleep(max(0.0, self.latency_ms + self._rng.uniform(-self.jitter_ms, self.jitter_ms)) / 1000)
+
+    @property
+    def rest_calls(self):
+        return sum(self.calls.values())
+
+    def reset_calls(self):
+        self.calls.clear()
+
+    def price(self, symbol):
+        with self._lock:
+            if symbol not in self.prices:
+                self.prices[symbol] = self.start_price * (1 + (zlib.crc32(symbol.encode()) % 1000) / 1000)
+            return self.prices[symbol]
+
+    def set_price(self, symbol, price):
+        with self._lock:
+            self.prices[symbol] = float(price)
+            self._mark(symbol)
+
+    # Advance every known symbol one random-walk step
+    def tick(self):
+        with self._lock:
+            for symbol in list(self.prices):
+                self.prices[symbol] *= 1 + self._rng.gauss(0, self.volatility)
+                self._mark(symbol)
+
+    def subscribe(self, listener):
+        self._listeners.append(listener)
+
+    def _emit(self, event, order):
+        for listener in list(self._listeners):
+            listener(event, order)
+
+    # ✅ Market data
+    def get_bars(self, symbol, timeframe, start=None, end=None, limit=None, **kwargs):
+        self._call('get_bars')
+        freq = '1D' if 'Day' in str(timeframe) else '1min'
+        end_ts = pd.Timestamp(end, tz='UTC') if end else pd.Timestamp.now(tz='UTC').floor(freq)
+        start_ts = pd.Timestamp(start, tz='UTC') if start else end_ts - pd.Timedelta(freq) * ((limit or 1) - 1)
+        index = pd.date_range(start_ts, end_ts, freq=freq)
+        if limit:
+            index = index[-limit:]
+        rng = np.random.default_rng(zlib.crc32(symbol.encode()))
+        path = np.cumsum(rng.normal(0, self.volatility, len(index)))
+        close = self.price(symbol) * np.exp(path - path[-1]) if len(index) else np.zeros(0)
+        df = pd.DataFrame({'open': close, 'high': close, 'low': close, 'close': close,
+                           'volume': np.full(len(index), 1000.0)}, index=index)
+        df.index.name = 'timestamp'
+        return SimpleNamespace(df=df)
+
+    # Paged like the v2 data API: one call per 10k-bar page, raw dicts, nothing held beyond a page
+    def get_bars_iter(self, symbol, timeframe, start=None, end=None, raw=True, page_limit=10_000, **kwargs):
+        freq = _bar_width(timeframe)
+        start_ts, end_ts = _utc(start), _utc(end)
+        first = start_ts.ceil(freq)
+        total = max(0, (end_ts - first) // freq + 1)
+        rng = np.random.default_rng(zlib.crc32(symbol.encode()))
+        level = self.price(symbol)
+        for offset in range(0, total, page_limit):
+            self._call('get_bars')
+            n = min(page_limit, total - offset)
+            stamps = np.char.add(np.datetime_as_string(
+                pd.date_range(first + offset * freq, periods=n, freq=freq).tz_localize(None).to_numpy(), unit='s'), 'Z')
+            close = level * np.exp(np.cumsum(rng.normal(0, self.volatility, n)))
+            level = close[-1]
+            volume = rng.integers(100, 10_000, n)
+            for t, c, v in zip(stamps.tolist(), close.tolist(), volume.tolist()):
+                yield {'t': t, 'o': c, 'h': c, 'l': c, 'c': c, 'v': v, 'n': 1, 'vw': c}
+
+    # One print per second, shaped like the v2 trades endpoint
+    def get_trades_iter(self, symbol, start=None, end=None, raw=True, page_limit=10_000, **kwargs):
+        for bar in self.get_bars_iter(symbol, '1Sec', start, end, raw, page_limit):
+            yield {'t': bar['t'], 'p': bar['c'], 's': bar['v'] % 100 + 1}
+
+    def get_latest_trade(self, symbol):
+        self._call('get_latest_trade')
+        return SimpleNamespace(symbol=symbol, price=self.price(symbol))
+
+    def get_latest_trades(self, symbols):
+        self._call('get_latest_trades')
+        return {symbol: SimpleNamespace(symbol=symbol, price=self.price(symbol)) for symbol in symbols}
+
+    def get_calendar(self, start=None, end=None):
+        self._call('get_calendar')
+        return [SimpleNamespace(date=d, open='09:30', close='16:00') for d in pd.bdate_range(start, end)]
+
+    # ✅ Account / positions
+    def get_account(self):
+        self._call('get_account')
+        with self._lock:
+            exposure = sum(abs(float(p.market_value)) for p in self.positions.values())
+            return SimpleNamespace(equity=str(self.equity), buying_power=str(max(0.0, 2 * self.equity - exposure)),
+                                   status='ACTIVE')
+
+    def list_positions(self):
+        self._call('list_positions')
+        with self._lock:
+            return list(self.positions.values())
+
+    def get_position(self, symbol):
+        self._call('get_position')
+        with self._lock:
+            if symbol not in self.positions:
+                raise SimAPIError('position does not exist')
+            return self.positions[symbol]
+
+    def close_position(self, symbol):
+        self._call('close_position')
+        with self._lock:
+            position = self.positions.get(symbol)
+            if position is None:
+                raise SimAPIError('position does not exist')
+            qty = float(position.qty)
+            side = 'sell' if qty > 0 else 'buy'
+            self._check_available(symbol, abs(qty), side)
+            return self._new_order(symbol, abs(qty), side, 'market', 'day')
+
+    # Like Alpaca: an order against the position can't exceed what working orders on that side leave
+    # available (bracket TP/SL legs hold it until they are cancelled), and can't flip it through zero
+    def _check_available(self, symbol, qty, side):
+        position = self.positions.get(symbol)
+        held = float(position.qty) if position is not None else 0.0
+        if held == 0 or (held > 0) == (side == 'buy'):
+            return
+        committed = sum(float(o.qty) - float(o.filled_qty) for o in self.orders.values()
+                        if o.symbol == symbol and o.side == side and o.status in WORKING)
+        available = abs(held) - committed
+        if qty > available:
+            raise SimAPIError(f'insufficient qty available for order (requested: {qty:g}, available: '
+                              f'{max(0.0, available):g})', status_code=403)
+
+    def close_all_positions(self):
+        self._call('close_all_positions')
+        with self._lock:
+            return [self._new_order(s, abs(float(p.qty)), 'sell' if float(p.qty) > 0 else 'buy', 'market', 'day')
+                    for s, p in list(self.positions.items())]
+
+    # ✅ Orders
+    def submit_order(self, symbol, qty, side, type='market', time_in_force='day', limit_price=None,
+                     stop_price=None, client_order_id=None, order_class=None, take_profit=None, stop_loss=None,
+                     **kwargs):
+        self._call('submit_order')
+        with self._lock:
+            if client_order_id and any(o.client_order_id == client_order_id for o in self.orders.values()):
+                raise SimAPIError('client_order_id must be unique', status_code=422)
+            if order_class == 'oco' and limit_price is None:
+                limit_price = take_profit['limit_price']  # the parent is the take-profit limit
+            if order_class != 'oco':  # an OCO's legs share the quantity it protects
+                self._check_available(symbol, float(qty), side)
+            return self._new_order(symbol, float(qty), side, type, time_in_force, limit_price, stop_price,
+                                   client_order_id, order_class, take_profit, stop_loss)
+
+    def get_order(self, order_id):
+        self._call('get_order')
+        with self._lock:
+            if order_id not in self.orders:
+                raise SimAPIError('order not found')
+            return self.orders[order_id]
+
+    def get_order_by_client_order_id(self, client_order_id):
+        self._call('get_order_by_client_order_id')
+        with self._lock:
+            for order in self.orders.values():
+                if order.client_order_id == client_order_id:
+                    return order
+        raise SimAPIError('order not found')
+
+    # Newest first by default and paged with until= (exclusive submission time), like the v2 orders endpoint
+    def list_orders(self, status='open', limit=50, symbols=None, until=None, direction='desc', **kwargs):
+        self._call('list_orders')
+        with self._lock:
+            orders = list(self.orders.values())
+        if until is not None:
+            orders = [o for o in orders if pd.Timestamp(o.submitted_at) < _utc(until)]
+        if symbols:
+            wanted = set([symbols] if isinstance(symbols, str) else symbols)
+            orders = [o for o in orders if o.symbol in wanted]
+        if status == 'open':
+            orders = [o for o in orders if o.status in WORKING]
+        elif status == 'closed':
+            orders = [o for o in orders if o.status not in WORKING]
+        elif status not in (None, 'all'):
+            orders = [o for o in orders if o.status == status]
+        if direction == 'desc':
+            orders = orders[::-1]
+        return orders[:limit] if limit else orders
+
+    def cancel_order(self, order_id):
+        self._call('cancel_order')
+        with self._lock:
+            order = self.orders.get(order_id)
+            if order is None:
+                raise SimAPIError('order not found')
+            if order.status in ('filled', 'canceled', 'pending_cancel'):
+                raise SimAPIError('order is not cancelable', status_code=422)
+            if not self.cancel_delay_ms:
+                self._set_status(order, 'canceled')
+                return
+            self._set_status(order, 'pending_cancel')
+        timer = threading.Timer(self.cancel_delay_ms / 1000, self._finish_cancel, args=(order,))
+        timer.daemon = True
+        timer.start()
+
+    def _finish_cancel(self, order):
+        with self._lock:
+            if order.status == 'pending_cancel':
+                self._set_status(order, 'canceled')
+
+    def cancel_all_orders(self):
+        self._call('cancel_all_orders')
+        with self._lock:
+            for order in list(self.orders.values()):
+                if order.status in WORKING:
+                    self._set_status(order, 'canceled')
+
+    # ✅ Matching
+    def _new_order(self, symbol, qty, side, type, time_in_force, limit_price=None, stop_price=None,
+                   client_order_id=None, order_class=None, take_profit=None, stop_loss=None, status='new'):
+        order_id = f"sim-{next(self._ids)}"
+        now = pd.Timestamp.now(tz='UTC').isoformat()
+        order = SimpleNamespace(
+            id=order_id, client_order_id=client_order_id or order_id, symbol=symbol, qty=str(qty),
+            side=side, type=type, time_in_force=time_in_force, limit_price=limit_price, stop_price=stop_price,
+            order_class=order_class, status=status, filled_qty='0', filled_avg_price=None,
+            created_at=now, submitted_at=now, legs=[])
+        self.orders[order_id] = order
+        self._emit('new', order)
+        if order_class == 'bracket':
+            exit_side = 'sell' if side == 'buy' else 'buy'
+            order.legs = [
+                self._new_order(symbol, qty, exit_side, 'limit', time_in_force, limit_price=take_profit['limit_price'],
+                                status='held'),
+                self._new_order(symbol, qty, exit_side, 'stop', time_in_force, stop_price=stop_loss['stop_price'],
+                                status='held'),
+            ]
+        elif order_class == 'oco':
+            order.legs = [self._new_order(symbol, qty, side, 'stop', time_in_force, stop_price=stop_loss['stop_price'])]
+        if status == 'new' and self._should_fill(order):
+            self._fill(order, self.price(symbol))
+        return order
+
+    def _should_fill(self, order):
+        if self.fill == 'never':
+            return False
+        if order.type == 'limit':
+            price = self.price(order.symbol)
+            marketable = price <= float(order.limit_price) if order.side == 'buy' else price >= float(order.limit_price)
+            if not marketable:
+                return False
+        elif order.type != 'market':
+            return False
+        return self.fill == 'immediate' or self._rng.random() < float(self.fill)
+
+    def _set_status(self, order, status):
+        order.status = status
+        self._emit(status, order)
+        if status == 'canceled':
+            for leg in order.legs:
+                if leg.status in ('new', 'held', 'pending_cancel'):
+                    self._set_status(leg, 'canceled')
+
+    def _fill(self, order, price):
+        qty = float(order.qty)
+        signed = qty if order.side == 'buy' else -qty
+        position = self.positions.get(order.symbol)
+        held = float(position.qty) if position else 0.0
+        new_qty = held + signed
+        if held == 0 or (new_qty != 0 and (new_qty > 0) != (held > 0)):
+            avg = price  # opened or flipped
+        elif (held > 0) == (signed > 0):
+            avg = (float(position.avg_entry_price) * abs(held) + price * qty) / abs(new_qty)
+        else:
+            avg = float(position.avg_entry_price)  # reduced
+        if new_qty == 0:
+            self.positions.pop(order.symbol, None)
+        else:
+            self.positions[order.symbol] = SimpleNamespace(symbol=order.symbol, qty=str(new_qty),
+                                                           side='long' if new_qty > 0 else 'short',
+                                                           avg_entry_price=str(avg))
+            self._mark(order.symbol)
+        order.filled_qty = order.qty
+        order.filled_avg_price = str(price)
+        self._set_status(order, 'filled')
+        for leg in order.legs:
+            if leg.status == 'held':
+                self._set_status(leg, 'new')
+            elif order.order_class == 'oco' and leg.status == 'new':
+                self._set_status(leg, 'canceled')  # one filled, the other is cancelled
+
+    def _mark(self, symbol):
+        position = self.positions.get(symbol)
+        if position is None:
+            return
+        price = self.prices.get(symbol, self.start_price)
+        qty = float(position.qty)
+        avg = float(position.avg_entry_price)
+        position.current_price = str(price)
+        position.market_value = str(qty * price)
+        position.unrealized_pl = str(qty * (price - avg))
+        position.unrealized_plpc = str((price - avg) / avg * (1 if qty > 0 else -1))
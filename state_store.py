@@ -0,0 +1,157 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+# ✅ Durable strategy state: one SQLite file in WAL mode
+# strategies: per-strategy checkpoint (position, last processed bar, hedge ratio, estimator state)
+# orders: every order we sent with its deterministic client order ID, until it reaches a terminal status
+# Orders are recorded as they are sent and the checkpoint follows; a crash in between re-runs the bar on restart,
+# and the deterministic IDs turn its resubmission into a lookup of the orders already sent.
+STATE_DB = os.getenv("STATE_DB", "state.db")
+TERMINAL = ('filled', 'canceled', 'expired', 'rejected', 'replaced', 'done_for_day')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS strategies (
+    name TEXT PRIMARY KEY,
+    position INTEGER NOT NULL DEFAULT 0,
+    last_bar TEXT,
+    hedge_ratio REAL,
+    settings TEXT,
+    state TEXT,
+    updated_at REAL
+);
+CREATE TABLE IF NOT EXISTS orders (
+    client_order_id TEXT PRIMARY KEY,
+    strategy TEXT NOT NULL,
+    bar TEXT,
+    symbol TEXT,
+    side TEXT,
+    qty REAL,
+    order_id TEXT,
+    status TEXT,
+    created_at REAL,
+    updated_at REAL
+);
+CREATE INDEX IF NOT EXISTS orders_open ON orders (strategy, status);
+"""
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _dumps(value):
+    return None if value is None else json.dumps(value, default=_json_default, allow_nan=True)
+
+
+def _bar_label(bar):
+    return None if bar is None else str(bar)
+
+
+class StateStore:
+    def __init__(self, path=STATE_DB):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Autocommit mode; transactions are explicit BEGIN/COMMIT below
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        # NORMAL in WAL mode: a commit survives a process crash, only an OS crash can lose the last few
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    # ✅ Last checkpoint of a strategy, or None when missing or written with different settings
+    def load(self, name, settings=None):
+        with self._lock:
+            row = self.conn.execute('SELECT * FROM strategies WHERE name = ?', (name,)).fetchone()
+        if row is None:
+            return None
+        if settings is not None and row['settings'] != _dumps(settings):
+            return None
+        return {'name': row['name'], 'position': row['position'], 'last_bar': row['last_bar'],
+                'hedge_ratio': row['hedge_ratio'], 'state': json.loads(row['state']) if row['state'] else None,
+                'updated_at': row['updated_at']}
+
+    # ✅ Checkpoint after a bar: position, the bar it was taken at, hedge ratio and estimator state
+    def checkpoint(self, name, position, last_bar, hedge_ratio=None, state=None, settings=None):
+        with self._lock:
+            self.conn.execute(
+                'INSERT INTO strategies (name, position, last_bar, hedge_ratio, settings, state, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (name) DO UPDATE SET position = excluded.position, '
+                'last_bar = excluded.last_bar, hedge_ratio = excluded.hedge_ratio, '
+                'settings = COALESCE(excluded.settings, strategies.settings), '
+                'state = COALESCE(excluded.state, strategies.state), updated_at = excluded.updated_at',
+                (name, int(position), _bar_label(last_bar), None if hedge_ratio is None else float(hedge_ratio),
+                 _dumps(settings), _dumps(state), time.time()))
+
+    # Orders are submit_leg results (or dicts with the same keys) plus the bar they belong to
+    def record_orders(self, name, orders):
+        with self._lock:
+            self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                self._upsert_orders(name, orders, time.time())
+                self.conn.execute('COMMIT')
+            except BaseException:
+                self.conn.execute('ROLLBACK')
+                raise
+
+    def _upsert_orders(self, name, orders, now):
+        rows = []
+        for order in orders:
+            if not order.get('client_order_id'):
+                continue
+            status = order.get('status') or ('new' if order.get('order_id') else 'pending')
+            rows.append((order['client_order_id'], name, _bar_label(order.get('bar')), order.get('symbol'),
+                         order.get('side'), order.get('qty'), order.get('order_id'), status, now, now))
+        if rows:
+            self.conn.executemany(
+                'INSERT INTO orders (client_order_id, strategy, bar, symbol, side, qty, order_id, status, created_at, '
+                'updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT (client_order_id) DO UPDATE SET '
+                'order_id = COALESCE(excluded.order_id, orders.order_id), status = excluded.status, '
+                'updated_at = excluded.updated_at', rows)
+
+    # ✅ Status updates (e.g. an OrderTracker listener); terminal orders stop counting as outstanding
+    def set_order_status(self, client_order_id, status, order_id=None):
+        with self._lock:
+            self.conn.execute('UPDATE orders SET status = ?, order_id = COALESCE(?, order_id), updated_at = ? '
+                              'WHERE client_order_id = ?', (status, order_id, time.time(), client_order_id))
+
+    def on_order_update(self, event, record):
+        if record.client_order_id and record.status:
+            self.set_order_status(record.client_order_id, record.status, record.order_id)
+
+    def outstanding(self, name=None):
+        placeholders = ', '.join('?' * len(TERMINAL))
+        query = f'SELECT * FROM orders WHERE status NOT IN ({placeholders})'
+        args = list(TERMINAL)
+        if name is not None:
+            query += ' AND strategy = ?'
+            args.append(name)
+        with self._lock:
+            return [dict(row) for row in self.conn.execute(query + ' ORDER BY created_at', args)]
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_state_store(path=STATE_DB):
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = StateStore(path)
+        return _store
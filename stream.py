@@ -0,0 +1,100 @@
+import asyncio
+import json
+import os
+import time
+
+DATA_STREAM_URL = os.getenv("DATA_STREAM_URL", "wss://stream.data.alpaca.markets/v2/iex")
+
+# Close reason the replay server ends with; any other close, clean or not, is reconnected
+REPLAY_DONE = 'replay finished'
+AUTH_ERRORS = (401, 402)  # not authenticated / auth failed: retrying can't help
+
+# ✅ Stream counters: bars received, pair updates evaluated, last receive-to-decision latency
+stream_stats = {'bars': 0, 'pair_updates': 0, 'reconnects': 0, 'last_latency_ms': None}
+
+
+class StreamAuthError(Exception):
+    pass
+
+
+# ✅ Joins the two legs' bars on timestamp and fires once both closes for a bar are known
+class PairBarAligner:
+    def __init__(self, pair1, pair2, on_pair_bar):
+        self.pair1 = pair1
+        self.pair2 = pair2
+        self.on_pair_bar = on_pair_bar
+        self.pending = {}
+
+    def on_bar(self, bar):
+        symbol, ts = bar['S'], bar['t']
+        if symbol not in (self.pair1, self.pair2):
+            return
+        legs = self.pending.setdefault(ts, {})
+        legs[symbol] = float(bar['c'])
+        if len(legs) < 2:
+            return
+
+        del self.pending[ts]
+        # Drop half-filled older bars, a leg without a print for that minute never completes
+        for stale in [t for t in self.pending if t < ts]:
+            del self.pending[stale]
+        self.on_pair_bar(ts, legs[self.pair1], legs[self.pair2])
+
+
+# ✅ Alpaca market data v2 websocket protocol (JSON): auth, subscribe to bars, dispatch messages
+# Runs until stop is set or a replay finishes; disconnects reconnect with backoff, a rejected key raises.
+async def stream_bars(symbols, on_bar, url=DATA_STREAM_URL, key=None, secret=None, stop=None):
+    import websockets
+    from websockets.exceptions import ConnectionClosed
+
+    key = key or os.getenv("API_KEY")
+    secret = secret or os.getenv("SECRET_KEY")
+    backoff = 1.0
+    while stop is None or not stop.is_set():
+        try:
+            async with websockets.connect(url, max_size=None) as ws:
+                await ws.recv()  # [{"T": "success", "msg": "connected"}]
+                await ws.send(json.dumps({'action': 'auth', 'key': key, 'secret': secret}))
+                reply = json.loads(await ws.recv())
+                if reply and reply[0].get('T') == 'error':
+                    if reply[0].get('code') in AUTH_ERRORS:
+                        raise StreamAuthError(f"Stream auth failed: {reply[0].get('msg')}")
+                    raise ConnectionError(f"Stream refused: {reply[0].get('msg')}")
+                await ws.send(json.dumps({'action': 'subscribe', 'bars': list(symbols)}))
+                backoff = 1.0
+                print(f"Streaming bars for {', '.join(symbols)} from {url}")
+
+                async for raw in ws:
+                    received = time.perf_counter()
+                    for message in json.loads(raw):
+                        if message.get('T') == 'b':
+                            stream_stats['bars'] += 1
+                            on_bar(message)
+                    stream_stats['last_latency_ms'] = (time.perf_counter() - received) * 1000
+                    if stop is not None and stop.is_set():
+                        return
+                if ws.close_reason == REPLAY_DONE:
+                    return
+                print(f"Stream closed by the server ({ws.close_code} {ws.close_reason!r}), "
+                      f"reconnecting in {backoff:.0f}s")
+        except (OSError, ConnectionError, ConnectionClosed) as e:
+            print(f"Stream error: {e}, reconnecting in {backoff:.0f}s")
+        stream_stats['reconnects'] += 1
+        await asyncio.sleep(backoff)
+        backoff = min(backoff * 2, 30.0)
+
+
+# ✅ Event-driven pair trading: every aligned bar goes straight into on_pair_bar(price1, price2)
+def run_pair_stream(pair1, pair2, on_pair_bar, url=DATA_STREAM_URL, key=None, secret=None):
+    def handle(ts, price1, price2):
+        stream_stats['pair_updates'] += 1
+        on_pair_bar(price1, price2, ts)
+
+    aligner = PairBarAligner(pair1, pair2, handle)
+    try:
+        asyncio.run(stream_bars([pair1, pair2], aligner.on_bar, url, key, secret))
+    except StreamAuthError as e:
+        print(f"{e}, check API_KEY / SECRET_KEY")
+    except KeyboardInterrupt:
+        print("\nStream stopped.")
+    return dict(stream_stats)
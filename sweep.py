@@ -0,0 +1,193 @@
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from backtest import load_pair, run_backtest
+from hedge import hedge_spread
+
+PARAMS = ['window', 'entry_z', 'exit_z', 'tp_percent', 'sl_percent']
+STATS = ['trades', 'total_pnl', 'win_rate', 'avg_trade', 'max_drawdown', 'sharpe']
+
+# Per-worker views onto the shared price arrays, plus a cache of z-scores by rolling window
+_arrays = {}
+_blocks = []
+_zscores = {}
+
+
+# ✅ Copy the arrays into shared memory once; workers map them instead of receiving pickles
+def share_arrays(arrays):
+    blocks, specs = [], {}
+    for name, values in arrays.items():
+        values = np.ascontiguousarray(values, dtype=np.float64)
+        block = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+        np.ndarray(values.shape, dtype=values.dtype, buffer=block.buf)[:] = values
+        blocks.append(block)
+        specs[name] = (block.name, values.shape)
+    return blocks, specs
+
+
+def _init_worker(specs):
+    for name, (block_name, shape) in specs.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        _blocks.append(block)
+        _arrays[name] = np.ndarray(shape, dtype=np.float64, buffer=block.buf)
+
+
+def _zscore(window):
+    if window not in _zscores:
+        spread = pd.Series(_arrays['spread'])
+        _zscores[window] = ((spread - spread.rolling(window).mean()) / spread.rolling(window).std()).to_numpy()
+    return _zscores[window]
+
+
+def _run_chunk(combos, periods_per_year):
+    rows = []
+    for window, entry_z, exit_z, tp_percent, sl_percent in combos:
+        _, _, stats = run_backtest(_arrays['price1'], _arrays['price2'], _zscore(window), _arrays['betas'],
+                                   entry_z=entry_z, exit_z=exit_z, tp_percent=tp_percent,
+                                   sl_percent=sl_percent, periods_per_year=periods_per_year)
+        rows.append((window, entry_z, exit_z, tp_percent, sl_percent) + tuple(stats[k] for k in STATS))
+    return rows
+
+
+def param_grid(windows, entry_zs, exit_zs, tp_percents, sl_percents):
+    return [combo for combo in itertools.product(windows, entry_zs, exit_zs, tp_percents, sl_percents)
+            if combo[2] < combo[1]]  # exit band must sit inside the entry band
+
+
+# ✅ What a results file was computed from: resuming is only valid for the same pair, hedge mode and prices
+def run_header(df, pair1, pair2, hedge_mode, periods_per_year):
+    digest = hashlib.sha1(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes()).hexdigest()
+    return {'pair1': pair1, 'pair2': pair2, 'hedge_mode': hedge_mode, 'periods_per_year': periods_per_year,
+            'data': digest}
+
+
+def _header_path(output):
+    return f"{output}.run.json"
+
+
+def _check_header(output, header):
+    if os.path.exists(output) and os.path.getsize(output):
+        saved = None
+        if os.path.exists(_header_path(output)):
+            with open(_header_path(output)) as file:
+                saved = json.load(file)
+        if saved != header:
+            raise ValueError(f"{output} holds results of another run ({saved}), not {header}: "
+                             f"pick another --output or delete it")
+    else:
+        with open(_header_path(output), 'w') as file:
+            json.dump(header, file)
+
+
+# A crash mid-append can leave a partial last row: cut the file back to its last complete line
+def _drop_torn_tail(output):
+    with open(output, 'rb+') as file:
+        end = file.seek(0, os.SEEK_END)
+        pos = end
+        while pos > 0:
+            step = min(4096, pos)
+            file.seek(pos - step)
+            cut = file.read(step).rfind(b'\n')
+            if cut >= 0:
+                if pos - step + cut + 1 < end:
+                    file.truncate(pos - step + cut + 1)
+                return
+            pos -= step
+        file.truncate(0)
+
+
+# ✅ Results already in the output file, so an interrupted sweep resumes where it stopped
+def _completed(output):
+    if not os.path.exists(output):
+        return set()
+    _drop_torn_tail(output)
+    if not os.path.getsize(output):
+        return set()
+    done = pd.read_csv(output, usecols=PARAMS)
+    return set(done.astype({'window': int}).itertuples(index=False, name=None))
+
+
+# ✅ Evaluate a parameter grid across all cores, appending results to a CSV as chunks finish
+def run_sweep(prices, pair1, pair2, grid, output, hedge_mode='ols', workers=None, chunk_size=50,
+              periods_per_year=252):
+    df = prices[[pair1, pair2]].astype(np.float64)
+    _check_header(output, run_header(df, pair1, pair2, hedge_mode, periods_per_year))
+    done = _completed(output)
+    todo = [combo for combo in grid if combo not in done]
+    print(f"{len(grid)} combinations, {len(grid) - len(todo)} already done, {len(todo)} to run")
+    if not todo:
+        return load_results(output)
+
+    # Chunks grouped by window so each worker computes each rolling z-score once
+    todo.sort()
+    chunks = [todo[k:k + chunk_size] for k in range(0, len(todo), chunk_size)]
+
+    spread, betas, _ = hedge_spread(df, pair1, pair2, mode=hedge_mode)
+    blocks, specs = share_arrays({'price1': df[pair1].to_numpy(), 'price2': df[pair2].to_numpy(),
+                                  'spread': spread.to_numpy(), 'betas': betas.to_numpy()})
+    write_header = not os.path.exists(output) or not os.path.getsize(output)
+    start = time.perf_counter()
+    finished = 0
+    try:
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), initializer=_init_worker,
+                                 initargs=(specs,)) as pool, open(output, 'a', newline='') as file:
+            futures = [pool.submit(_run_chunk, chunk, periods_per_year) for chunk in chunks]
+            for future in as_completed(futures):
+                rows = future.result()
+                pd.DataFrame(rows, columns=PARAMS + STATS).to_csv(file, header=write_header, index=False)
+                file.flush()
+                write_header = False
+                finished += len(rows)
+                elapsed = time.perf_counter() - start
+                eta = elapsed / finished * (len(todo) - finished)
+                print(f"\r{finished}/{len(todo)} combinations ({finished / elapsed:.1f}/s, ETA {eta:.0f}s)",
+                      end='', flush=True)
+        print()
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+    return load_results(output)
+
+
+# ✅ Ranked result table with compact dtypes
+def load_results(output, rank_by='sharpe'):
+    results = pd.read_csv(output)
+    results = results.astype({'window': np.int32, 'trades': np.int32})
+    floats = [c for c in PARAMS + STATS if results[c].dtype == np.float64]
+    results[floats] = results[floats].astype(np.float32)
+    return results.sort_values(rank_by, ascending=False).reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parallel parameter sweep for the pairs strategy")
+    parser.add_argument('pair1')
+    parser.add_argument('pair2')
+    parser.add_argument('--data', help="CSV/Parquet with a column per symbol (default: bar cache)")
+    parser.add_argument('--timeframe', default='1Day')
+    parser.add_argument('--windows', type=int, nargs='+', default=[20, 30, 45, 60])
+    parser.add_argument('--entry-z', type=float, nargs='+', default=[1.5, 2.0, 2.5])
+    parser.add_argument('--exit-z', type=float, nargs='+', default=[0.0, 0.5, 1.0])
+    parser.add_argument('--tp', type=float, nargs='+', default=[1, 2, 3])
+    parser.add_argument('--sl', type=float, nargs='+', default=[0.5, 1, 2])
+    parser.add_argument('--hedge-mode', default='ols')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--periods-per-year', type=int, default=252)
+    parser.add_argument('--output', default='sweep_results.csv')
+    parser.add_argument('--top', type=int, default=20)
+    args = parser.parse_args()
+
+    prices = load_pair(args.pair1, args.pair2, args.data, args.timeframe)
+    grid = param_grid(args.windows, args.entry_z, args.exit_z, args.tp, args.sl)
+    results = run_sweep(prices, args.pair1, args.pair2, grid, args.output, args.hedge_mode, args.workers,
+                        periods_per_year=args.periods_per_year)
+    print(results.head(args.top))
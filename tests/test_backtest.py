@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from backtest import LIMIT_OFFSET, LOT_SIZE, SL_PERCENT, TP_PERCENT, prepare, run_backtest
+from bench_signals import legacy_generate_signals
+
+
+def _prices(n, seed):
+    rng = np.random.default_rng(seed)
+    x = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    y = 1.3 * x + np.cumsum(rng.normal(0, 0.3, n))
+    return pd.DataFrame({'AAA': y, 'BBB': x}, index=pd.date_range('2020-01-01', periods=n, freq='D'))
+
+
+# ✅ Bar-by-bar reference: the execute_trades state machine, then each leg walked until TP, SL or the exit signal
+def reference_trades(price1, price2, z, betas):
+    n = len(z)
+    spans, entry = [], None
+    for t in range(n):
+        signal = legacy_generate_signals({'Z-Score': z[t]})
+        if entry is None and signal in ("Long", "Short"):
+            entry = (t, 1 if signal == "Long" else -1)
+        elif entry is not None and signal == "Exit":
+            spans.append((entry[0], t, entry[1], False))
+            entry = None
+    if entry is not None:
+        spans.append((entry[0], n - 1, entry[1], True))
+
+    trades = []
+    for start, end, direction, still_open in spans:
+        qty2 = max(int(LOT_SIZE * betas[start]), 0) if not np.isnan(betas[start]) else 0
+        pnl, reasons = 0.0, []
+        for price, side, qty in ((price1, direction, LOT_SIZE), (price2, -direction, qty2)):
+            entry_px = price[start] * (1 + side * LIMIT_OFFSET)
+            tp = entry_px * (1 + side * TP_PERCENT / 100)
+            sl = entry_px * (1 - side * SL_PERCENT / 100)
+            for t in range(start + 1, end + 1):
+                if side * (price[t] - tp) >= 0:
+                    exit_px, reason = tp, 'tp'
+                    break
+                if side * (price[t] - sl) <= 0:
+                    exit_px, reason = price[t], 'sl'
+                    break
+            else:
+                if still_open:
+                    exit_px, reason = price[end], 'open'
+                else:
+                    exit_px, reason = price[end] * (1 - side * LIMIT_OFFSET), 'signal'
+            pnl += side * qty * (exit_px - entry_px)
+            reasons.append(reason)
+        trades.append((start, 'Long' if direction > 0 else 'Short', reasons[0], reasons[1], pnl))
+    return trades
+
+
+@pytest.mark.parametrize('hedge_mode', ['ols', 'recursive'])
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_backtest_matches_the_reference_loop(hedge_mode, seed):
+    prices = _prices(1500, seed)
+    price1, price2, z, betas = prepare(prices, 'AAA', 'BBB', hedge_mode=hedge_mode)
+    equity, trades, stats = run_backtest(price1, price2, z, betas, prices.index)
+    expected = reference_trades(price1, price2, z, betas)
+
+    assert len(trades) == len(expected) > 0
+    assert list(trades['entry_time']) == [prices.index[start] for start, *_ in expected]
+    assert list(trades['direction']) == [direction for _, direction, *_ in expected]
+    assert list(trades['reason1']) == [reason for _, _, reason, _, _ in expected]
+    assert list(trades['reason2']) == [reason for *_, reason, _ in expected]
+    assert trades['pnl'].to_numpy() == pytest.approx([pnl for *_, pnl in expected])
+    assert equity.iloc[-1] == pytest.approx(100_000.0 + sum(pnl for *_, pnl in expected))
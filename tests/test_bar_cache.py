@@ -0,0 +1,55 @@
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+
+import bar_cache
+
+
+class DailyApi:
+    def __init__(self):
+        self.close = 1.0
+        self.calls = []
+
+    def get_bars(self, symbol, timeframe, start=None, end=None):
+        self.calls.append((pd.Timestamp(start), pd.Timestamp(end)))
+        index = pd.date_range(pd.Timestamp(start).ceil('D'), end, freq='D')
+        if not len(index):
+            return SimpleNamespace(df=pd.DataFrame())
+        return SimpleNamespace(df=pd.DataFrame({col: self.close for col in bar_cache.COLUMNS}, index=index))
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(monkeypatch, tmp_path):
+    monkeypatch.setattr(bar_cache, 'CACHE_DIR', str(tmp_path))
+
+
+def test_empty_fetch_on_a_miss_writes_nothing():
+    api = DailyApi()
+    bars = bar_cache.get_bars_cached(api, 'AAA', '1Day', '2024-01-06T01:00', '2024-01-06T12:00')
+    assert bars.empty
+    assert bar_cache.load_bars('AAA', '1Day') == (None, None)
+
+
+def test_forming_bar_is_fetched_again():
+    api = DailyApi()
+    now = pd.Timestamp.now(tz='UTC')
+    bar_cache.get_bars_cached(api, 'AAA', '1Day', now - pd.Timedelta(days=5), now)
+    _, covered = bar_cache.load_bars('AAA', '1Day')
+    assert covered[1] < now.normalize()
+
+    api.close = 2.0
+    bars = bar_cache.get_bars_cached(api, 'AAA', '1Day', now - pd.Timedelta(days=5), pd.Timestamp.now(tz='UTC'))
+    assert api.calls[-1][0] < now.normalize()
+    assert bars['close'].iloc[-1] == 2.0  # today's bar, refreshed
+    assert (bars['close'].iloc[:-1] == 1.0).all()
+
+
+def test_saves_replace_every_column_together():
+    index = pd.date_range('2024-01-01', periods=5, freq='D', tz='UTC')
+    for value in (1.0, 2.0):
+        frame = pd.DataFrame({col: value for col in bar_cache.COLUMNS}, index=index)
+        bar_cache.save_bars('AAA', '1Day', frame, (index[0], index[-1]))
+    bars, covered = bar_cache.load_bars('AAA', '1Day')
+    assert (bars.to_numpy() == 2.0).all()
+    assert covered == (index[0], index[-1])
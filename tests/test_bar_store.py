@@ -0,0 +1,90 @@
+import json
+import os
+
+import pandas as pd
+
+from bar_store import _store_path, ingest_bars, load_bars
+from sim_broker import SimBroker
+
+
+def _bars(directory):
+    return load_bars('AAA', '1Min', columns=('close',), directory=str(directory))
+
+
+def _meta(directory):
+    with open(os.path.join(_store_path('AAA', '1Min', str(directory)), 'meta.json')) as file:
+        return json.load(file)
+
+
+def _assert_contiguous(df, start, end):
+    assert df.index[0] == pd.Timestamp(start, tz='UTC')
+    assert df.index[-1] == pd.Timestamp(end, tz='UTC')
+    assert (df.index.to_series().diff().dropna() == pd.Timedelta('1min')).all()
+
+
+def test_late_start_is_fetched_from_the_end_of_the_store(tmp_path):
+    sim = SimBroker()
+    ingest_bars(sim, 'AAA', '1Min', '2024-01-01', '2024-01-02', directory=str(tmp_path))
+    ingest_bars(sim, 'AAA', '1Min', '2024-01-05', '2024-01-06', directory=str(tmp_path))
+    _assert_contiguous(_bars(tmp_path), '2024-01-01', '2024-01-06')
+    assert _meta(tmp_path)['ranges'] == [['2024-01-01T00:00:00+00:00', '2024-01-06T00:00:00+00:00']]
+
+
+def test_covered_request_makes_no_call(tmp_path):
+    sim = SimBroker()
+    ingest_bars(sim, 'AAA', '1Min', '2024-01-01', '2024-01-03', directory=str(tmp_path))
+    sim.reset_calls()
+    assert ingest_bars(sim, 'AAA', '1Min', '2024-01-01T12:00', '2024-01-02', directory=str(tmp_path)) == 0
+    assert sim.rest_calls == 0
+
+
+def test_gap_inside_the_covered_ranges_is_backfilled(tmp_path):
+    sim = SimBroker()
+    ingest_bars(sim, 'AAA', '1Min', '2024-01-01', '2024-01-02', directory=str(tmp_path))
+    # A store with a hole, as left behind by an ingest that clamped a late start
+    path = _store_path('AAA', '1Min', str(tmp_path))
+    meta = _meta(tmp_path)
+    meta['ranges'] = [['2024-01-01T00:00:00+00:00', '2024-01-01T06:00:00+00:00'],
+                      ['2024-01-01T18:00:00+00:00', '2024-01-02T00:00:00+00:00']]
+    with open(os.path.join(path, 'meta.json'), 'w') as file:
+        json.dump(meta, file)
+    assert ingest_bars(sim, 'AAA', '1Min', '2024-01-01T08:00', '2024-01-01T10:00', directory=str(tmp_path)) > 0
+    _assert_contiguous(_bars(tmp_path), '2024-01-01', '2024-01-02')
+    assert len(_meta(tmp_path)['ranges']) == 1
+
+
+def test_earlier_start_rebuilds_the_union(tmp_path):
+    sim = SimBroker()
+    ingest_bars(sim, 'AAA', '1Min', '2024-01-03', '2024-01-04', directory=str(tmp_path))
+    ingest_bars(sim, 'AAA', '1Min', '2024-01-01', '2024-01-02', directory=str(tmp_path))
+    _assert_contiguous(_bars(tmp_path), '2024-01-01', '2024-01-04')
+
+
+def test_store_without_ranges_is_reingested(tmp_path):
+    sim = SimBroker()
+    ingest_bars(sim, 'AAA', '1Min', '2024-01-01', '2024-01-02', directory=str(tmp_path))
+    path = _store_path('AAA', '1Min', str(tmp_path))
+    meta = _meta(tmp_path)
+    del meta['ranges']
+    with open(os.path.join(path, 'meta.json'), 'w') as file:
+        json.dump(meta, file)
+    ingest_bars(sim, 'AAA', '1Min', '2024-01-01', '2024-01-02', directory=str(tmp_path))
+    assert _meta(tmp_path)['ranges'] == [['2024-01-01T00:00:00+00:00', '2024-01-02T00:00:00+00:00']]
+    _assert_contiguous(_bars(tmp_path), '2024-01-01', '2024-01-02')
+
+
+def test_interrupted_ingest_resumes_without_a_hole(tmp_path):
+    class FlakyBroker(SimBroker):
+        def get_bars_iter(self, *args, **kwargs):
+            for i, bar in enumerate(super().get_bars_iter(*args, **kwargs)):
+                if i == 1500:
+                    raise ConnectionError('dropped')
+                yield bar
+
+    try:
+        ingest_bars(FlakyBroker(), 'AAA', '1Min', '2024-01-01', '2024-01-03', page_size=1000, directory=str(tmp_path))
+    except ConnectionError:
+        pass
+    assert len(_bars(tmp_path)) == 1000  # the committed page only
+    ingest_bars(SimBroker(), 'AAA', '1Min', '2024-01-01', '2024-01-03', directory=str(tmp_path))
+    _assert_contiguous(_bars(tmp_path), '2024-01-01', '2024-01-03')
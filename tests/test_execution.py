@@ -0,0 +1,52 @@
+import execution
+from execution import latency_summary, leg_prices, make_client_order_id, submit_leg
+from sim_broker import SimBroker
+
+
+def test_client_order_id_is_deterministic():
+    first = make_client_order_id('pairs-strategy-long-name', '2024-01-02T10:00:00+00:00', 'AAA', 'buy')
+    assert first == make_client_order_id('pairs-strategy-long-name', '2024-01-02T10:00:00+00:00', 'AAA', 'buy')
+    assert first.startswith('pairs-strategy--')
+    assert len(first) <= 48  # Alpaca's client_order_id limit
+    others = {make_client_order_id('pairs-strategy-long-name', bar, symbol, side)
+              for bar, symbol, side in [('2024-01-02T11:00:00+00:00', 'AAA', 'buy'),
+                                        ('2024-01-02T10:00:00+00:00', 'BBB', 'buy'),
+                                        ('2024-01-02T10:00:00+00:00', 'AAA', 'sell')]}
+    assert first not in others and len(others) == 3
+
+
+def test_leg_prices_bracket_the_entry():
+    assert leg_prices(100.0, 'buy') == (100.1, 102.1, 99.1)
+    assert leg_prices(100.0, 'sell') == (99.9, 97.9, 100.9)
+
+
+def test_bracket_leg_carries_take_profit_and_stop_loss():
+    sim = SimBroker(fill='never')
+    sim.set_price('AAA', 100.0)
+    result = submit_leg(sim, 'AAA', 10, 'sell', client_order_id='s-1')
+    assert result['error'] is None
+    assert (result['entry_price'], result['tp_price'], result['sl_price']) == leg_prices(100.0, 'sell')
+    order = sim.orders[result['order_id']]
+    assert (order.order_class, order.type, order.limit_price) == ('bracket', 'limit', 99.9)
+    assert order.client_order_id == 's-1'
+    take_profit, stop_loss = (sim.orders[leg_id] for leg_id in result['leg_ids'])
+    assert (take_profit.side, take_profit.type, take_profit.limit_price) == ('buy', 'limit', 97.9)
+    assert (stop_loss.side, stop_loss.type, stop_loss.stop_price) == ('buy', 'stop', 100.9)
+
+
+def test_plain_leg_has_no_exits():
+    sim = SimBroker(fill='never')
+    sim.set_price('AAA', 100.0)
+    result = submit_leg(sim, 'AAA', 10, 'buy', bracket=False)
+    assert result['tp_price'] is None and result['sl_price'] is None
+    assert sim.orders[result['order_id']].order_class is None
+    assert result['leg_ids'] == []
+
+
+def test_ack_latency_is_summarised(monkeypatch):
+    monkeypatch.setattr(execution, 'ack_latencies', execution.deque(maxlen=10))
+    assert latency_summary() == {}
+    sim = SimBroker(fill='never')
+    for k in range(3):
+        submit_leg(sim, 'AAA', 1, 'buy', bracket=False, client_order_id=f"s-{k}")
+    assert latency_summary()['count'] == 3
@@ -0,0 +1,66 @@
+import time
+
+from flatten import flatten
+from order_tracker import OrderTracker
+from sim_broker import SimBroker
+
+
+def _bracket_entries(sim, symbols):
+    # Marketable entries fill at once, their TP/SL legs then hold the whole position
+    for symbol in symbols:
+        sim.submit_order(symbol, 10, 'buy', 'limit', 'gtc', limit_price=10_000, order_class='bracket',
+                         take_profit={'limit_price': 20_000}, stop_loss={'stop_price': 1})
+
+
+def test_cancels_bracket_legs_then_closes_in_one_round():
+    sim = SimBroker()
+    _bracket_entries(sim, [f"S{i}" for i in range(20)])
+    report = flatten(sim, timeout=2.0, interval=0.01)
+    assert report['flat']
+    assert len(report['rounds']) == 1
+    assert report['rounds'][0]['closes'] == 20
+    assert report['errors'] == []
+    assert not sim.positions or all(float(p.qty) == 0 for p in sim.positions.values())
+
+
+def test_waits_for_asynchronous_cancels_before_closing():
+    sim = SimBroker(cancel_delay_ms=100)
+    _bracket_entries(sim, ['AAA', 'BBB'])
+    report = flatten(sim, timeout=2.0, interval=0.02)
+    assert report['flat']
+    assert len(report['rounds']) == 1
+    assert report['errors'] == []
+
+
+def test_only_the_given_symbols():
+    sim = SimBroker()
+    _bracket_entries(sim, ['AAA', 'BBB'])
+    report = flatten(sim, ['AAA'], timeout=2.0, interval=0.01)
+    assert report['flat']
+    assert float(sim.get_position('BBB').qty) == 10
+    assert len(sim.list_orders(symbols=['BBB'])) == 2
+
+
+def test_fill_events_confirm_the_closes():
+    sim = SimBroker()
+    tracker = OrderTracker()
+    sim.subscribe(tracker.on_update)
+    _bracket_entries(sim, ['AAA'])
+    report = flatten(sim, timeout=2.0, interval=0.01, tracker=tracker)
+    assert report['flat']
+    assert report['rounds'][0]['verify_polls'] <= 3
+
+
+def test_rounds_without_closes_do_not_wait_out_the_timeout():
+    class StuckBroker(SimBroker):
+        def close_position(self, symbol):
+            raise Exception('insufficient qty available')
+
+    sim = StuckBroker()
+    sim.submit_order('AAA', 10, 'buy', 'market')
+    started = time.monotonic()
+    report = flatten(sim, max_rounds=3, timeout=10.0)
+    assert not report['flat']
+    assert len(report['rounds']) == 3
+    assert report['leftover_positions'] == {'AAA': sim.get_position('AAA').qty}
+    assert time.monotonic() - started < 2.0
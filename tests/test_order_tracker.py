@@ -0,0 +1,116 @@
+import threading
+import time
+
+from order_tracker import OrderTracker
+
+
+# A trade_updates order payload (strings, like Alpaca sends them)
+def _order(filled_qty=0, order_id='o1', client_order_id='c1', price=None, **fields):
+    return dict(id=order_id, client_order_id=client_order_id, symbol='AAA', side='buy', qty='10',
+                filled_qty=str(filled_qty), filled_avg_price=price, **fields)
+
+
+def test_partial_fill_then_fill_fires_the_callback_once():
+    tracker = OrderTracker()
+    record = tracker.track('c1', 'AAA', 'buy', 10)
+    fills, events = [], []
+    tracker.on_fill(record, lambda filled: fills.append(filled.filled_qty))
+    tracker.add_listener(lambda event, record: events.append((event, record.status)))
+    tracker.on_update('new', _order(0))
+    tracker.on_update('partial_fill', _order(4, price='100.5'))
+    assert (record.status, record.filled_qty, record.filled_avg_price) == ('partially_filled', 4.0, 100.5)
+    assert fills == [] and not record.done.is_set()
+    tracker.on_update('fill', _order(10, price='100.25'))
+    assert (record.status, record.filled_qty) == ('filled', 10.0)
+    assert fills == [10.0] and record.done.is_set()
+    assert events == [('new', 'new'), ('partial_fill', 'partially_filled'), ('fill', 'filled')]
+    # Registered after the fill: runs at once
+    tracker.on_fill(record, lambda filled: fills.append(filled.filled_qty))
+    assert fills == [10.0, 10.0]
+
+
+def test_partially_filled_then_canceled_hands_over_what_filled():
+    tracker = OrderTracker()
+    record = tracker.track('c1', 'AAA', 'buy', 10, order_id='o1')
+    fills = []
+    tracker.on_fill(record, lambda filled: fills.append(filled.filled_qty))
+    tracker.on_update('partial_fill', _order(3))
+    tracker.on_update('pending_cancel', _order(3))
+    assert record.status == 'partially_filled'
+    tracker.on_update('canceled', _order(3))
+    assert record.status == 'canceled' and record.done.is_set()
+    assert fills == [3.0]
+
+
+def test_cancel_without_fill_drops_the_callback():
+    tracker = OrderTracker()
+    record = tracker.track('c1', 'AAA', 'buy', 10, order_id='o1')
+    fills = []
+    tracker.on_fill(record, lambda filled: fills.append(filled.filled_qty))
+    tracker.on_update('new', _order(0))
+    tracker.on_update('canceled', _order(0))
+    assert record.terminal and fills == [] and record.callbacks == []
+
+
+def test_replace_ends_the_old_order_and_tracks_the_new_one():
+    tracker = OrderTracker()
+    old = tracker.track('c1', 'AAA', 'buy', 10, order_id='o1')
+    tracker.on_update('new', _order(0))
+    tracker.on_update('pending_replace', _order(0))
+    assert old.status == 'new'
+    tracker.on_update('replaced', _order(0))
+    assert old.status == 'replaced' and old.done.is_set()
+    new = tracker.on_update('new', _order(0, order_id='o2', client_order_id='c2', replaces='o1'))
+    assert new is not old
+    assert tracker.get('o2') is new and tracker.get('o1') is old
+    tracker.on_update('fill', _order(10, order_id='o2', client_order_id='c2'))
+    assert new.status == 'filled' and old.status == 'replaced'
+
+
+def test_late_and_duplicated_events_do_not_regress_the_state():
+    tracker = OrderTracker()
+    record = tracker.track('c1', 'AAA', 'buy', 10, order_id='o1')
+    fills = []
+    tracker.on_fill(record, lambda filled: fills.append(filled.filled_qty))
+    tracker.on_update('fill', _order(10))
+    tracker.on_update('partial_fill', _order(4))
+    tracker.on_update('new', _order(0))
+    tracker.on_update('fill', _order(10))
+    assert (record.status, record.filled_qty) == ('filled', 10.0)
+    assert fills == [10.0]
+
+
+def test_event_that_beats_the_ack_is_matched_by_client_order_id():
+    tracker = OrderTracker()
+    record = tracker.track('c1', 'AAA', 'buy', 10)
+    assert tracker.on_update('fill', _order(10)) is record
+    assert tracker.get('o1') is record
+    tracker.track('c1', order_id='o1')
+    assert tracker.get('o1') is record and record.status == 'filled'
+
+
+def test_stream_message_is_unwrapped():
+    tracker = OrderTracker()
+    record = tracker.track('c1', 'AAA', 'buy', 10, order_id='o1')
+    assert tracker.handle_message({'stream': 'listening', 'data': {}}) is None
+    tracker.handle_message({'stream': 'trade_updates', 'data': {'event': 'fill', 'order': _order(10)}})
+    assert record.status == 'filled'
+
+
+def test_wait_times_out_with_the_last_known_status():
+    tracker = OrderTracker()
+    record = tracker.track('c1', 'AAA', 'buy', 10, order_id='o1')
+    tracker.on_update('new', _order(0))
+    started = time.monotonic()
+    assert tracker.wait([record], timeout=0.1) == {'o1': 'new'}
+    assert 0.1 <= time.monotonic() - started < 1.0
+
+
+def test_wait_returns_when_the_fill_arrives():
+    tracker = OrderTracker()
+    records = [tracker.track(f"c{k}", 'AAA', 'buy', 10, order_id=f"o{k}") for k in range(2)]
+    timer = threading.Timer(0.05, lambda: [tracker.on_update('fill', _order(10, f"o{k}", f"c{k}")) for k in range(2)])
+    timer.start()
+    started = time.monotonic()
+    assert tracker.wait(records, timeout=5.0) == {'o0': 'filled', 'o1': 'filled'}
+    assert time.monotonic() - started < 1.0
@@ -0,0 +1,99 @@
+import pytest
+
+from broker_state import BrokerState
+from execution import submit_legs
+from order_tracker import OrderRecord, OrderTracker
+from risk import RiskEngine
+from sim_broker import SimBroker
+
+
+@pytest.fixture
+def engine():
+    sim = SimBroker(equity=10_000, fill='never')
+    state = BrokerState(sim, ['AAA'])
+    risk = RiskEngine(sim, state, max_order_notional=0, max_position_notional=0)
+    tracker = OrderTracker()
+    tracker.add_listener(risk.on_order_update)
+    sim.subscribe(tracker.on_update)
+    risk.refresh()
+    risk.set_prices({'AAA': 100.0})
+    return sim, state, risk, tracker
+
+
+def test_approval_reserves_buying_power(engine):
+    sim, state, risk, tracker = engine
+    start = risk.buying_power
+    assert risk.check([('AAA', 10, 'buy')]) == [None]
+    assert risk.buying_power == start - 1000
+    assert risk.pending['AAA'] == 10
+    # The reservation counts against the next check before any order is sent
+    too_big = int(risk.buying_power / 100) + 1
+    assert risk.check([('AAA', too_big, 'buy')]) == ['buying_power']
+
+
+def test_failed_submit_releases_the_reservation(engine):
+    sim, state, risk, tracker = engine
+    start = risk.buying_power
+    risk.check([('AAA', 10, 'buy')])
+    risk.submitted([{'symbol': 'AAA', 'qty': 10, 'side': 'buy', 'order_id': None, 'error': Exception('rejected')}])
+    assert risk.buying_power == start
+    assert risk.pending['AAA'] == 0
+
+
+def test_cancel_releases_what_did_not_fill(engine):
+    sim, state, risk, tracker = engine
+    start = risk.buying_power
+    legs = [('AAA', 10, 'buy')]
+    risk.check(legs)
+    results = submit_legs(sim, legs, bracket=False, state=state, tracker=tracker)
+    risk.submitted(results)
+    assert risk._working == {results[0]['client_order_id']: 10.0}
+    sim.cancel_order(results[0]['order_id'])
+    assert risk.buying_power == start
+    assert risk.pending['AAA'] == 0
+    assert risk._working == {}
+
+
+def test_reducing_fill_gives_buying_power_back(engine):
+    sim, state, risk, tracker = engine
+    risk.positions['AAA'] = 10.0
+    before = risk.buying_power
+    record = OrderRecord('o1', 'c1', 'AAA', 'sell', 10)
+    record.status, record.filled_qty, record.filled_avg_price = 'filled', 10.0, 100.0
+    risk.on_order_update('fill', record)
+    assert risk.positions['AAA'] == 0
+    assert risk.buying_power == before + 1000
+
+
+def test_round_trips_do_not_leak_buying_power():
+    sim = SimBroker(equity=10_000)
+    state = BrokerState(sim, ['AAA'])
+    risk = RiskEngine(sim, state)
+    tracker = OrderTracker()
+    tracker.add_listener(risk.on_order_update)
+    sim.subscribe(tracker.on_update)
+    risk.refresh()
+    risk.set_prices({'AAA': sim.price('AAA')})
+    start = risk.buying_power
+    for _ in range(4):
+        legs = [('AAA', 20, 'buy')]
+        assert risk.check(legs) == [None]
+        risk.submitted(submit_legs(sim, legs, bracket=False, state=state, tracker=tracker))
+        sim.close_position('AAA')
+    assert risk.buying_power == pytest.approx(start, rel=1e-3)
+    assert risk._working == {}
+    assert risk.positions['AAA'] == 0
+
+
+def test_flip_is_checked_and_reserved_past_flat(engine):
+    sim, state, risk, tracker = engine
+    risk.positions['AAA'] = 10.0
+    risk.buying_power = 600.0
+    # 10 long to 5 short adds no exposure, 10 long to 15 short adds 5 shares: both fit, and reserve what they add
+    assert risk.check([('AAA', 15, 'sell')]) == [None]
+    assert risk.buying_power == 600.0
+    risk.pending['AAA'] = 0.0
+    assert risk.check([('AAA', 25, 'sell')]) == [None]
+    assert risk.buying_power == 100.0
+    risk.pending['AAA'] = 0.0
+    assert risk.check([('AAA', 27, 'sell')]) == ['buying_power']
@@ -0,0 +1,29 @@
+import threading
+import time
+
+import artifacts
+import bar_cache
+from shard import Coordinator, run_shard
+from sim_broker import SimBroker
+
+
+def test_sim_shard_trades_at_the_published_prices(monkeypatch, tmp_path):
+    monkeypatch.setattr(artifacts, 'ARTIFACT_DIR', str(tmp_path / 'artifacts'))
+    monkeypatch.setattr(bar_cache, 'CACHE_DIR', str(tmp_path / 'bars'))
+    shard_sim = SimBroker(volatility=0.01)
+    coord = Coordinator([('AAA', 'BBB')], 1, '2024-01-01', '2024-04-24', '1Day', port=0)
+    worker = threading.Thread(target=run_shard, args=(0, *coord.manager.address, coord.authkey, lambda n: shard_sim),
+                              daemon=True)
+    worker.start()
+    try:
+        assert coord.wait_ready(timeout=30)
+        published = {'AAA': shard_sim.price('AAA') * 1.5, 'BBB': shard_sim.price('BBB') * 0.5}
+        coord.publish(1.0, published)
+        deadline = time.monotonic() + 10
+        while coord.stats[0]['bars'] < 1 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert coord.stats[0]['bars'] == 1
+        assert {symbol: shard_sim.price(symbol) for symbol in published} == published
+    finally:
+        coord.stop()
+        worker.join(timeout=10)
@@ -0,0 +1,29 @@
+import numpy as np
+import pytest
+
+from bench_signals import legacy_actions, legacy_generate_signals, make_frame
+from signals import CLOSE, OPEN_LONG, generate_signals_vectorized, position_states, signal_codes, trade_actions
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_signals_match_the_row_version(seed):
+    df = make_frame(3000, seed)
+    df.iloc[100:110, 0] = np.nan
+    df.iloc[200:203, 0] = [2.0, -2.0, 0.5]  # band edges
+    expected = df.apply(legacy_generate_signals, axis=1)
+    assert (generate_signals_vectorized(df['Z-Score']).to_numpy() == expected.to_numpy()).all()
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_actions_match_the_reference_loop(seed):
+    df = make_frame(3000, seed)
+    df['Signal'] = df.apply(legacy_generate_signals, axis=1)
+    assert trade_actions(df) == legacy_actions(df)
+
+
+def test_resumed_open_position_closes_first():
+    codes = signal_codes([2.5, 0.0, -2.5, 0.0])
+    position, action = position_states(codes, start_open=OPEN_LONG)
+    # Already long: the short signal is ignored until the exit
+    assert action.tolist() == [0, CLOSE, OPEN_LONG, CLOSE]
+    assert position.tolist() == [1, 0, 1, 0]
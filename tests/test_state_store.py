@@ -0,0 +1,134 @@
+import os
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from broker_state import BrokerState
+from execution import submit_leg
+from journal import TradeJournal
+from order_tracker import OrderTracker
+from risk import RiskEngine
+from sim_broker import SimBroker
+from state_store import StateStore
+from zscore_stream import RollingZScore
+
+# bott builds its REST client at import; the simulator replaces it below
+os.environ.setdefault("API_KEY", "test")
+os.environ.setdefault("SECRET_KEY", "test")
+import bott
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = StateStore(str(tmp_path / 'state.db'))
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def sim(monkeypatch, tmp_path, store):
+    sim = SimBroker()
+    state = BrokerState(sim, [bott.pair1, bott.pair2])
+    journal = TradeJournal(str(tmp_path / 'journal'))
+    monkeypatch.setattr(bott, 'api', sim)
+    monkeypatch.setattr(bott, 'broker_state', state)
+    monkeypatch.setattr(bott, 'risk', RiskEngine(sim, state))
+    monkeypatch.setattr(bott, 'order_tracker', OrderTracker())
+    monkeypatch.setattr(bott, '_trade_stream', SimpleNamespace(live=False))
+    monkeypatch.setattr(bott, 'get_state_store', lambda: store)
+    monkeypatch.setattr(bott, 'get_journal', lambda: journal)
+    monkeypatch.setattr(bott, 'hedge_ratio', 1.0)
+    yield sim
+    journal.close()
+
+
+def _zscores(n_bars):
+    index = pd.date_range('2024-01-02', periods=n_bars, freq='1min', tz='UTC')
+    return pd.DataFrame({'Z-Score': 3.0 * np.sin(np.linspace(0, 4 * np.pi, n_bars))}, index=index)
+
+
+def test_checkpoint_is_keyed_by_settings(store):
+    store.checkpoint('s', 1, '2024-01-02 10:00', 1.5, {'zscore': None}, {'window': 30})
+    assert store.load('s', {'window': 30})['position'] == 1
+    assert store.load('s', {'window': 60}) is None
+
+
+def test_terminal_orders_stop_being_outstanding(store):
+    store.record_orders('s', [{'client_order_id': 'c1', 'order_id': 'o1', 'symbol': 'AAA', 'side': 'buy', 'qty': 1},
+                              {'client_order_id': 'c2', 'order_id': 'o2', 'symbol': 'BBB', 'side': 'sell', 'qty': 1}])
+    store.set_order_status('c1', 'filled')
+    assert [order['client_order_id'] for order in store.outstanding('s')] == ['c2']
+
+
+def test_resubmitted_leg_resolves_to_the_order_already_sent():
+    sim = SimBroker()
+    first = submit_leg(sim, 'AAA', 10, 'buy', client_order_id='strategy-bar-1')
+    again = submit_leg(sim, 'AAA', 10, 'buy', client_order_id='strategy-bar-1')
+    assert again['error'] is None
+    assert again['duplicate']
+    assert again['order_id'] == first['order_id']
+    assert again['leg_ids'] == first['leg_ids']
+    assert len([o for o in sim.orders.values() if o.client_order_id == 'strategy-bar-1']) == 1
+
+
+def test_rerun_trades_only_new_bars(sim, store):
+    df = _zscores(120)
+    bott.execute_trades(df.iloc[:80])
+    sent = len(sim.orders)
+    assert sent
+    checkpoint = store.load(bott.BATCH_NAME, bott.artifact_settings())
+    assert pd.Timestamp(checkpoint['last_bar']) == df.index[79]
+
+    bott.execute_trades(df.iloc[:80])
+    assert len(sim.orders) == sent
+
+    bott.execute_trades(df)
+    assert pd.Timestamp(store.load(bott.BATCH_NAME, bott.artifact_settings())['last_bar']) == df.index[-1]
+
+
+def test_same_bar_legs_are_sent_once(sim, store):
+    legs = [(bott.pair1, 10, 'buy'), (bott.pair2, 10, 'sell')]
+    assert len(bott.place_legs(legs, bar='2024-01-02T10:00:00+00:00', strategy='s')) == 2
+    sent = len(sim.orders)
+    # A restart that re-runs the bar: the deterministic IDs find the orders already sent
+    assert bott.place_legs(legs, bar='2024-01-02T10:00:00+00:00', strategy='s') == []
+    assert len(sim.orders) == sent
+    assert len(store.outstanding('s')) == 2
+
+
+def test_failed_bar_rolls_the_estimators_back(sim, monkeypatch):
+    rng = np.random.default_rng(0)
+    monkeypatch.setattr(bott, 'live_zscore', RollingZScore(window=30, hedge_ratio=1.0).seed(rng.normal(0, 1, 60)))
+    monkeypatch.setattr(bott, 'live_hedge', None)
+    monkeypatch.setattr(bott, 'live_bar', None)
+    before = bott.live_zscore.to_state()
+
+    def fail(*args, **kwargs):
+        raise RuntimeError('submit failed')
+
+    monkeypatch.setattr(bott, 'open_spread', fail)
+    monkeypatch.setattr(bott, 'close_spread', fail)
+    monkeypatch.setattr(bott, 'update_live_chart', lambda z: None)
+    with pytest.raises(RuntimeError):
+        bott.trade_latest_bar(100.0, 80.0, bar='2024-01-02T15:00:00Z')
+    assert bott.live_zscore.to_state() == before
+    assert bott.live_bar is None
+
+
+def test_failed_account_fetch_skips_only_that_bar(sim, monkeypatch):
+    rng = np.random.default_rng(0)
+    monkeypatch.setattr(bott, 'live_zscore', RollingZScore(window=30, hedge_ratio=1.0).seed(rng.normal(0, 1, 60)))
+    monkeypatch.setattr(bott, 'live_hedge', None)
+    monkeypatch.setattr(bott, 'live_bar', None)
+    monkeypatch.setattr(bott, 'update_live_chart', lambda z: None)
+    before = bott.live_zscore.to_state()
+
+    def fail():
+        raise RuntimeError('account fetch failed')
+
+    monkeypatch.setattr(bott.risk, 'refresh', fail)
+    assert bott.trade_latest_bar(100.0, 80.0, bar='2024-01-02T15:00:00Z') is None
+    assert bott.live_zscore.to_state() == before
+    assert bott.live_bar is None
@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from sweep import PARAMS, STATS, param_grid, run_sweep
+
+
+@pytest.fixture
+def prices():
+    rng = np.random.default_rng(0)
+    index = pd.date_range('2024-01-02', periods=300, freq='1D', tz='UTC')
+    base = 100 + np.cumsum(rng.normal(0, 1, len(index)))
+    return pd.DataFrame({'AAA': base, 'BBB': 0.5 * base + rng.normal(0, 1, len(index))}, index=index)
+
+
+@pytest.fixture
+def grid():
+    return param_grid([20, 30], [2.0], [0.5], [2], [1])
+
+
+def test_resume_skips_a_torn_last_row(prices, grid, tmp_path):
+    output = str(tmp_path / 'sweep.csv')
+    full = run_sweep(prices, 'AAA', 'BBB', grid, output, workers=1)
+    with open(output) as file:
+        lines = file.readlines()
+    # The second row was being appended when the process died
+    with open(output, 'w') as file:
+        file.writelines(lines[:2] + [lines[2][:7]])
+    resumed = run_sweep(prices, 'AAA', 'BBB', grid, output, workers=1)
+    assert len(resumed) == len(grid)
+    columns = PARAMS + STATS
+    pd.testing.assert_frame_equal(resumed.sort_values('window')[columns].reset_index(drop=True),
+                                  full.sort_values('window')[columns].reset_index(drop=True))
+
+
+def test_results_of_another_run_are_not_resumed(prices, grid, tmp_path):
+    output = str(tmp_path / 'sweep.csv')
+    run_sweep(prices, 'AAA', 'BBB', grid, output, workers=1)
+    with pytest.raises(ValueError):
+        run_sweep(prices, 'AAA', 'BBB', grid, output, hedge_mode='recursive', workers=1)
+    with pytest.raises(ValueError):
+        run_sweep(prices * 1.01, 'AAA', 'BBB', grid, output, workers=1)
+    with pytest.raises(ValueError):
+        run_sweep(prices.rename(columns={'AAA': 'CCC'}), 'CCC', 'BBB', grid, output, workers=1)
@@ -0,0 +1,54 @@
+import pytest
+import requests
+from requests.adapters import BaseAdapter
+
+import transport
+from transport import RateLimitedSession, TokenBucket
+
+
+# Answers every request with the same status and counts the attempts
+class _Always(BaseAdapter):
+    def __init__(self, status):
+        super().__init__()
+        self.status = status
+        self.sent = 0
+
+    def send(self, request, **kwargs):
+        self.sent += 1
+        response = requests.Response()
+        response.status_code = self.status
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def session(monkeypatch):
+    monkeypatch.setattr(transport.time, 'sleep', lambda seconds: None)
+    session = RateLimitedSession(bucket=TokenBucket(rate_per_min=60_000), max_retries=2)
+    adapter = _Always(503)
+    session.mount('https://', adapter)
+    return session, adapter
+
+
+@pytest.mark.parametrize('method, url, attempts', [
+    ('GET', 'https://api.test/v2/orders', 3),
+    ('DELETE', 'https://api.test/v2/orders/sim-1', 3),
+    ('DELETE', 'https://api.test/v2/orders', 1),
+    ('DELETE', 'https://api.test/v2/positions', 1),
+    ('DELETE', 'https://api.test/v2/positions/AAA', 1),
+    ('POST', 'https://api.test/v2/orders', 1),
+])
+def test_only_replay_safe_requests_are_retried(session, method, url, attempts):
+    session, adapter = session
+    assert session.request(method, url).status_code == 503
+    assert adapter.sent == attempts
+
+
+def test_throttled_post_is_retried(session):
+    session, adapter = session
+    adapter.status = 429
+    session.request('POST', 'https://api.test/v2/orders')
+    assert adapter.sent == 3
@@ -0,0 +1,69 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import portfolio
+from sim_broker import SimBroker
+from zscore_stream import RollingZScore, RollingZScoreBatch
+
+
+def _walk(n, seed):
+    return 100 + np.cumsum(np.random.default_rng(seed).normal(0, 1, n))
+
+
+def test_batch_matches_pandas_rolling():
+    y, x = _walk(200, 0), _walk(200, 1)
+    batch = RollingZScoreBatch(1, window=30, hedge_ratios=1.0)
+    zs = [batch.update([a], [b])[0][0] for a, b in zip(y, x)]
+    spread = pd.Series(y - x)
+    expected = ((spread - spread.rolling(30).mean()) / spread.rolling(30).std()).to_numpy()
+    assert np.allclose(zs[29:], expected[29:])
+
+
+def test_missing_quote_skips_only_that_pair():
+    y1, x1, y2, x2 = (_walk(120, seed) for seed in range(4))
+    batch = RollingZScoreBatch(2, window=30, hedge_ratios=1.0)
+    alone = RollingZScoreBatch(1, window=30, hedge_ratios=1.0)
+    for t in range(120):
+        gap = t in (50, 51, 80)
+        z, codes, actions = batch.update([y1[t], y2[t]], [x1[t], np.nan if gap else x2[t]])
+        z_alone = alone.update([y1[t]], [x1[t]])[0]
+        assert z[0] == z_alone[0] or (np.isnan(z[0]) and np.isnan(z_alone[0]))
+        if gap:
+            assert np.isnan(z[1]) and codes[1] == 0 and actions[1] == 0
+    assert np.isfinite(batch.mean).all() and np.isfinite(batch.m2).all()
+    assert np.isfinite(z[1])
+    # The stats still describe exactly the spreads held in the window
+    assert batch.mean[1] == pytest.approx(batch.buffer[:, 1].mean())
+
+
+def test_missing_quote_during_warm_up_drops_the_bar():
+    batch = RollingZScoreBatch(2, window=5, hedge_ratios=1.0)
+    batch.update([1.0, 2.0], [0.5, None])
+    assert batch.count == 0
+    assert np.isfinite(batch.to_state()['spreads']).all()
+
+
+def test_single_pair_skips_a_nan_price():
+    stream = RollingZScore(window=5, hedge_ratio=1.0).seed([1.0, 2.0, 3.0, 2.0, 1.0])
+    mean, m2 = stream.mean, stream.m2
+    z, signal, action = stream.update(math.nan, 1.0)
+    assert math.isnan(z) and signal == "Hold" and action == 0
+    assert (stream.mean, stream.m2) == (mean, m2)
+
+
+def test_portfolio_bar_with_a_missing_quote(monkeypatch):
+    monkeypatch.setattr(portfolio, 'save_artifacts', lambda *args, **kwargs: None)
+    sim = SimBroker()
+    book = portfolio.Portfolio(sim, [('AAA', 'BBB'), ('CCC', 'DDD')], window=10)
+    history = pd.DataFrame({symbol: _walk(60, k) for k, symbol in enumerate(book.symbols)})
+    book.fit(history)
+    quotes = history.iloc[-1].to_dict()
+    book.on_prices(dict(quotes, BBB=None))
+    book.on_prices({symbol: price for symbol, price in quotes.items() if symbol != 'DDD'})
+    for _ in range(10):
+        z, actions = book.on_prices(quotes)
+    assert np.isfinite(book.zscore.mean).all()
+    assert np.isfinite(book.zscore.to_state()['spreads']).all()
@@ -0,0 +1,101 @@
+import os
+import random
+import re
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+RATE_LIMIT_PER_MIN = int(os.getenv("ALPACA_RATE_LIMIT", "200"))  # Alpaca's default account quota
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# A POST that may have reached the broker (5xx, dropped connection, timeout) is not resent: it could place the
+# order twice. Only a 429 guarantees it was never processed.
+IDEMPOTENT_METHODS = {'GET', 'HEAD', 'OPTIONS', 'PUT'}
+# Cancelling one order twice is a no-op, but a replayed cancel-all or close-position/close-all hits whatever
+# is open by then (orders or positions opened since the first attempt): only a per-order DELETE is resent.
+IDEMPOTENT_DELETE = re.compile(r'/orders/[^/?]+/?(\?|$)')
+MAX_RETRIES = 5
+REQUEST_TIMEOUT = float(os.getenv("ALPACA_TIMEOUT", "10"))  # seconds, when the caller doesn't pass one
+
+transport_stats = {'requests': 0, 'retries': 0, 'throttled_s': 0.0}
+
+
+# ✅ Token bucket shared by every caller in the process
+class TokenBucket:
+    def __init__(self, rate_per_min=RATE_LIMIT_PER_MIN, burst=None):
+        self.rate = rate_per_min / 60.0
+        self.capacity = burst or max(1, rate_per_min // 10)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        if wait:
+            transport_stats['throttled_s'] += wait
+            time.sleep(wait)
+
+
+# ✅ Keep-alive session with a pooled adapter, the token bucket and jittered retries on 429/5xx
+# (idempotent methods only, plus any request the broker throttled with a 429)
+class RateLimitedSession(requests.Session):
+    def __init__(self, bucket=None, pool_size=16, max_retries=MAX_RETRIES):
+        super().__init__()
+        self.bucket = bucket or TokenBucket()
+        self.max_retries = max_retries
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.mount('https://', adapter)
+        self.mount('http://', adapter)
+
+    def request(self, method, url, *args, **kwargs):
+        kwargs.setdefault('timeout', REQUEST_TIMEOUT)
+        idempotent = method.upper() in IDEMPOTENT_METHODS or (
+            method.upper() == 'DELETE' and IDEMPOTENT_DELETE.search(url) is not None)
+        attempt = 0
+        while True:
+            self.bucket.acquire()
+            transport_stats['requests'] += 1
+            try:
+                response = super().request(method, url, *args, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if not idempotent or attempt >= self.max_retries:
+                    raise
+                response = None
+            if response is not None:
+                retry = response.status_code == 429 or (idempotent and response.status_code in RETRY_STATUSES)
+                if not retry or attempt >= self.max_retries:
+                    return response
+
+            retry_after = response.headers.get('Retry-After') if response is not None else None
+            delay = float(retry_after) if retry_after and retry_after.isdigit() else min(2 ** attempt, 30)
+            time.sleep(delay * random.uniform(0.5, 1.5))
+            transport_stats['retries'] += 1
+            attempt += 1
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def shared_session():
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = RateLimitedSession()
+        return _session
+
+
+# ✅ Alpaca REST client that sends everything through the shared session
+def make_rest(key_id, secret_key, base_url):
+    from alpaca_trade_api.rest import REST
+
+    api = REST(key_id, secret_key, base_url)
+    api._session = shared_session()
+    api._retry = 0  # retries happen in the session, with backoff and the shared budget
+    return api
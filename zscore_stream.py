@@ -0,0 +1,194 @@
+import math
+
+import numpy as np
+
+from signals import CLOSE, ENTRY_Z, EXIT, EXIT_Z, HOLD, LONG, SHORT, SIGNAL_NAMES, signal_codes
+
+
+# ✅ Rolling spread mean/std/z-score over a fixed window, updated in O(1) per bar
+# Matches df['Spread'].rolling(window).mean()/.std() (sample std, ddof=1).
+class RollingZScore:
+    def __init__(self, window=30, hedge_ratio=1.0, entry_z=ENTRY_Z, exit_z=EXIT_Z, position=0):
+        self.window = window
+        self.hedge_ratio = hedge_ratio
+        self.entry_z = entry_z
+        self.exit_z = exit_z
+        self.position = position  # +1 long spread, -1 short spread, 0 flat
+        self.buffer = np.zeros(window)
+        self.head = 0
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.spread = math.nan
+        self.z = math.nan
+
+    # Welford add / replace steps, the ring buffer holds the values to evict
+    def _push(self, x):
+        if self.count < self.window:
+            self.count += 1
+            delta = x - self.mean
+            self.mean += delta / self.count
+            self.m2 += delta * (x - self.mean)
+        else:
+            old = self.buffer[self.head]
+            old_mean = self.mean
+            self.mean += (x - old) / self.window
+            self.m2 += (x - old) * (x - self.mean + old - old_mean)
+            if self.m2 < 0.0:
+                self.m2 = 0.0  # guard against rounding drift
+        self.buffer[self.head] = x
+        self.head = (self.head + 1) % self.window
+
+    @property
+    def std(self):
+        if self.count < 2:
+            return math.nan
+        return math.sqrt(self.m2 / (self.count - 1))
+
+    @property
+    def ready(self):
+        return self.count == self.window
+
+    # ✅ Warm the window from historical spread values (e.g. df['Spread'])
+    def seed(self, spreads):
+        for x in np.asarray(spreads, dtype=np.float64)[-self.window:]:
+            if not math.isnan(x):
+                self._push(float(x))
+        return self
+
+    def signal_code(self, z):
+        if z > self.entry_z:
+            return SHORT
+        if z < -self.entry_z:
+            return LONG
+        if -self.exit_z <= z <= self.exit_z:
+            return EXIT
+        return HOLD
+
+    # ✅ Plain-dict snapshot for the on-disk artifact cache
+    def to_state(self):
+        # Oldest-first window so the ring can be rebuilt with any head position
+        ordered = np.roll(self.buffer, -self.head) if self.ready else self.buffer[:self.count]
+        return {'window': self.window, 'hedge_ratio': self.hedge_ratio, 'entry_z': self.entry_z,
+                'exit_z': self.exit_z, 'position': self.position, 'spreads': ordered.tolist()}
+
+    @classmethod
+    def from_state(cls, state):
+        stream = cls(state['window'], state['hedge_ratio'], state['entry_z'], state['exit_z'], state['position'])
+        return stream.seed(state['spreads'])
+
+    # ✅ Feed one new bar per leg; returns (z, signal, action) with action as in signals.position_states
+    # A missing price (NaN) skips the bar instead of entering the running stats
+    def update(self, price1, price2):
+        self.spread = price1 - self.hedge_ratio * price2
+        if not math.isfinite(self.spread):
+            self.z = math.nan
+            return self.z, "Hold", 0
+        self._push(self.spread)
+        if not self.ready:
+            self.z = math.nan
+            return self.z, "Hold", 0
+
+        std = self.std
+        self.z = (self.spread - self.mean) / std if std > 0 else math.nan
+        code = self.signal_code(self.z)
+
+        action = 0
+        if code in (LONG, SHORT) and self.position == 0:
+            self.position = 1 if code == LONG else -1
+            action = self.position
+        elif code == EXIT and self.position != 0:
+            self.position = 0
+            action = CLOSE
+        return self.z, SIGNAL_NAMES[code], action
+
+
+# ✅ The same rolling Z-Score and open/close state machine for many pairs at once
+# Column j of every array is pair j; all pairs advance one bar per update() with a shared ring head.
+class RollingZScoreBatch:
+    def __init__(self, n_pairs, window=30, hedge_ratios=1.0, entry_z=ENTRY_Z, exit_z=EXIT_Z, positions=0):
+        self.window = window
+        self.hedge_ratios = np.broadcast_to(np.asarray(hedge_ratios, dtype=np.float64), (n_pairs,)).copy()
+        self.entry_z = entry_z
+        self.exit_z = exit_z
+        self.positions = np.broadcast_to(np.asarray(positions, dtype=np.int8), (n_pairs,)).copy()
+        self.buffer = np.zeros((window, n_pairs))
+        self.head = 0
+        self.count = 0
+        self.mean = np.zeros(n_pairs)
+        self.m2 = np.zeros(n_pairs)
+        self.z = np.full(n_pairs, math.nan)
+
+    @property
+    def ready(self):
+        return self.count == self.window
+
+    def _push(self, x):
+        if self.count < self.window:
+            self.count += 1
+            delta = x - self.mean
+            self.mean += delta / self.count
+            self.m2 += delta * (x - self.mean)
+        else:
+            old = self.buffer[self.head].copy()
+            old_mean = self.mean.copy()
+            self.mean += (x - old) / self.window
+            self.m2 += (x - old) * (x - self.mean + old - old_mean)
+            np.maximum(self.m2, 0.0, out=self.m2)  # guard against rounding drift
+        self.buffer[self.head] = x
+        self.head = (self.head + 1) % self.window
+
+    @property
+    def std(self):
+        if self.count < 2:
+            return np.full(len(self.mean), math.nan)
+        return np.sqrt(self.m2 / (self.count - 1))
+
+    # ✅ Warm every window from a (bars, pairs) spread matrix; rows with a NaN in any pair are skipped
+    def seed(self, spreads):
+        spreads = np.asarray(spreads, dtype=np.float64)
+        for row in spreads[~np.isnan(spreads).any(axis=1)][-self.window:]:
+            self._push(row)
+        return self
+
+    def to_state(self):
+        order = (np.arange(self.count) + (self.head if self.ready else 0)) % self.window
+        return {'window': self.window, 'hedge_ratios': self.hedge_ratios.tolist(), 'entry_z': self.entry_z,
+                'exit_z': self.exit_z, 'positions': self.positions.tolist(),
+                'spreads': self.buffer[order].tolist()}
+
+    @classmethod
+    def from_state(cls, state):
+        batch = cls(len(state['hedge_ratios']), state['window'], state['hedge_ratios'], state['entry_z'],
+                    state['exit_z'], state['positions'])
+        return batch.seed(np.asarray(state['spreads'], dtype=np.float64).reshape(-1, len(state['hedge_ratios'])))
+
+    # ✅ One bar for every pair; returns (z, codes, actions) arrays, actions as in signals.position_states
+    # A pair with a missing leg price (NaN) skips the bar: its window keeps the value due for eviction and its
+    # stats don't move, so one bad quote can't poison mean/m2. While the windows fill the whole bar is dropped.
+    def update(self, prices1, prices2):
+        spreads = np.asarray(prices1, dtype=np.float64) - self.hedge_ratios * np.asarray(prices2, dtype=np.float64)
+        valid = np.isfinite(spreads)
+        if valid.all():
+            self._push(spreads)
+        elif self.ready:
+            self._push(np.where(valid, spreads, self.buffer[self.head]))
+        n_pairs = len(self.positions)
+        if not self.ready:
+            self.z = np.full(n_pairs, math.nan)
+            return self.z, np.zeros(n_pairs, dtype=np.int8), np.zeros(n_pairs, dtype=np.int8)
+
+        std = self.std
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.z = np.where(std > 0, (spreads - self.mean) / std, math.nan)
+        codes = signal_codes(self.z, self.entry_z, self.exit_z)
+
+        flat = self.positions == 0
+        opened = flat & ((codes == LONG) | (codes == SHORT))
+        closed = ~flat & (codes == EXIT)
+        actions = np.zeros(n_pairs, dtype=np.int8)
+        actions[opened] = np.where(codes[opened] == LONG, 1, -1)
+        actions[closed] = CLOSE
+        self.positions[opened] = actions[opened]
+        self.positions[closed] = 0
+        return self.z, codes, actions